@@ -0,0 +1,268 @@
+"""
+智能体离线负载测试 - 用本地MCP替身和模拟意图模型端到端运行 agent.py 编译好的 graph
+
+N 个并发会话各自执行若干轮对话（代币列表 / 兑换方案 / 问候，按权重混合），
+统计单轮延迟 p50/p95/p99、吞吐（轮/秒）和峰值RSS，结果保存为JSON便于跨提交比较
+
+用法:
+    python -m benchmarks.agent_load_bench --sessions 50 --turns 10
+    python -m benchmarks.agent_load_bench --mcp-latency 0.2 --mcp-failure-rate 0.1 --llm-failure-rate 0.2
+    python -m benchmarks.agent_load_bench --compare benchmarks/results/<旧结果>.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from langchain_core.messages import HumanMessage
+
+BENCH_DIR = Path(__file__).resolve().parent
+
+# 各流程的用户消息；部分消息本地规则置信度不足，会走（模拟的）意图LLM
+FLOWS = {
+    "token_list": ["查看代币列表", "显示代币", "我想看看有哪些币种"],
+    "exchange": ["1 BTC 兑换 ETH", "2.5 ETH 换 USDT", "SOL to USDC", "10 BNB 兑换 SOL", "100 ADA 换成 DOT"],
+    "greeting": ["你好", "hello", "帮助", "最近行情怎么样"],
+}
+
+_USER_MESSAGE = re.compile(r'用户消息: "(.*)"')
+
+
+def build_fake_intent_model(latency: float, jitter: float, failure_rate: float, seed: int):
+    """
+    模拟的意图模型：按配置的延迟返回本地规则的分类结果（置信度固定为0.9），按概率抛出异常
+    """
+    from langchain_core.language_models.chat_models import BaseChatModel
+    from langchain_core.messages import AIMessage
+    from langchain_core.outputs import ChatGeneration, ChatResult
+
+    from sample_agent.intent import classify_locally
+
+    rng = random.Random(seed)
+
+    class FakeIntentModel(BaseChatModel):
+        @property
+        def _llm_type(self) -> str:
+            return "fake-intent"
+
+        def _respond(self, messages) -> ChatResult:
+            if rng.random() < failure_rate:
+                raise RuntimeError("injected LLM failure")
+            match = _USER_MESSAGE.search(str(messages[-1].content))
+            result = {**classify_locally(match.group(1) if match else ""), "confidence": 0.9, "reasoning": "fake"}
+            return ChatResult(generations=[ChatGeneration(message=AIMessage(content=json.dumps(result)))])
+
+        def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+            time.sleep(latency + rng.uniform(0, jitter))
+            return self._respond(messages)
+
+        async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+            await asyncio.sleep(latency + rng.uniform(0, jitter))
+            return self._respond(messages)
+
+    return FakeIntentModel()
+
+
+def _percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+def summarize(latencies: list[float]) -> dict:
+    """延迟统计（毫秒）"""
+    return {
+        "turns": len(latencies),
+        "mean_ms": round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+        "p50_ms": round(_percentile(latencies, 0.50), 3),
+        "p95_ms": round(_percentile(latencies, 0.95), 3),
+        "p99_ms": round(_percentile(latencies, 0.99), 3),
+        "max_ms": round(max(latencies), 3) if latencies else 0.0,
+    }
+
+
+def _peak_rss_mb() -> float:
+    # Linux上ru_maxrss单位为KB，macOS上为字节
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 2)
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, cwd=BENCH_DIR, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def parse_mix(spec: str) -> dict:
+    """解析流程权重，例如 "token_list=1,exchange=2,greeting=1" """
+    mix = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, weight = item.partition("=")
+        if name not in FLOWS:
+            raise SystemExit(f"未知流程: {name}（可选: {', '.join(FLOWS)}）")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+async def run_session(graph, session: int, turns: int, mix: dict, timeout: float, rng: random.Random, results: list):
+    """单个会话依次执行多轮对话，每轮记录 (流程, 耗时毫秒, 错误)"""
+    flows, weights = list(mix), list(mix.values())
+    config = {"configurable": {"thread_id": f"bench-{session}"}}
+    for _ in range(turns):
+        flow = rng.choices(flows, weights)[0]
+        message = rng.choice(FLOWS[flow])
+        started = time.perf_counter()
+        error = None
+        try:
+            await asyncio.wait_for(
+                graph.ainvoke({"messages": [HumanMessage(content=message)], "copilotkit": {"actions": []}}, config),
+                timeout=timeout,
+            )
+        except Exception as e:  # 记录失败的轮次，继续执行后续轮次
+            error = f"{type(e).__name__}: {e}"[:200]
+        results.append((flow, (time.perf_counter() - started) * 1000, error))
+
+
+async def run(args) -> dict:
+    # 环境变量需要在导入 sample_agent 之前设置（各模块在导入时读取配置）
+    from sample_agent import intent
+    from sample_agent.agent import graph, warm_up
+    from sample_agent.mcp_pool import get_mcp_pool, shutdown_mcp_pool
+    from sample_agent.metrics import get_metrics
+    from sample_agent.price_cache import get_price_cache
+
+    intent._intent_model = build_fake_intent_model(args.llm_latency, args.llm_jitter, args.llm_failure_rate, args.seed)
+
+    started = time.perf_counter()
+    await warm_up()
+    warm_up_seconds = time.perf_counter() - started
+    baseline_rss = _peak_rss_mb()
+
+    mix = parse_mix(args.mix)
+    results: list = []
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        run_session(graph, session, args.turns, mix, args.turn_timeout, random.Random(args.seed + session), results)
+        for session in range(args.sessions)
+    ))
+    elapsed = time.perf_counter() - started
+
+    latencies = [latency for _, latency, _ in results]
+    errors = [error for _, _, error in results if error]
+    report = {
+        "commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        "warm_up_seconds": round(warm_up_seconds, 3),
+        "elapsed_seconds": round(elapsed, 3),
+        "turns_per_sec": round(len(results) / elapsed, 2) if elapsed else 0.0,
+        "overall": summarize(latencies),
+        "flows": {
+            flow: summarize([latency for name, latency, _ in results if name == flow]) for flow in mix
+        },
+        "errors": len(errors),
+        "error_samples": sorted(set(errors))[:10],
+        "rss_mb": {"after_warm_up": baseline_rss, "peak": _peak_rss_mb()},
+        "intent": intent.intent_stats(),
+        "price_cache": get_price_cache().stats(),
+        "mcp_pool": get_mcp_pool().snapshot(),
+        "metrics": get_metrics().snapshot(),
+    }
+    await shutdown_mcp_pool()
+    return report
+
+
+def print_report(report: dict, baseline: dict = None):
+    """打印结果表格；给出基线时附带变化百分比"""
+    def _delta(path: tuple, value: float) -> str:
+        if baseline is None:
+            return ""
+        old = baseline
+        for key in path:
+            old = old.get(key, {}) if isinstance(old, dict) else {}
+        if not isinstance(old, (int, float)) or not old:
+            return ""
+        return f" ({(value - old) / old * 100:+.1f}%)"
+
+    print(f"\ncommit {report['commit']}  会话 {report['config']['sessions']}  每会话 {report['config']['turns']} 轮")
+    print(f"{'flow':<12}{'turns':>8}{'p50(ms)':>12}{'p95(ms)':>12}{'p99(ms)':>12}")
+    for name, stats in [("overall", report["overall"]), *report["flows"].items()]:
+        print(f"{name:<12}{stats['turns']:>8}{stats['p50_ms']:>12.2f}{stats['p95_ms']:>12.2f}{stats['p99_ms']:>12.2f}")
+    for label, path in (
+        ("p50", ("overall", "p50_ms")),
+        ("p95", ("overall", "p95_ms")),
+        ("p99", ("overall", "p99_ms")),
+        ("turns/sec", ("turns_per_sec",)),
+        ("peak RSS(MB)", ("rss_mb", "peak")),
+    ):
+        value = report
+        for key in path:
+            value = value[key]
+        print(f"{label:<14}{value:>10}{_delta(path, value)}")
+    print(f"errors        {report['errors']:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="智能体离线负载测试（本地MCP替身 + 模拟意图模型）")
+    parser.add_argument("--sessions", type=int, default=20, help="并发会话数")
+    parser.add_argument("--turns", type=int, default=10, help="每个会话的对话轮数")
+    parser.add_argument("--mix", default="token_list=1,exchange=2,greeting=1", help="流程权重")
+    parser.add_argument("--turn-timeout", type=float, default=60.0)
+    parser.add_argument("--checkpointer", default="bounded", choices=("memory", "bounded", "sqlite"))
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--mcp-latency", type=float, default=0.05)
+    parser.add_argument("--mcp-jitter", type=float, default=0.05)
+    parser.add_argument("--mcp-failure-rate", type=float, default=0.0)
+    parser.add_argument("--mcp-payload-bytes", type=int, default=4096)
+    parser.add_argument("--mcp-pool-size", type=int, default=2)
+    parser.add_argument("--llm-latency", type=float, default=0.3)
+    parser.add_argument("--llm-jitter", type=float, default=0.2)
+    parser.add_argument("--llm-failure-rate", type=float, default=0.0)
+    parser.add_argument("--price-cache-ttl", type=float, default=None, help="覆盖 PRICE_CACHE_TTL（0表示每次都搜索）")
+    parser.add_argument("--output", default=None, help="结果JSON路径（默认 benchmarks/results/<commit>-<时间>.json）")
+    parser.add_argument("--compare", default=None, help="与之前保存的结果JSON比较")
+    args = parser.parse_args()
+
+    os.environ.update({
+        "TAVILY_MCP_COMMAND": sys.executable,
+        "TAVILY_MCP_ARGS": str(BENCH_DIR / "fake_mcp_server.py"),
+        "TAVILY_API_KEY": os.getenv("TAVILY_API_KEY", "offline"),
+        "FAKE_MCP_LATENCY": str(args.mcp_latency),
+        "FAKE_MCP_JITTER": str(args.mcp_jitter),
+        "FAKE_MCP_FAILURE_RATE": str(args.mcp_failure_rate),
+        "FAKE_MCP_PAYLOAD_BYTES": str(args.mcp_payload_bytes),
+        "FAKE_MCP_SEED": str(args.seed),
+        "MCP_POOL_SIZE": str(args.mcp_pool_size),
+        "AGENT_CHECKPOINTER": args.checkpointer,
+        "LOG_LEVEL": os.getenv("LOG_LEVEL", "WARNING"),
+        "LOG_FILE": os.getenv("LOG_FILE", os.devnull),
+    })
+    if args.price_cache_ttl is not None:
+        os.environ["PRICE_CACHE_TTL"] = str(args.price_cache_ttl)
+        os.environ["PRICE_CACHE_STALE_TTL"] = str(args.price_cache_ttl)
+
+    report = asyncio.run(run(args))
+    baseline = json.loads(Path(args.compare).read_text()) if args.compare else None
+    print_report(report, baseline)
+
+    output = Path(args.output) if args.output else (
+        BENCH_DIR / "results" / f"{report['commit']}-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, ensure_ascii=False, indent=2))
+    print(f"\n结果已保存: {output}")
+
+
+if __name__ == "__main__":
+    main()
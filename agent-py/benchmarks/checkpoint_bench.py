@@ -0,0 +1,67 @@
+"""
+检查点保存器基准测试 - 比较 MemorySaver / BoundedMemorySaver / SqliteCheckpointSaver 的单轮延迟
+
+用法:
+    python -m benchmarks.checkpoint_bench --turns 50 --threads 4
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+from langchain_core.messages import HumanMessage
+
+from sample_agent.agent import graph
+from sample_agent.checkpoint import build_checkpointer
+
+# 不依赖外部服务的对话流程（本地意图分类即可处理）
+FLOW = ["你好", "帮助", "你好"]
+
+
+async def run_turns(checkpointer, turns: int, threads: int) -> list[float]:
+    """在多个会话上依次执行对话，返回每轮耗时（毫秒）"""
+    graph.checkpointer = checkpointer
+    latencies = []
+    for turn in range(turns):
+        for thread in range(threads):
+            message = FLOW[turn % len(FLOW)]
+            started = time.perf_counter()
+            await graph.ainvoke(
+                {"messages": [HumanMessage(content=message)], "copilotkit": {"actions": []}},
+                {"configurable": {"thread_id": f"bench-{thread}"}},
+            )
+            latencies.append((time.perf_counter() - started) * 1000)
+    return latencies
+
+
+def _percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="检查点保存器单轮延迟基准测试")
+    parser.add_argument("--turns", type=int, default=30)
+    parser.add_argument("--threads", type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        savers = {
+            "memory": build_checkpointer("memory"),
+            "bounded": build_checkpointer("bounded"),
+            "sqlite": build_checkpointer("sqlite", path=os.path.join(tmp, "bench.db")),
+        }
+        print(f"{'checkpointer':<14}{'turns':>8}{'mean(ms)':>12}{'p50(ms)':>12}{'p95(ms)':>12}")
+        for name, saver in savers.items():
+            latencies = await run_turns(saver, args.turns, args.threads)
+            print(
+                f"{name:<14}{len(latencies):>8}{statistics.mean(latencies):>12.2f}"
+                f"{_percentile(latencies, 0.5):>12.2f}{_percentile(latencies, 0.95):>12.2f}"
+            )
+        savers["sqlite"].close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
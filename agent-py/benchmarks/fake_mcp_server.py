@@ -0,0 +1,90 @@
+"""
+本地的Tavily MCP替身 - 通过stdio提供 tavily-search 工具，返回带价格的模拟搜索结果
+供离线基准测试使用，延迟、失败率和结果大小通过环境变量配置:
+
+    FAKE_MCP_LATENCY        每次调用的基础延迟（秒，默认0.05）
+    FAKE_MCP_JITTER         额外的随机延迟上限（秒，默认0.05）
+    FAKE_MCP_FAILURE_RATE   返回错误的概率（默认0）
+    FAKE_MCP_PAYLOAD_BYTES  结果文本的目标大小（默认4096，用无关句子填充）
+    FAKE_MCP_SEED           随机种子（默认不固定）
+
+用法:
+    TAVILY_MCP_COMMAND=python TAVILY_MCP_ARGS=benchmarks/fake_mcp_server.py python -m sample_agent.demo
+"""
+import asyncio
+import os
+import random
+import re
+
+from mcp.server.fastmcp import FastMCP
+
+LATENCY = float(os.getenv("FAKE_MCP_LATENCY", "0.05"))
+JITTER = float(os.getenv("FAKE_MCP_JITTER", "0.05"))
+FAILURE_RATE = float(os.getenv("FAKE_MCP_FAILURE_RATE", "0"))
+PAYLOAD_BYTES = int(os.getenv("FAKE_MCP_PAYLOAD_BYTES", "4096"))
+
+# 基准价格，每次调用在此基础上随机游走
+BASE_PRICES = {
+    "BTC": 61234.5,
+    "ETH": 3100.0,
+    "USDT": 1.0,
+    "USDC": 1.0,
+    "BNB": 580.0,
+    "ADA": 0.45,
+    "SOL": 145.0,
+    "DOT": 6.8,
+    "MATIC": 0.72,
+    "AVAX": 27.5,
+}
+
+FILLER = (
+    "Crypto markets traded mixed today as investors weighed macro data. ",
+    "Analysts expect volatility to remain elevated into the weekend. ",
+    "On-chain activity picked up across several layer-one networks. ",
+    "Trading volume on centralized exchanges was roughly flat week over week. ",
+)
+
+_PAIR = re.compile(r"\b([A-Z]{2,6}) to ([A-Z]{2,6})\b")
+
+rng = random.Random(int(os.environ["FAKE_MCP_SEED"])) if os.getenv("FAKE_MCP_SEED") else random.Random()
+prices = dict(BASE_PRICES)
+server = FastMCP("tavily", log_level="WARNING")
+
+
+def _tick() -> dict:
+    """价格随机游走（±0.5%）"""
+    for symbol, price in prices.items():
+        if symbol not in ("USDT", "USDC"):
+            prices[symbol] = round(price * (1 + rng.uniform(-0.005, 0.005)), 6)
+    return prices
+
+
+def build_result(query: str) -> str:
+    """生成近似Tavily结果的文本：无关句子在前，价格和交易对汇率在后"""
+    current = _tick()
+    lines = [f"{symbol}: ${price:,.4f}" for symbol, price in current.items()]
+    pair = _PAIR.search(query)
+    if pair and pair.group(1) in current and pair.group(2) in current:
+        base, quote = pair.groups()
+        lines.append(f"1 {base} = {current[base] / current[quote]:.6f} {quote}")
+    tail = "\n".join(lines)
+    filler = []
+    size = len(tail)
+    while size < PAYLOAD_BYTES:
+        sentence = rng.choice(FILLER)
+        filler.append(sentence)
+        size += len(sentence)
+    return "".join(filler) + "\n" + tail
+
+
+@server.tool(name="tavily-search")
+async def tavily_search(query: str, max_results: int = 3, search_depth: str = "basic") -> str:
+    """模拟的网页搜索"""
+    await asyncio.sleep(LATENCY + rng.uniform(0, JITTER))
+    if rng.random() < FAILURE_RATE:
+        raise RuntimeError("injected failure")
+    return build_result(query)
+
+
+if __name__ == "__main__":
+    server.run()
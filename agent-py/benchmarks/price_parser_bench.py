@@ -0,0 +1,76 @@
+"""
+价格解析基准测试 - 比较逐代币正则循环与预编译单次扫描提取器
+
+用法:
+    python -m benchmarks.price_parser_bench --repeat 200
+"""
+import argparse
+import random
+import re
+import statistics
+import time
+
+from sample_agent.price_parser import PriceExtractor
+from sample_agent.quote_engine import DEFAULT_USD_PRICES
+
+SYMBOLS = list(DEFAULT_USD_PRICES)
+
+
+def legacy_extract(symbols: list[str], search_content: str) -> dict:
+    """原实现：每个代币构建并执行一次正则，各自扫描整段内容"""
+    prices = {}
+    for symbol in symbols:
+        if symbol not in search_content:
+            continue
+        price_pattern = rf'{symbol}[:\s]*\$?([0-9,]+\.?[0-9]*)'
+        price_match = re.search(price_pattern, search_content, re.IGNORECASE)
+        if price_match:
+            try:
+                prices[symbol] = float(price_match.group(1).replace(',', ''))
+            except ValueError:
+                pass
+    return prices
+
+
+def build_content(size: int, seed: int = 7) -> str:
+    """生成近似Tavily结果的文本：大量无关句子，价格分散在后半段"""
+    rng = random.Random(seed)
+    filler = [
+        "Crypto markets traded mixed today as investors weighed macro data.",
+        "Analysts expect volatility to remain elevated into the weekend.",
+        "Trading volume across major exchanges rose 12% week over week.",
+    ]
+    parts = []
+    while sum(len(p) for p in parts) < size:
+        parts.append(rng.choice(filler))
+    for symbol, price in DEFAULT_USD_PRICES.items():
+        parts.insert(rng.randrange(len(parts) // 2, len(parts)), f"{symbol}: ${price * rng.uniform(0.9, 1.1):,.2f}")
+    parts.append("1 BTC = 19.7 ETH")
+    return " ".join(parts)
+
+
+def _time(fn, content: str, repeat: int) -> list[float]:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(content)
+        samples.append((time.perf_counter() - started) * 1e6)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description="价格解析基准测试")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    extractor = PriceExtractor(SYMBOLS)
+    print(f"{'内容大小':>10} {'逐代币正则(us)':>16} {'单次扫描(us)':>14} {'加速比':>8}")
+    for size in (2_000, 20_000, 200_000):
+        content = build_content(size)
+        legacy = statistics.median(_time(lambda c: legacy_extract(SYMBOLS, c), content, args.repeat))
+        single = statistics.median(_time(extractor.extract, content, args.repeat))
+        print(f"{size:>10} {legacy:>16.1f} {single:>14.1f} {legacy / single:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
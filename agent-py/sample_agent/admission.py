@@ -0,0 +1,278 @@
+"""
+准入控制 - 为 /copilotkit 的智能体执行请求提供背压，突发流量不再直接放大为LLM调用和MCP子进程
+- 只作用于执行智能体的路由（agents/execute、agent/<name>），info、状态查询等轻量请求直接放行
+- 每个会话线程（请求体中的threadId，缺失时按代理转发的 X-Client-Id）一个令牌桶，超出速率立即返回429；
+  两者都没有时不做会话限速（请求都经由Next.js代理转发，对端IP不能区分用户）
+- 全局并发上限，超出时进入有界的FIFO等待队列；队列已满或等待超过截止时间返回503
+- 拒绝响应都带 Retry-After；请求体超过 ADMISSION_MAX_BODY 时返回413
+"""
+import asyncio
+import json
+import logging
+import math
+import os
+import re
+import time
+from collections import OrderedDict, deque
+from typing import Optional
+
+from sample_agent.metrics import get_metrics
+
+logger = logging.getLogger("agent")
+
+# 准入配置（可通过环境变量覆盖）
+MAX_INFLIGHT = int(os.getenv("ADMISSION_MAX_INFLIGHT", "32"))
+MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "64"))
+QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "10"))
+# 每个会话的令牌桶：每秒补充的请求数和桶容量
+SESSION_RATE = float(os.getenv("ADMISSION_SESSION_RATE", "1"))
+SESSION_BURST = float(os.getenv("ADMISSION_SESSION_BURST", "5"))
+MAX_BUCKETS = int(os.getenv("ADMISSION_MAX_BUCKETS", "10000"))
+# 读取请求体（用于取得threadId）的上限；执行请求带有消息历史和状态，上限需留出余量
+MAX_BODY = int(os.getenv("ADMISSION_MAX_BODY", str(512 * 1024)))
+
+_THREAD_ID = re.compile(rb'"threadId"\s*:\s*"([^"]{1,128})"')
+# 前缀之后执行智能体的路径：v1 agents/execute 和 v2 agent/<name>
+_EXECUTE_PATH = re.compile(r"agents/execute|agent/[a-zA-Z0-9_-]+")
+
+
+class Rejected(Exception):
+    """请求被拒绝（带HTTP状态码和建议的重试等待秒数）"""
+
+    def __init__(self, status: int, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.status = status
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, burst: float):
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+
+class AdmissionController:
+    """
+    全局并发 + 等待队列 + 每会话令牌桶
+    - acquire(key): 获得执行名额（可能排队），被拒绝时抛出Rejected
+    - release(): 释放名额，直接交给队首的等待者
+    - 等待队列中只保存仍在等待的请求（超时或断开的请求会自行移出）
+    """
+
+    def __init__(
+        self,
+        max_inflight: int = MAX_INFLIGHT,
+        max_queue: int = MAX_QUEUE,
+        queue_timeout: float = QUEUE_TIMEOUT,
+        rate: float = SESSION_RATE,
+        burst: float = SESSION_BURST,
+        max_buckets: int = MAX_BUCKETS,
+    ):
+        self.max_inflight = max_inflight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.rate = rate
+        self.burst = burst
+        self.max_buckets = max_buckets
+        self.in_flight = 0
+        self._waiters: deque = deque()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        self.counters = {"admitted": 0, "queued": 0, "rate_limited": 0, "shed_queue_full": 0, "shed_timeout": 0, "body_too_large": 0}
+
+    def _take_token(self, key: Optional[str]):
+        """从会话令牌桶取一个令牌，桶空时抛出429（没有会话标识时不限速）"""
+        if self.rate <= 0 or key is None:
+            return
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(self.burst)
+            while len(self._buckets) > self.max_buckets:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+            bucket.tokens = min(self.burst, bucket.tokens + (now - bucket.updated) * self.rate)
+            bucket.updated = now
+        if bucket.tokens < 1:
+            self.counters["rate_limited"] += 1
+            raise Rejected(429, "rate limit exceeded for this session", (1 - bucket.tokens) / self.rate)
+        bucket.tokens -= 1
+
+    async def acquire(self, key: Optional[str]):
+        """
+        获得执行名额
+
+        Args:
+            key: 会话标识，None表示不做会话限速（只受全局并发和队列约束）
+
+        Raises:
+            Rejected: 429（会话超出速率）或 503（队列已满 / 排队超过截止时间）
+        """
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # 等待者的future绑定事件循环，循环变化（如多次asyncio.run）时丢弃旧循环的名额和队列
+            self._loop = loop
+            self.in_flight = 0
+            self._waiters = deque()
+        self._take_token(key)
+        if self.in_flight < self.max_inflight and not self._waiters:
+            self.in_flight += 1
+            self.counters["admitted"] += 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            self.counters["shed_queue_full"] += 1
+            raise Rejected(503, "server busy, queue full", self.queue_timeout)
+
+        waiter = loop.create_future()
+        self._waiters.append(waiter)
+        self.counters["queued"] += 1
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout=self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done():
+                # 超时/取消与交接同时发生：名额已经交给本请求
+                if isinstance(e, asyncio.CancelledError):
+                    self.release()
+                    raise
+            else:
+                self._waiters.remove(waiter)
+                waiter.cancel()
+                if isinstance(e, asyncio.CancelledError):
+                    raise
+                self.counters["shed_timeout"] += 1
+                raise Rejected(503, "server busy, queue deadline exceeded", self.queue_timeout)
+        finally:
+            get_metrics().observe("agent_admission_wait", time.monotonic() - started)
+        self.counters["admitted"] += 1
+
+    def release(self):
+        """释放名额：有等待者时直接交给队首（in_flight不变），否则减一"""
+        if self._waiters:
+            self._waiters.popleft().set_result(None)
+        else:
+            self.in_flight -= 1
+
+    def snapshot(self) -> dict:
+        return {
+            **self.counters,
+            "in_flight": self.in_flight,
+            "queue_depth": len(self._waiters),
+            "max_inflight": self.max_inflight,
+            "max_queue": self.max_queue,
+            "sessions": len(self._buckets),
+        }
+
+
+class AdmissionMiddleware:
+    """
+    ASGI中间件：对指定前缀下执行智能体的请求做准入控制（不缓冲响应，流式输出照常）
+    请求体会被读取一次（不超过 max_body 字节）以取得threadId，再原样交给后续处理
+    """
+
+    def __init__(self, app, controller: AdmissionController, prefix: str = "/copilotkit", max_body: int = MAX_BODY):
+        self.app = app
+        self.controller = controller
+        self.prefix = prefix.rstrip("/")
+        self.max_body = max_body
+
+    def _guarded(self, scope) -> bool:
+        if scope["type"] != "http" or scope.get("method") != "POST":
+            return False
+        path = scope.get("path", "")
+        if not path.startswith(self.prefix + "/"):
+            return False
+        return _EXECUTE_PATH.fullmatch(path[len(self.prefix) + 1:].strip("/")) is not None
+
+    async def __call__(self, scope, receive, send):
+        if not self._guarded(scope):
+            await self.app(scope, receive, send)
+            return
+
+        declared = self._header(scope, b"content-length")
+        if declared is not None and declared.isdigit() and int(declared) > self.max_body:
+            self.controller.counters["body_too_large"] += 1
+            await self._reject(send, Rejected(413, "request body too large", 0), retry=False)
+            return
+        messages = []
+        size = 0
+        body = b""
+        while True:
+            message = await receive()
+            messages.append(message)
+            if message["type"] != "http.request":
+                break
+            size += len(message.get("body", b""))
+            if size > self.max_body:
+                self.controller.counters["body_too_large"] += 1
+                await self._reject(send, Rejected(413, "request body too large", 0), retry=False)
+                return
+            body += message.get("body", b"")
+            if not message.get("more_body", False):
+                break
+
+        key = self._session_key(scope, body)
+        try:
+            await self.controller.acquire(key)
+        except Rejected as e:
+            logger.warning(f"🚦 拒绝请求 {key or '-'}: {e.status} {e.reason}", extra={"event": "admission_shed"})
+            await self._reject(send, e)
+            return
+
+        async def replay():
+            if messages:
+                return messages.pop(0)
+            return await receive()
+
+        try:
+            await self.app(scope, replay, send)
+        finally:
+            self.controller.release()
+
+    @staticmethod
+    def _header(scope, name: bytes) -> Optional[str]:
+        for key, value in scope.get("headers", []):
+            if key == name:
+                return value.decode(errors="replace")
+        return None
+
+    def _session_key(self, scope, body: bytes) -> Optional[str]:
+        """会话标识：请求体中的threadId，其次是代理转发的 X-Client-Id；都没有时为None（不做会话限速）"""
+        match = _THREAD_ID.search(body)
+        if match:
+            return f"thread:{match.group(1).decode(errors='replace')}"
+        client_id = self._header(scope, b"x-client-id")
+        if client_id:
+            return f"client:{client_id[:128]}"
+        return None
+
+    @staticmethod
+    async def _reject(send, rejected: Rejected, retry: bool = True):
+        retry_after = max(1, math.ceil(rejected.retry_after))
+        detail = {"detail": rejected.reason, "retry_after": retry_after} if retry else {"detail": rejected.reason}
+        body = json.dumps(detail).encode()
+        headers = [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+        if retry:
+            headers.append((b"retry-after", str(retry_after).encode()))
+        await send({
+            "type": "http.response.start",
+            "status": rejected.status,
+            "headers": headers,
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+# 进程级单例
+_controller: Optional[AdmissionController] = None
+
+
+def get_admission_controller() -> AdmissionController:
+    """获取进程级准入控制器"""
+    global _controller
+    if _controller is None:
+        _controller = AdmissionController()
+    return _controller
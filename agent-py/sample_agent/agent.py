@@ -4,37 +4,39 @@
 """
 import asyncio
 import os
-import requests
 import logging
 import time
 import uuid
 import json
+from typing import Optional
 from typing_extensions import Literal
-from langchain_openai import ChatOpenAI
-from langchain_core.messages import SystemMessage, AIMessage, ToolMessage
+from langchain_core.messages import AIMessage, ToolMessage
 from langchain_core.runnables import RunnableConfig
 from langgraph.graph import StateGraph, END
-from langgraph.types import Command
-from langgraph.checkpoint.memory import MemorySaver
-from langchain_mcp_adapters.client import MultiServerMCPClient
 from langchain_core.tools import tool
 from copilotkit import CopilotKitState
 from langgraph.types import interrupt 
 import json
 import random
 from langgraph.graph import MessagesState
+from sample_agent.checkpoint import build_checkpointer
+from sample_agent.intent import classify_intent
+from sample_agent.logging_config import debug_dump, setup_logging
+from sample_agent.mcp_pool import get_mcp_pool
+from sample_agent.metrics import get_metrics
+from sample_agent.payload_store import PayloadMissing, compact_dumps, get_payload_store
+from sample_agent.price_cache import get_price_cache
+from sample_agent.route_optimizer import ROUTE_TOP_K, get_route_optimizer, route_plans
+from sample_agent.shared_prices import get_shared_price_table
+from sample_agent.price_parser import get_price_extractor
+from sample_agent.quote_engine import get_quote_engine
+from sample_agent.retention import cap_search_history, retention_updates
+from sample_agent.singleflight import SingleFlight
 
-# 配置日志记录
+# 配置日志记录（队列 + 后台写线程，文件按大小轮转）
+setup_logging()
 logger = logging.getLogger("agent")
-if not logger.handlers:
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.FileHandler("agent.log"),
-            logging.StreamHandler()
-        ]
-    )
+metrics = get_metrics()
 
 # 工具调用追踪
 tool_calls_tracker = {}
@@ -47,194 +49,289 @@ class AgentState(CopilotKitState):
     """
     # 自定义状态字段
     search_history: list[dict] = []  # 搜索历史记录，格式: [{"query": "关键词", "completed": True/False, "timestamp": "时间戳"}]
+    called_tools: dict = {}  # 本会话已调用过的工具及次数，替代每轮扫描全部历史消息
 
 
 
-@tool
-async def get_exchange_plans(from_token: str, to_token: str, amount: float):
+# 定义主要代币的基础信息
+TOKEN_CONFIGS = {
+    "BTC": {"name": "Bitcoin", "full_name": "比特币", "icon": "₿", "color": "#f7931a", "network": "Bitcoin", "decimals": 8},
+    "ETH": {"name": "Ethereum", "full_name": "以太坊", "icon": "Ξ", "color": "#627eea", "network": "Ethereum", "decimals": 18},
+    "USDT": {"name": "Tether", "full_name": "泰达币", "icon": "₮", "color": "#26a17b", "network": "Ethereum", "decimals": 6},
+    "BNB": {"name": "Binance Coin", "full_name": "币安币", "icon": "B", "color": "#f3ba2f", "network": "BSC", "decimals": 18},
+    "ADA": {"name": "Cardano", "full_name": "艾达币", "icon": "₳", "color": "#0033ad", "network": "Cardano", "decimals": 6},
+    "SOL": {"name": "Solana", "full_name": "索拉纳", "icon": "◎", "color": "#9945FF", "network": "Solana", "decimals": 9},
+    "DOT": {"name": "Polkadot", "full_name": "波卡", "icon": "●", "color": "#E6007A", "network": "Polkadot", "decimals": 10},
+    "MATIC": {"name": "Polygon", "full_name": "多边形", "icon": "⬟", "color": "#8247E5", "network": "Polygon", "decimals": 18},
+    "AVAX": {"name": "Avalanche", "full_name": "雪崩", "icon": "🔺", "color": "#E84142", "network": "Avalanche", "decimals": 18}
+}
+
+TOKEN_LIST_QUERY = "top cryptocurrency prices today Bitcoin Ethereum USDT BNB ADA SOL DOT MATIC AVAX current market data"
+
+# 相同代币列表/交易对的并发请求合并为一次上游搜索
+price_flight = SingleFlight()
+QUOTE_TIMEOUT = float(os.getenv("QUOTE_TIMEOUT", "25"))
+TOKEN_LIST_TIMEOUT = float(os.getenv("TOKEN_LIST_TIMEOUT", "30"))
+
+
+def _store_prices(prices: dict):
+    """价格写入报价引擎；本worker是共享价格表的写入者时同时发布给其他worker"""
+    get_quote_engine().update_prices(prices)
+    shared = get_shared_price_table()
+    if shared is not None and shared.is_writer:
+        shared.write(prices)
+
+
+def _sync_shared_prices():
     """
-    根据用户需求生成多种兑换方案，使用Tavily搜索获取实时汇率
-    
-    Args:
-        from_token: 源代币符号 (如 BTC, ETH)
-        to_token: 目标代币符号 (如 ETH, USDT)
-        amount: 兑换数量
-        
+    读取写入者发布到共享价格表的价格，写入报价引擎和价格缓存（保留原始年龄）
+    表未更新时只读一次表头；未启用或未能映射共享表时不做任何事，由本worker自行搜索
+    """
+    shared = get_shared_price_table()
+    if shared is None or shared.is_writer:
+        return
+    entries = shared.read_if_changed()
+    if not entries:
+        return
+    now = time.time()
+    engine = get_quote_engine()
+    cache = get_price_cache()
+    for symbol, (price, _change, updated_at) in entries.items():
+        engine.update_prices({symbol: price}, updated_at=updated_at)
+        cache.set(f"symbol:{symbol}", price, age=now - updated_at)
+    if all(symbol in entries for symbol in TOKEN_CONFIGS):
+        oldest = min(entries[symbol][2] for symbol in TOKEN_CONFIGS)
+        cache.set("token_list", {symbol: entries[symbol][0] for symbol in TOKEN_CONFIGS}, age=now - oldest)
+
+
+def _price_changes() -> dict:
+    """共享价格表中的24小时涨跌幅（未启用时为空）"""
+    shared = get_shared_price_table()
+    if shared is None:
+        return {}
+    return {symbol: change for symbol, (_price, change, _updated_at) in shared.snapshot().items()}
+
+
+async def _search_pair_prices(from_token: str, to_token: str) -> dict:
+    """
+    通过Tavily搜索交易对的实时价格，并把提取到的单币种价格写入价格缓存
+
     Returns:
-        dict: 包含多种兑换方案的详细信息
+        dict: {"from_price": 源代币美元价格, "to_price": 目标代币美元价格}
     """
-    import random
-    import time
-    
-    try:
-        # 使用Tavily搜索获取实时汇率
-        from langchain_mcp_adapters import MultiServerMCPClient
-        
-        # 创建MCP客户端
-        client = MultiServerMCPClient(
-            servers={
-                "tavily": {
-                    "command": "npx",
-                    "args": ["-y", "tavily-mcp"],
-                    "env": os.environ.copy(),
-                    "transport": "stdio"
-                }
-            }
-        )
-        
-        # 搜索实时汇率信息
-        search_query = f"{from_token} to {to_token} exchange rate current price cryptocurrency"
-        search_result = await client.call_tool("tavily", "tavily_search", {
-            "query": search_query,
-            "max_results": 3,
-            "search_depth": "advanced"
-        })
-        
-        # 从搜索结果中提取汇率信息
-        search_content = search_result.get("content", "")
-        
-        # 默认汇率（如果搜索失败）
-        base_rates = {
-            "BTC": 45000,
-            "ETH": 3000,
-            "USDT": 1,
-            "USDC": 1,
-            "BNB": 300,
-            "ADA": 0.5,
-            "SOL": 100,
-            "DOT": 7,
-            "MATIC": 0.8,
-            "AVAX": 25
-        }
-        
-        from_price = base_rates.get(from_token.upper(), 1)
-        to_price = base_rates.get(to_token.upper(), 1)
-        
-        # 尝试从搜索结果中提取实时价格
-        import re
-        price_patterns = [
-            rf'{from_token}[:\s]*\$?([0-9,]+\.?[0-9]*)',
-            rf'{to_token}[:\s]*\$?([0-9,]+\.?[0-9]*)',
-            rf'1\s*{from_token}[:\s]*=?([0-9,]+\.?[0-9]*)\s*{to_token}'
-        ]
-        
-        for pattern in price_patterns:
-            price_match = re.search(pattern, search_content, re.IGNORECASE)
-            if price_match:
-                try:
-                    extracted_price = float(price_match.group(1).replace(',', ''))
-                    if from_token.upper() in pattern:
-                        from_price = extracted_price
-                    elif to_token.upper() in pattern:
-                        to_price = extracted_price
-                except:
-                    pass
-        
-        # 计算基础汇率
-        base_rate = from_price / to_price
-        
-        logger.info(f"Tavily搜索成功，{from_token}价格: ${from_price}, {to_token}价格: ${to_price}")
-        
-    except Exception as e:
-        logger.warning(f"⚠️ Tavily汇率搜索失败，使用默认汇率: {e}")
-        # 使用默认汇率
-        base_rates = {
-            "BTC": 45000,
-            "ETH": 3000,
-            "USDT": 1,
-            "USDC": 1,
-            "BNB": 300,
-            "ADA": 0.5,
-            "SOL": 100,
-            "DOT": 7,
-            "MATIC": 0.8,
-            "AVAX": 25
-        }
-        
-        from_price = base_rates.get(from_token.upper(), 1)
-        to_price = base_rates.get(to_token.upper(), 1)
-        base_rate = from_price / to_price
-    
-    # 生成多种兑换方案
-    plans = []
-    
-    # 方案1: 标准兑换 (低手续费)
-    plans.append({
-        "id": "standard",
-        "name": "标准兑换",
-        "description": "快速兑换，低手续费",
-        "exchange_rate": round(base_rate * (1 + random.uniform(-0.01, 0.01)), 6),
-        "fee_rate": 0.001,
-        "estimated_output": round(amount * base_rate * 0.999, 6),
-        "estimated_time": "5-10分钟",
-        "risk_level": "low",
-        "features": ["快速处理", "低手续费", "高流动性"],
-        "recommended": True
+    # 使用Tavily搜索获取实时汇率（复用进程级MCP会话池）
+    search_query = f"{from_token} to {to_token} exchange rate current price cryptocurrency"
+    search_content = await get_mcp_pool().call_tool("tavily-search", {
+        "query": search_query,
+        "max_results": 3,
+        "search_depth": "advanced"
     })
     
-    # 方案2: 快速兑换 (高手续费，更快速度)
-    plans.append({
-        "id": "fast",
-        "name": "快速兑换",
-        "description": "优先处理，快速到账",
-        "exchange_rate": round(base_rate * (1 + random.uniform(-0.005, 0.005)), 6),
-        "fee_rate": 0.003,
-        "estimated_output": round(amount * base_rate * 0.997, 6),
-        "estimated_time": "2-5分钟",
-        "risk_level": "low",
-        "features": ["优先处理", "快速到账", "高优先级"],
-        "recommended": False
-    })
+    # 单次扫描提取所有代币价格（"1 X = Y Z" 形式的汇率用于推算另一端价格）
+    parsed = await get_price_extractor((from_token, to_token)).extract_async(search_content)
+    extracted = parsed.prices
+    engine = get_quote_engine()
+    from_price = extracted.get(from_token.upper(), engine.price(from_token))
+    to_price = extracted.get(to_token.upper(), engine.price(to_token))
     
-    # 方案3: 经济兑换 (最低手续费)
-    plans.append({
-        "id": "economy",
-        "name": "经济兑换",
-        "description": "最低手续费，处理时间较长",
-        "exchange_rate": round(base_rate * (1 + random.uniform(-0.02, 0.02)), 6),
-        "fee_rate": 0.0005,
-        "estimated_output": round(amount * base_rate * 0.9995, 6),
-        "estimated_time": "15-30分钟",
-        "risk_level": "low",
-        "features": ["最低手续费", "经济实惠", "批量处理"],
-        "recommended": False
+    cache = get_price_cache()
+    for symbol, price in extracted.items():
+        cache.set(f"symbol:{symbol}", price)
+    _store_prices(extracted)
+    optimizer = get_route_optimizer()
+    for (pair_from, pair_to), rate in parsed.rates.items():
+        optimizer.set_pair_rate(pair_from, pair_to, rate)
+    
+    logger.info(f"Tavily搜索成功，{from_token}价格: ${from_price}, {to_token}价格: ${to_price}")
+    return {"from_price": from_price, "to_price": to_price}
+
+
+async def _search_token_prices() -> dict:
+    """
+    通过Tavily搜索热门代币的实时价格，并逐个写入价格缓存
+
+    Returns:
+        dict: {代币符号: 美元价格}，只包含成功提取到的代币
+    """
+    # 搜索热门加密货币价格信息（复用进程级MCP会话池）
+    search_content = await get_mcp_pool().call_tool("tavily-search", {
+        "query": TOKEN_LIST_QUERY,
+        "max_results": 5,
+        "search_depth": "advanced"
     })
     
-    # 方案4: 高级兑换 (最优汇率)
-    plans.append({
-        "id": "premium",
-        "name": "高级兑换",
-        "description": "最优汇率，专业服务",
-        "exchange_rate": round(base_rate * (1 + random.uniform(0.01, 0.03)), 6),
-        "fee_rate": 0.002,
-        "estimated_output": round(amount * base_rate * 1.01, 6),
-        "estimated_time": "10-15分钟",
-        "risk_level": "low",
-        "features": ["最优汇率", "专业服务", "VIP支持"],
-        "recommended": False
+    parsed = await get_price_extractor().extract_async(search_content)
+    prices = {symbol: parsed.prices[symbol] for symbol in TOKEN_CONFIGS if symbol in parsed.prices}
+    
+    cache = get_price_cache()
+    for symbol, price in prices.items():
+        cache.set(f"symbol:{symbol}", price)
+    _store_prices(prices)
+    return prices
+
+
+async def _search_symbol_price(symbol: str) -> float:
+    """
+    通过Tavily搜索单个代币的实时价格（用于批量报价中缺失的代币）
+
+    Raises:
+        ValueError: 搜索结果中没有找到价格（不缓存默认价格）
+    """
+    search_content = await get_mcp_pool().call_tool("tavily-search", {
+        "query": f"{symbol} price USD cryptocurrency today",
+        "max_results": 3,
+        "search_depth": "basic"
     })
+    parsed = await get_price_extractor((symbol,)).extract_async(search_content)
+    price = parsed.prices.get(symbol.upper())
+    if price is None:
+        raise ValueError(f"未能从搜索结果中提取 {symbol} 价格")
+    _store_prices({symbol: price})
+    return price
+
+
+async def _ensure_pair_prices(from_token: str, to_token: str):
+    """
+    确保报价引擎中交易对两端的价格足够新
+    单币种价格都新鲜时无需搜索，否则按交易对读取缓存（未命中时才搜索，结果写入报价引擎）
+    """
+    _sync_shared_prices()
+    try:
+        cache = get_price_cache()
+        cached_from = cache.get(f"symbol:{from_token.upper()}")
+        cached_to = cache.get(f"symbol:{to_token.upper()}")
+        if cached_from is None or cached_to is None:
+            pair_key = f"pair:{from_token.upper()}/{to_token.upper()}"
+            await price_flight.do(
+                pair_key,
+                lambda: cache.get_or_load(pair_key, lambda: _search_pair_prices(from_token, to_token)),
+                timeout=QUOTE_TIMEOUT
+            )
+    except Exception as e:
+        logger.warning(f"⚠️ Tavily汇率搜索失败，使用最近一次或默认汇率: {e}")
+
+
+async def _ensure_symbol_prices(symbols: set):
+    """确保一批代币的价格足够新，每个缺失的代币在本批次中只搜索一次"""
+    _sync_shared_prices()
+    cache = get_price_cache()
+    engine = get_quote_engine()
+    missing = [s for s in symbols if s in engine.index and cache.get(f"symbol:{s}") is None]
     
+    async def _load(symbol: str):
+        key = f"symbol:{symbol}"
+        await price_flight.do(key, lambda: cache.get_or_load(key, lambda: _search_symbol_price(symbol)), timeout=QUOTE_TIMEOUT)
+    
+    results = await asyncio.gather(*(_load(s) for s in missing), return_exceptions=True)
+    for symbol, result in zip(missing, results):
+        if isinstance(result, BaseException):
+            logger.warning(f"⚠️ {symbol} 价格搜索失败，使用最近一次或默认价格: {result}")
+
+
+def _freshness(updated_at: float) -> dict:
+    """价格新鲜度信息，附加在每个工具响应中"""
+    if not updated_at:
+        return {"price_updated_at": None, "price_age_seconds": None}
+    return {
+        "price_updated_at": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(updated_at)),
+        "price_age_seconds": round(time.time() - updated_at, 3)
+    }
+
+
+async def refresh_all_prices():
+    """
+    刷新TOKEN_CONFIGS中所有代币的价格（供后台刷新任务调用）
+    先用一次代币列表搜索覆盖全部代币，未提取到价格的代币再单独搜索
+    """
+    prices = await _search_token_prices()
+    get_price_cache().set("token_list", prices)
+    missing = {symbol for symbol in TOKEN_CONFIGS if symbol not in prices}
+    if missing:
+        await _ensure_symbol_prices(missing)
+    logger.info(f"🔄 后台价格刷新完成，搜索提取 {len(prices)} 种，单独补充 {len(missing)} 种")
+
+
+def _build_exchange_result(quote: dict, row: int, from_token: str, to_token: str, amount: float) -> dict:
+    """把报价引擎的一行结果组装为兑换方案响应，并附加费后更优的多跳路由方案"""
+    engine = get_quote_engine()
+    base_rate = float(quote["rates"][row])
+    from_price = float(quote["from_prices"][row])
+    to_price = float(quote["to_prices"][row])
+    optimizer = get_route_optimizer()
+    routes = optimizer.routes(from_token, to_token, ROUTE_TOP_K + 1)
+    direct = optimizer.direct(from_token, to_token)
+    # 只附加费后汇率高于直接兑换的多跳路由，都不如直接兑换时不附加
+    multi_hop = [
+        route for route in routes
+        if route.hops > 1 and (direct is None or route.rate > direct.rate)
+    ][:ROUTE_TOP_K]
     return {
         "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
         "source": "Tavily实时搜索",
         "from_token": from_token.upper(),
         "to_token": to_token.upper(),
         "amount": amount,
-        "plans": plans,
+        "plans": engine.build_plans(quote, row) + route_plans(multi_hop, amount, direct),
+        "best_route": list(routes[0].path) if routes else [from_token.upper(), to_token.upper()],
         "market_info": {
             "current_rate": round(base_rate, 6),
             "from_price_usd": round(from_price, 2),
             "to_price_usd": round(to_price, 2),
-            "price_change_24h": round(random.uniform(-5, 5), 2),
+            "price_change_24h": round(_price_changes().get(from_token.upper(), random.uniform(-5, 5)), 2),
             "volume_24h": round(random.uniform(1000000, 5000000), 0),
-            "liquidity": "high" if amount < 1000 else "medium"
+            "liquidity": "high" if amount < 1000 else "medium",
+            "min_amount": float(quote["min_amounts"][row]),
+            "max_amount": float(quote["max_amounts"][row])
         },
         "search_info": {
             "query": f"{from_token} to {to_token} exchange rate",
             "last_updated": time.strftime("%Y-%m-%d %H:%M:%S")
-        }
+        },
+        "freshness": _freshness(float(quote["updated_at"][row]))
     }
 
+
+@tool
+async def get_exchange_plans(from_token: str, to_token: str, amount: float):
+    """
+    根据用户需求生成多种兑换方案，使用Tavily搜索获取实时汇率
+    
+    Args:
+        from_token: 源代币符号 (如 BTC, ETH)
+        to_token: 目标代币符号 (如 ETH, USDT)
+        amount: 兑换数量
+        
+    Returns:
+        dict: 包含多种兑换方案的详细信息
+    """
+    await _ensure_pair_prices(from_token, to_token)
+    
+    # 由报价引擎统一计算汇率、各档位方案和限额
+    quote = get_quote_engine().quote_batch([(from_token, to_token, amount)])
+    return _build_exchange_result(quote, 0, from_token, to_token, amount)
+
+
+async def get_exchange_plans_batch(requests: list[tuple[str, str, float]]) -> list[dict]:
+    """
+    批量生成兑换方案（与get_exchange_plans逻辑一致）
+    本批次中每个不同代币的价格只获取一次，报价由报价引擎一次向量化计算
+    
+    Args:
+        requests: [(from_token, to_token, amount), ...]
+        
+    Returns:
+        list: 与请求顺序一致的兑换方案响应
+    """
+    if not requests:
+        return []
+    symbols = {token.upper() for from_token, to_token, _ in requests for token in (from_token, to_token)}
+    await _ensure_symbol_prices(symbols)
+    quote = get_quote_engine().quote_batch(requests)
+    return [
+        _build_exchange_result(quote, row, from_token, to_token, amount)
+        for row, (from_token, to_token, amount) in enumerate(requests)
+    ]
+
 @tool
 async def get_token_list():
     """
@@ -244,79 +341,32 @@ async def get_token_list():
         dict: 包含所有可兑换代币的详细信息
     """
     try:
-        # 使用Tavily搜索获取实时加密货币数据
-        from langchain_mcp_adapters import MultiServerMCPClient
-        
-        # 创建MCP客户端
-        client = MultiServerMCPClient(
-            servers={
-                "tavily": {
-                    "command": "npx",
-                    "args": ["-y", "tavily-mcp"],
-                    "env": os.environ.copy(),
-                    "transport": "stdio"
-                }
-            }
+        # 读取价格缓存，未命中时才执行Tavily搜索
+        search_query = TOKEN_LIST_QUERY
+        _sync_shared_prices()
+        await price_flight.do(
+            "token_list",
+            lambda: get_price_cache().get_or_load("token_list", _search_token_prices),
+            timeout=TOKEN_LIST_TIMEOUT
         )
         
-        # 搜索热门加密货币价格信息
-        search_query = "top cryptocurrency prices today Bitcoin Ethereum USDT BNB ADA SOL DOT MATIC AVAX current market data"
-        search_result = await client.call_tool("tavily", "tavily_search", {
-            "query": search_query,
-            "max_results": 5,
-            "search_depth": "advanced"
-        })
-        
         # 解析搜索结果并构建代币数据
         tokens = []
         
-        # 定义主要代币的基础信息
-        token_configs = {
-            "BTC": {"name": "Bitcoin", "full_name": "比特币", "icon": "₿", "color": "#f7931a", "network": "Bitcoin", "decimals": 8},
-            "ETH": {"name": "Ethereum", "full_name": "以太坊", "icon": "Ξ", "color": "#627eea", "network": "Ethereum", "decimals": 18},
-            "USDT": {"name": "Tether", "full_name": "泰达币", "icon": "₮", "color": "#26a17b", "network": "Ethereum", "decimals": 6},
-            "BNB": {"name": "Binance Coin", "full_name": "币安币", "icon": "B", "color": "#f3ba2f", "network": "BSC", "decimals": 18},
-            "ADA": {"name": "Cardano", "full_name": "艾达币", "icon": "₳", "color": "#0033ad", "network": "Cardano", "decimals": 6},
-            "SOL": {"name": "Solana", "full_name": "索拉纳", "icon": "◎", "color": "#9945FF", "network": "Solana", "decimals": 9},
-            "DOT": {"name": "Polkadot", "full_name": "波卡", "icon": "●", "color": "#E6007A", "network": "Polkadot", "decimals": 10},
-            "MATIC": {"name": "Polygon", "full_name": "多边形", "icon": "⬟", "color": "#8247E5", "network": "Polygon", "decimals": 18},
-            "AVAX": {"name": "Avalanche", "full_name": "雪崩", "icon": "🔺", "color": "#E84142", "network": "Avalanche", "decimals": 18}
-        }
-        
-        # 从搜索结果中提取价格信息
-        search_content = search_result.get("content", "")
-        
-        for symbol, config in token_configs.items():
-            # 尝试从搜索结果中提取价格信息
-            price_usd = random.uniform(100, 50000)  # 默认价格范围
-            change_24h = random.uniform(-10, 10)    # 默认24小时变化
-            
-            # 简单的价格提取逻辑（实际项目中可以使用更复杂的解析）
-            if symbol in search_content:
-                # 尝试提取价格信息
-                import re
-                price_pattern = rf'{symbol}[:\s]*\$?([0-9,]+\.?[0-9]*)'
-                price_match = re.search(price_pattern, search_content, re.IGNORECASE)
-                if price_match:
-                    try:
-                        price_usd = float(price_match.group(1).replace(',', ''))
-                    except:
-                        pass
+        engine = get_quote_engine()
+        changes = _price_changes()
+        for symbol, config in TOKEN_CONFIGS.items():
+            # 搜索提取到的价格已写入报价引擎，未提取到的使用最近一次或默认价格
+            price_usd = engine.price(symbol)
+            change_24h = changes.get(symbol, random.uniform(-10, 10))    # 共享价格表没有数据时使用默认24小时变化
             
             # 计算其他相关数据
             price_cny = price_usd * 7.2  # 假设汇率为7.2
             market_cap = price_usd * random.uniform(1000000, 1000000000)  # 模拟市值
             volume_24h = market_cap * random.uniform(0.01, 0.1)  # 模拟24小时交易量
             
-            # 根据代币类型设置合理的兑换限制
-            if symbol == "BTC":
-                min_exchange, max_exchange, fee_rate = 0.001, 10.0, 0.001
-            elif symbol == "ETH":
-                min_exchange, max_exchange, fee_rate = 0.01, 100.0, 0.002
-            elif symbol == "USDT":
-                min_exchange, max_exchange, fee_rate = 10.0, 100000.0, 0.0005
-            else:
-                min_exchange, max_exchange, fee_rate = 1.0, 10000.0, 0.002
+            # 兑换限制由报价引擎统一维护
+            min_exchange, max_exchange, fee_rate = engine.token_limits(symbol)
             
             token_data = {
                 "symbol": symbol,
@@ -343,6 +393,7 @@ async def get_token_list():
             "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
             "source": "Tavily实时搜索",
             "tokens": tokens,
+            "freshness": _freshness(engine.freshness()),
             "search_info": {
                 "query": search_query,
                 "results_count": len(tokens),
@@ -356,6 +407,7 @@ async def get_token_list():
         return {
             "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
             "source": "备用数据",
+            "freshness": _freshness(0),
             "tokens": [
                 {
                     "symbol": "BTC",
@@ -410,18 +462,9 @@ def exchange_tokens(from_token: str, to_token: str, amount: float, user_wallet:
     Returns:
         dict: 兑换详情和审核信息
     """
-    # 模拟汇率计算
-    base_rates = {
-        "BTC": 45000,
-        "ETH": 3000,
-        "USDT": 1.0,
-        "BNB": 400,
-        "ADA": 0.6
-    }
-    
-    from_rate = base_rates.get(from_token.upper(), 1.0)
-    to_rate = base_rates.get(to_token.upper(), 1.0)
-    exchange_rate = from_rate / to_rate
+    # 使用报价引擎中的最近价格计算汇率
+    engine = get_quote_engine()
+    exchange_rate = engine.rate(from_token, to_token)
     
     # 计算费用和最终金额
     fee_rate = 0.001  # 0.1% 手续费
@@ -455,59 +498,92 @@ def exchange_tokens(from_token: str, to_token: str, amount: float, user_wallet:
         "min_amount": 0.001,
         "max_amount": 1000000.0,
         "estimated_time": "5-10分钟",
-        "network_fee": round(random.uniform(0.001, 0.01), 6)
+        "network_fee": round(random.uniform(0.001, 0.01), 6),
+        "freshness": _freshness(engine.freshness([from_token, to_token]))
     }
     
     logger.info(f"代币兑换请求: {from_token} -> {to_token}, 数量: {amount}")
     return exchange_data
 
-# 全局工具变量，避免重复初始化
+# 全局工具变量，避免重复初始化（只缓存成功加载的MCP工具，失败时下次调用重试）
 _all_tools = None
+# MCP不可用时缓存的备用工具，以及下次重试加载MCP工具的时间（time.monotonic）
+_fallback_tools: Optional[list] = None
+_tools_retry_at = 0.0
+# MCP工具加载失败后的重试间隔（秒），期间直接使用备用工具，不再等待MCP
+TOOLS_RETRY_INTERVAL = float(os.getenv("TOOLS_RETRY_INTERVAL", "30"))
+# 正在进行的工具加载任务，并发的首次请求共享同一次加载
+_tools_task: Optional[asyncio.Task] = None
+# 工具预热状态，供就绪检查使用
+tools_state = {"ready": False, "mcp": False, "tools": [], "warmed_at": None, "duration": None, "error": None}
+
+
+async def _load_all_tools() -> list:
+    """加载MCP工具，失败时返回备用工具"""
+    global _all_tools, _fallback_tools, _tools_retry_at
+    started = time.perf_counter()
+    # 通过进程级MCP会话池获取搜索工具
+    try:
+        mcp_tools = await get_mcp_pool().get_tools()
+        tools = mcp_tools + [get_token_list, get_exchange_plans]
+        _all_tools = tools
+        tools_state.update(mcp=True, error=None)
+        logger.info(f"工具初始化成功，可用工具: {[tool.name for tool in tools]}")
+    except Exception as e:
+        logger.warning(f"⚠️ MCP工具初始化失败: {e}")
+        # 如果MCP工具失败，使用备用工具
+        tools = [get_token_list, get_exchange_plans]
+        _fallback_tools = tools
+        _tools_retry_at = time.monotonic() + TOOLS_RETRY_INTERVAL
+        tools_state.update(mcp=False, error=str(e))
+        logger.info(f"使用备用工具: {[tool.name for tool in tools]}，{TOOLS_RETRY_INTERVAL:g}s后重试MCP")
+    tools_state.update(
+        ready=True,
+        tools=[tool.name for tool in tools],
+        warmed_at=time.strftime("%Y-%m-%d %H:%M:%S"),
+        duration=round(time.perf_counter() - started, 3),
+    )
+    return tools
 
+
+@metrics.timed("agent_get_all_tools")
 async def get_all_tools():
     """
     统一的工具准备函数，避免重复初始化MCP客户端
+    MCP不可用期间直接返回缓存的备用工具，到达重试时间后在后台重新加载，调用方不等待MCP
     
     Returns:
         list: 包含所有可用工具的列表
     """
-    global _all_tools
+    global _tools_task
     
     # 如果已经初始化过，直接返回
     if _all_tools is not None:
         return _all_tools
     
-    # 创建MCP客户端以获取搜索工具
-    try:
-        # 确保环境变量正确传递
-        env_vars = os.environ.copy()
-        if "TAVILY_API_KEY" not in env_vars:
-            logger.warning("⚠️ TAVILY_API_KEY 环境变量未设置")
-        
-        client = MultiServerMCPClient(
-            {
-                "tavily-mcp": {
-                    "command": "npx",
-                    "args": ["-y", "tavily-mcp"],
-                    "env": env_vars,
-                    "transport": "stdio"
-                }
-            }
-        )
-        
-        # 获取MCP工具
-        mcp_tools = await client.get_tools()
-        _all_tools = mcp_tools + [get_token_list, get_exchange_plans]
-        logger.info(f"工具初始化成功，可用工具: {[tool.name for tool in _all_tools]}")
-        
-    except Exception as e:
-        logger.warning(f"⚠️ MCP工具初始化失败: {e}")
-        # 如果MCP工具失败，使用备用工具
-        _all_tools = [get_token_list, get_exchange_plans]
-        logger.info(f"使用备用工具: {[tool.name for tool in _all_tools]}")
-    
-    return _all_tools
+    # 检查和创建之间没有await，同一事件循环内的并发调用只会启动一次加载
+    loading = _tools_task is not None and not _tools_task.done() and _tools_task.get_loop() is asyncio.get_running_loop()
+    if _fallback_tools is not None:
+        if not loading and time.monotonic() >= _tools_retry_at:
+            _tools_task = asyncio.get_running_loop().create_task(_load_all_tools(), name="load-tools")
+        return _fallback_tools
+    if not loading:
+        _tools_task = asyncio.get_running_loop().create_task(_load_all_tools(), name="load-tools")
+    # 调用方被取消时不中断共享的加载任务
+    return await asyncio.shield(_tools_task)
+
+
+async def warm_up():
+    """
+    应用启动钩子：预热MCP会话池和工具列表
+
+    Returns:
+        dict: 工具预热状态
+    """
+    await get_all_tools()
+    return tools_state
 
+@metrics.timed("agent_node", node="chat_node")
 async def chat_node(state: AgentState, config: RunnableConfig):
     """
     主要的聊天节点，基于ReAct设计模式
@@ -523,7 +599,7 @@ async def chat_node(state: AgentState, config: RunnableConfig):
     from langchain_core.messages import HumanMessage
     
     # 模拟模型响应
-    def get_mock_response(messages):
+    async def get_mock_response(messages):
         """
         智能化的模拟响应函数，使用AI理解用户意图并调用相应工具
         """
@@ -531,55 +607,15 @@ async def chat_node(state: AgentState, config: RunnableConfig):
         
         # 使用AI模型分析用户意图
         try:
-            # 创建AI模型用于意图分析
-            intent_model = ChatOpenAI(
-                model="gpt-4o-mini",
-                temperature=0.1,
-                api_key=os.getenv("OPENAI_API_KEY")
-            )
-            
-            # 构建意图分析提示
-            intent_prompt = f"""
-            分析用户消息的意图，并返回JSON格式的响应。
-            
-            用户消息: "{last_message}"
+            # 先走本地快速分类，置信度不足时才调用共享的异步模型（超时或失败时回退到规则匹配）
+            intent_data = await classify_intent(last_message)
             
-            可能的意图类型:
-            1. "token_list" - 用户想查看代币列表
-            2. "exchange" - 用户想进行代币兑换
-            3. "greeting" - 用户打招呼
-            4. "help" - 用户需要帮助
-            5. "unclear" - 意图不明确
-            
-            对于兑换意图，还需要提取:
-            - from_token: 源代币符号
-            - to_token: 目标代币符号  
-            - amount: 兑换数量
-            
-            请返回JSON格式:
-            {{
-                "intent": "意图类型",
-                "confidence": 0.9,
-                "from_token": "BTC",
-                "to_token": "ETH", 
-                "amount": 1.0,
-                "reasoning": "分析原因"
-            }}
-            """
-            
-            # 调用AI分析意图
-            intent_response = intent_model.invoke([SystemMessage(content=intent_prompt)])
-            intent_data = json.loads(intent_response.content)
-            
-            logger.info(f"🤖 AI意图分析: {intent_data}")
+            logger.info(f"🤖 AI意图分析: {intent_data}", extra={"event": "intent"})
             
             # 根据意图执行相应操作
             if intent_data["intent"] == "token_list":
                 # 检查是否已经有工具调用在历史中
-                has_any_tool_call = any(
-                    isinstance(msg, AIMessage) and msg.tool_calls 
-                    for msg in state["messages"]
-                )
+                has_any_tool_call = bool(state.get("called_tools"))
                 
                 if has_any_tool_call:
                     return AIMessage(content="代币列表已加载完成，请在界面中选择代币进行兑换。")
@@ -639,10 +675,7 @@ async def chat_node(state: AgentState, config: RunnableConfig):
             
             if has_token_list_keyword:
                 # 检查是否已经有工具调用在历史中
-                has_any_tool_call = any(
-                    isinstance(msg, AIMessage) and msg.tool_calls 
-                    for msg in state["messages"]
-                )
+                has_any_tool_call = bool(state.get("called_tools"))
                 
                 if has_any_tool_call:
                     return AIMessage(content="代币列表已加载完成，请在界面中选择代币进行兑换。")
@@ -704,7 +737,10 @@ async def chat_node(state: AgentState, config: RunnableConfig):
                 return AIMessage(content="你好！我是代币兑换助手。你可以：\n1. 说'查看代币列表'来选择代币\n2. 直接说'我要兑换 BTC 到 ETH'来获取兑换方案")
     
     # 使用模拟响应而不是真实模型
-    response = get_mock_response(state["messages"])
+    response = await get_mock_response(state["messages"])
+    
+    # 按保留策略删除窗口外的旧消息、折叠较早的工具结果
+    retained = retention_updates(state["messages"], TERMINAL_TOOLS)
     
     # 6. 检查响应中的工具调用
     if isinstance(response, AIMessage) and response.tool_calls:
@@ -716,7 +752,7 @@ async def chat_node(state: AgentState, config: RunnableConfig):
             for action in actions
         ):
             # 更新状态信息
-            updated_state = {"messages": response}
+            updated_state = {"messages": [*retained, response]}
             
             # 如果是搜索工具，更新搜索历史 - 搜索开始阶段
             if response.tool_calls[0].get("name") in ["tavily-search", "tavily-extract", "tavily-crawl"]:
@@ -732,26 +768,107 @@ async def chat_node(state: AgentState, config: RunnableConfig):
                 }
 
                 logger.info(f"🔍 添加搜索查询到历史 (开始): {search_record}")
-                print(f"🔍 添加搜索查询到历史 (开始): {search_record}")
                 search_history.append(search_record)
-                updated_state["search_history"] = search_history
+                updated_state["search_history"] = cap_search_history(search_history)
             
-            print(f"updated_state: {updated_state}")
+            debug_dump(logger, "updated_state", updated_state)
             return updated_state
     
     # 7. 所有工具调用已处理，结束对话
     # 清空搜索历史记录
     logger.info("🧹 任务结束，清空搜索历史记录")
-    return {"messages": response, "search_history": []}
+    return {"messages": [*retained, response], "search_history": []}
+
+# 搜索类MCP工具，执行完成后需要更新搜索历史
+SEARCH_TOOLS = ("tavily-search", "tavily-extract", "tavily-crawl")
+
+# 工具并发执行配置（可通过环境变量覆盖）
+TOOL_CONCURRENCY = int(os.getenv("TOOL_CONCURRENCY", "4"))
+TOOL_TIMEOUT = float(os.getenv("TOOL_TIMEOUT", "30"))
+# 自带内部超时和回退的工具，外层超时留出回退所需的余量
+TOOL_TIMEOUTS = {
+    "get_exchange_plans": QUOTE_TIMEOUT + 5,
+    "get_token_list": TOKEN_LIST_TIMEOUT + 5,
+}
+# (事件循环, 信号量)：asyncio原语绑定首次等待时的循环，事件循环变化时重建（多次asyncio.run、基准测试、reload）
+_tool_semaphore: Optional[tuple] = None
+
+
+def _get_tool_semaphore() -> asyncio.Semaphore:
+    """当前事件循环的工具并发信号量（首次使用或事件循环变化时创建）"""
+    global _tool_semaphore
+    loop = asyncio.get_running_loop()
+    if _tool_semaphore is None or _tool_semaphore[0] is not loop:
+        _tool_semaphore = (loop, asyncio.Semaphore(TOOL_CONCURRENCY))
+    return _tool_semaphore[1]
+
+
+async def _invoke_tool(tool_func, tool_args: dict):
+    """按工具类型调用工具函数"""
+    # 检查是否为LangChain工具(有.func属性)
+    if hasattr(tool_func, 'func') and callable(tool_func.func):
+        # 这是我们自定义的工具，同步函数放到线程中执行，不阻塞其他并发调用
+        if asyncio.iscoroutinefunction(tool_func.func):
+            return await tool_func.func(**tool_args)
+        return await asyncio.to_thread(tool_func.func, **tool_args)
+    if hasattr(tool_func, 'ainvoke'):
+        # 这是MCP工具，使用ainvoke方法
+        return await tool_func.ainvoke(tool_args)
+    if callable(tool_func):
+        # 直接调用工具函数
+        if asyncio.iscoroutinefunction(tool_func):
+            return await tool_func(**tool_args)
+        return await asyncio.to_thread(tool_func, **tool_args)
+    raise ValueError(f"不支持的工具类型: {type(tool_func)}")
+
+
+async def _run_tool_call(tool_map: dict, tool_call: dict) -> ToolMessage:
+    """
+    执行单个工具调用（受并发信号量和单工具超时约束）
+
+    Returns:
+        ToolMessage: 工具结果；未知工具、超时或异常时返回status为error的消息
+    """
+    tool_name = tool_call.get("name")
+    tool_args = tool_call.get("args", {})
+    tool_id = tool_call.get("id")
+    
+    if tool_name not in tool_map:
+        logger.warning(f"❌ 未知工具: {tool_name}")
+        metrics.observe("agent_tool", 0.0, error=True, tool="unknown")
+        return ToolMessage(content=f"未知工具: {tool_name}", tool_call_id=tool_id, name=tool_name, status="error")
+    
+    logger.info(f"🔧 执行工具: {tool_name}", extra={"event": "tool_call"})
+    logger.info(f"📝 参数: {tool_args}", extra={"event": "tool_call"})
+    timeout = TOOL_TIMEOUTS.get(tool_name, TOOL_TIMEOUT)
+    try:
+        async with _get_tool_semaphore():
+            with metrics.time("agent_tool", tool=tool_name):
+                result = await asyncio.wait_for(_invoke_tool(tool_map[tool_name], tool_args), timeout=timeout)
+    except asyncio.TimeoutError:
+        logger.error(f"⏱️ 工具调用超时({timeout}s): {tool_name}")
+        return ToolMessage(content=f"工具调用超时({timeout}s)", tool_call_id=tool_id, name=tool_name, status="error")
+    except Exception as e:
+        logger.error(f"❌ 工具调用失败: {tool_name}: {e}", exc_info=True)
+        return ToolMessage(content=f"工具调用失败: {str(e)}", tool_call_id=tool_id, name=tool_name, status="error")
+    
+    logger.info(f"✅ 工具调用成功: {str(result)[:100]}...", extra={"event": "tool_call"})
+    
+    # 如果结果是字典，紧凑序列化为JSON字符串；配置了持久化载荷存储时大结果外置，消息中只保留哈希引用
+    if isinstance(result, dict):
+        content = get_payload_store().externalize(compact_dumps(result), tool_name)
+    else:
+        content = str(result)
+    return ToolMessage(content=content, tool_call_id=tool_id, name=tool_name)
+
 
+@metrics.timed("agent_node", node="tool_node")
 async def tool_node(state: AgentState, config: RunnableConfig):
     """
     自定义工具调用节点，替代内置的ToolNode
     处理工具调用并返回结果
     """
-    print('*****************进入 tool_node *****************')
-    print("当前历史消息2:")
-    print(state["messages"])
+    debug_dump(logger, "tool_node 当前历史消息", state["messages"])
     
     # 获取最后一条消息
     last_message = state["messages"][-1]
@@ -760,120 +877,114 @@ async def tool_node(state: AgentState, config: RunnableConfig):
     if not isinstance(last_message, AIMessage) or not last_message.tool_calls:
         logger.warning("⚠️ 没有找到工具调用")
         return {}
-        
-    # 只处理第一个工具调用
-    tool_call = last_message.tool_calls[0]
     
     # 直接执行工具调用，不需要审核
-    logger.info("🔧 直接执行工具调用")
+    logger.info(f"🔧 并发执行 {len(last_message.tool_calls)} 个工具调用")
     
-    # 获取所有可用工具
+    # 获取所有可用工具，创建工具名称到工具函数的映射
     all_tools = await get_all_tools()
-    
-    # 创建工具名称到工具函数的映射
     tool_map = {tool.name: tool for tool in all_tools}
     
-    # 获取工具调用信息
-    tool_name = tool_call.get("name")
-    tool_args = tool_call.get("args", {})
-    tool_id = tool_call.get("id")
+    # 同一条AI消息中的全部工具调用并发执行，结果按原顺序返回，单个失败不影响其他调用
+    tool_messages = await asyncio.gather(
+        *(_run_tool_call(tool_map, tool_call) for tool_call in last_message.tool_calls)
+    )
+    updated_state = {"messages": list(tool_messages)}
     
-    logger.info(f"🔧 执行工具: {tool_name}")
-    logger.info(f"📝 参数: {tool_args}")
+    # 记录已调用的工具（O(1)查询，不随历史长度增长）
+    called_tools = dict(state.get("called_tools") or {})
+    for msg in tool_messages:
+        if msg.status != "error":
+            called_tools[msg.name] = called_tools.get(msg.name, 0) + 1
+    updated_state["called_tools"] = called_tools
     
-    if tool_name in tool_map:
-        try:
-            # 调用工具函数
-            tool_func = tool_map[tool_name]
-            
-            # 检查是否为LangChain工具(有.func属性)
-            if hasattr(tool_func, 'func') and callable(tool_func.func):
-                # 这是我们自定义的工具(如get_weather)
-                if asyncio.iscoroutinefunction(tool_func.func):
-                    result = await tool_func.func(**tool_args)
-                else:
-                    result = tool_func.func(**tool_args)
-            elif hasattr(tool_func, 'ainvoke'):
-                # 这是MCP工具，使用ainvoke方法
-                result = await tool_func.ainvoke(tool_args)
-            elif hasattr(tool_func, 'invoke'):
-                # 这是MCP工具，使用invoke方法
-                result = await tool_func.invoke(tool_args)
-            elif callable(tool_func):
-                # 直接调用工具函数
-                if asyncio.iscoroutinefunction(tool_func):
-                    result = await tool_func(**tool_args)
-                else:
-                    result = tool_func(**tool_args)
-            else:
-                raise ValueError(f"不支持的工具类型: {type(tool_func)}")
-            
-            logger.info(f"✅ 工具调用成功: {str(result)[:100]}...")
-            
-            # 创建工具结果消息
-            # 如果结果是字典，转换为JSON字符串
-            if isinstance(result, dict):
-                import json
-                content = json.dumps(result, ensure_ascii=False, indent=2)
-            else:
-                content = str(result)
-            
-            tool_message = ToolMessage(
-                content=content,
-                tool_call_id=tool_id,
-                name=tool_name
-            )
-            
-            # 如果是搜索工具，标记搜索为完成状态
-            updated_state = {"messages": [tool_message]}
-            if tool_name in ["tavily-search", "tavily-extract", "tavily-crawl"]:
-                search_history = state.get("search_history", [])
-                # 找到最近的未完成搜索记录并标记为完成
-                for record in reversed(search_history):
-                    if not record.get("completed", True) and record.get("tool_name") == tool_name:
-                        record["completed"] = True
-                        record["completed_at"] = time.strftime("%Y-%m-%d %H:%M:%S")
-                        logger.info(f"✅ 标记搜索为完成: {record['query']}")
-                        print(f"✅ 标记搜索为完成: {record['query']}")
-                        break
-                updated_state["search_history"] = search_history
-            
-        except Exception as e:
-            logger.error(f"❌ 工具调用失败: {e}")
-            import traceback
-            traceback.print_exc()
-            # 创建错误消息
-            tool_message = ToolMessage(
-                content=f"工具调用失败: {str(e)}",
-                tool_call_id=tool_id,
-                name=tool_name
-            )
-            updated_state = {"messages": [tool_message]}
-    else:
-        logger.warning(f"❌ 未知工具: {tool_name}")
-        tool_message = ToolMessage(
-            content=f"未知工具: {tool_name}",
-            tool_call_id=tool_id,
-            name=tool_name
-        )
-        updated_state = {"messages": [tool_message]}
+    # 如果是搜索工具，标记搜索为完成状态
+    completed_searches = [msg.name for msg in tool_messages if msg.name in SEARCH_TOOLS and msg.status != "error"]
+    if completed_searches:
+        search_history = state.get("search_history", [])
+        for tool_name in completed_searches:
+            # 找到最近的未完成搜索记录并标记为完成
+            for record in reversed(search_history):
+                if not record.get("completed", True) and record.get("tool_name") == tool_name:
+                    record["completed"] = True
+                    record["completed_at"] = time.strftime("%Y-%m-%d %H:%M:%S")
+                    logger.info(f"✅ 标记搜索为完成: {record['query']}")
+                    break
+        updated_state["search_history"] = cap_search_history(search_history)
     
     # 返回工具结果
     return updated_state
 
-async def create_search_agent():
+def _summarize_token_list(result: dict) -> str:
+    """代币列表工具的确定性总结"""
+    return "代币列表已加载完成，请在界面中选择代币进行兑换。"
+
+
+def _summarize_exchange_plans(result: dict) -> str:
+    """兑换方案工具的确定性总结"""
+    plans = result.get("plans", [])
+    recommended = next((plan for plan in plans if plan.get("recommended")), plans[0] if plans else None)
+    summary = (
+        f"已为您生成 {result.get('amount')} {result.get('from_token')} 兑换到 "
+        f"{result.get('to_token')} 的 {len(plans)} 种方案，请在界面中选择。"
+    )
+    if recommended:
+        summary += f"\n推荐方案：{recommended['name']}，预计获得 {recommended['estimated_output']} {result.get('to_token')}。"
+    return summary
+
+
+# 终结型工具：执行后不再回到chat_node做一次LLM分析，直接输出确定性总结并结束本轮
+TERMINAL_TOOLS = {
+    "get_token_list": _summarize_token_list,
+    "get_exchange_plans": _summarize_exchange_plans,
+}
+
+
+def _latest_tool_messages(messages: list) -> list:
+    """获取消息末尾连续的ToolMessage（即最近一次tool_node的输出）"""
+    tool_messages = []
+    for msg in reversed(messages):
+        if not isinstance(msg, ToolMessage):
+            break
+        tool_messages.append(msg)
+    return list(reversed(tool_messages))
+
+
+@metrics.timed("agent_node", node="summary_node")
+async def summary_node(state: AgentState, config: RunnableConfig):
+    """
+    终结型工具执行后的总结节点
+    根据工具结果生成确定性回复，不调用LLM
+    """
+    lines = []
+    for msg in _latest_tool_messages(state["messages"]):
+        try:
+            result = json.loads(await get_payload_store().aresolve(msg.content))
+        except PayloadMissing:
+            lines.append("结果已过期，请重新查询。")
+            continue
+        except (TypeError, ValueError):
+            lines.append(str(msg.content)[:200])
+            continue
+        lines.append(TERMINAL_TOOLS[msg.name](result))
+    
+    logger.info("🧹 任务结束，清空搜索历史记录")
+    return {"messages": AIMessage(content="\n".join(lines)), "search_history": []}
+
+
+def create_search_agent():
     """创建使用定制状态的搜索智能体
     
+    只编译图结构，不做任何I/O；工具在首次使用或启动钩子 warm_up() 中加载
+    
     Returns:
         配置好的LangGraph StateGraph
     """
-    # 获取所有工具（用于验证工具可用性）
-    all_tools = await get_all_tools()
-    
     # 创建状态图
     workflow = StateGraph(AgentState)
     workflow.add_node("chat_node", chat_node)
     workflow.add_node("tool_node", tool_node)  # 使用自定义的tool_node
+    workflow.add_node("summary_node", summary_node)
     workflow.set_entry_point("chat_node")
     
     # 添加条件边缘
@@ -893,53 +1004,36 @@ async def create_search_agent():
         }
     )
     
-    # 从工具节点回到聊天节点
-    workflow.add_edge("tool_node", "chat_node")
+    def after_tools(state: AgentState):
+        """全部为终结型工具时直接总结结束，否则回到聊天节点"""
+        tool_messages = _latest_tool_messages(state["messages"])
+        if tool_messages and all(msg.name in TERMINAL_TOOLS for msg in tool_messages):
+            return "summary_node"
+        return "chat_node"
     
-    # 创建内存检查点保存器
-    checkpointer = MemorySaver()
+    # 从工具节点回到聊天节点（终结型工具直接进入总结节点）
+    workflow.add_conditional_edges(
+        "tool_node",
+        after_tools,
+        {
+            "summary_node": "summary_node",
+            "chat_node": "chat_node"
+        }
+    )
+    workflow.add_edge("summary_node", END)
+    
+    # 检查点存储：bounded（按线程TTL/LRU淘汰，默认）、memory（不限量的MemorySaver）
+    # 或 sqlite（CHECKPOINT_SQLITE_PATH 指定的WAL数据库，多个worker共享、重启不丢会话）
+    checkpointer = build_checkpointer(os.getenv("AGENT_CHECKPOINTER", "bounded"))
     
     # 编译并返回图
     agent = workflow.compile(checkpointer=checkpointer)
     return agent
 
-# 创建全局graph实例
-graph = None
-
-async def get_graph():
-    """获取graph实例，如果不存在则创建"""
-    print("正在获取或创建搜索智能体...")
-    global graph
-    if graph is None:
-        graph = await create_search_agent()
-    return graph
-
-# 创建全局graph实例
-graph = None
+# 创建全局graph实例（导入时只编译图，不启动MCP子进程）
+graph = create_search_agent()
 
 async def get_graph():
-    """获取graph实例，如果不存在则创建"""
-    global graph
-    if graph is None:
-        graph = await create_search_agent()
+    """获取graph实例，并确保工具已加载"""
+    await get_all_tools()
     return graph
-
-# 运行初始化
-try:
-    print("正在初始化graph...")
-    asyncio.run(get_graph())
-except Exception as e:
-    print(f"初始化graph失败: {e}")
-    # 创建一个简单的fallback graph
-    workflow = StateGraph(AgentState)
-    
-    async def simple_chat_node(state: AgentState, config: RunnableConfig):
-        # 使用简单的模拟响应
-        last_message = state["messages"][-1].content if state["messages"] else "你好"
-        response = AIMessage(content=f"你好！我是智能助手。你刚才说：{last_message}")
-        return Command(goto=END, update={"messages": response})
-    
-    workflow.add_node("chat_node", simple_chat_node)
-    workflow.set_entry_point("chat_node")
-    checkpointer = MemorySaver()
-    graph = workflow.compile(checkpointer=checkpointer)
@@ -0,0 +1,545 @@
+"""
+检查点存储
+- BoundedMemorySaver: 有界的内存检查点保存器，替代无上限的MemorySaver
+- SqliteCheckpointSaver: SQLite(WAL)持久化检查点，支持多个uvicorn worker共享，按图步骤批量写入
+"""
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Iterator, Optional
+
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from langgraph.checkpoint.memory import MemorySaver
+
+from sample_agent.metrics import get_metrics
+
+logger = logging.getLogger("agent")
+metrics = get_metrics()
+
+# 检查点配置（可通过环境变量覆盖）
+DEFAULT_MAX_THREADS = int(os.getenv("CHECKPOINT_MAX_THREADS", "1000"))
+DEFAULT_MAX_BYTES = int(os.getenv("CHECKPOINT_MAX_BYTES", str(256 * 1024 * 1024)))
+DEFAULT_THREAD_TTL = float(os.getenv("CHECKPOINT_THREAD_TTL", str(6 * 3600)))
+DEFAULT_MAX_PER_THREAD = int(os.getenv("CHECKPOINT_MAX_PER_THREAD", "20"))
+DEFAULT_SQLITE_PATH = os.getenv("CHECKPOINT_SQLITE_PATH", "checkpoints.db")
+# 超过该字节数的序列化数据使用zlib压缩
+COMPRESS_THRESHOLD = int(os.getenv("CHECKPOINT_COMPRESS_THRESHOLD", "1024"))
+# 异步写入的批量合并窗口（秒）：同一步骤内的多次put_writes合并为一个事务
+# 默认0表示每次put_writes立即写入；大于0时缓冲期间的写入只在本worker内存中，其他worker暂时读不到
+DEFAULT_FLUSH_DELAY = float(os.getenv("CHECKPOINT_FLUSH_DELAY", "0"))
+# 后台批量写入失败后的重试间隔（秒）
+FLUSH_RETRY_DELAY = 1.0
+# 监控用的检查点/会话数在事件循环上只读缓存，超过该间隔（秒）后在工作线程中重新统计
+STATS_REFRESH_INTERVAL = float(os.getenv("CHECKPOINT_STATS_INTERVAL", "15"))
+
+
+def _typed_size(value: Any) -> int:
+    """序列化结果 (type, bytes) 的字节数"""
+    if isinstance(value, tuple) and len(value) >= 2 and isinstance(value[1], (bytes, bytearray)):
+        return len(value[1])
+    return 0
+
+
+class BoundedMemorySaver(MemorySaver):
+    """
+    有界的内存检查点保存器
+    - 线程超过ttl秒未访问即删除
+    - 线程数或总字节数超限时按LRU淘汰最久未访问的线程
+    - 每个线程(每个命名空间)只保留最近max_per_thread个检查点及其写入和通道数据
+    """
+
+    def __init__(
+        self,
+        *,
+        max_threads: int = DEFAULT_MAX_THREADS,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        thread_ttl: float = DEFAULT_THREAD_TTL,
+        max_per_thread: int = DEFAULT_MAX_PER_THREAD,
+        **kwargs: Any,
+    ):
+        super().__init__(**kwargs)
+        self.max_threads = max(1, max_threads)
+        self.max_bytes = max_bytes
+        self.thread_ttl = thread_ttl
+        self.max_per_thread = max(1, max_per_thread)
+        # thread_id -> 最近访问时间（按访问顺序排列）
+        self._access: "OrderedDict[str, float]" = OrderedDict()
+        self._thread_bytes: dict[str, int] = {}
+        self._total_bytes = 0
+        # (thread_id, checkpoint_ns, checkpoint_id) -> channel_versions，用于清理不再引用的通道数据
+        self._versions: dict[tuple, dict] = {}
+        self._blob_keys: dict[str, set] = {}
+        self.counters = {"lru_evictions": 0, "ttl_evictions": 0, "trimmed_checkpoints": 0}
+
+    def _touch(self, thread_id: str):
+        self._access[thread_id] = time.monotonic()
+        self._access.move_to_end(thread_id)
+
+    def _expire(self, exclude: Optional[str] = None):
+        """删除超过TTL未访问的线程（从最旧的开始检查）"""
+        now = time.monotonic()
+        while self._access:
+            thread_id, last_access = next(iter(self._access.items()))
+            if now - last_access <= self.thread_ttl or thread_id == exclude:
+                break
+            self.delete_thread(thread_id)
+            self.counters["ttl_evictions"] += 1
+
+    def _enforce_limits(self, current: str):
+        """线程数或内存超限时按LRU淘汰，当前线程不会被淘汰"""
+        while len(self._access) > self.max_threads or self.total_bytes() > self.max_bytes:
+            victim = next((t for t in self._access if t != current), None)
+            if victim is None:
+                break
+            logger.info(f"🧹 检查点超限，淘汰线程: {victim}")
+            self.delete_thread(victim)
+            self.counters["lru_evictions"] += 1
+
+    def _trim(self, thread_id: str, checkpoint_ns: str):
+        """只保留最近的max_per_thread个检查点，并清理不再被引用的通道数据"""
+        checkpoints = self.storage[thread_id][checkpoint_ns]
+        if len(checkpoints) > self.max_per_thread:
+            # 检查点ID为单调递增的uuid6，按字典序即按时间排序
+            for checkpoint_id in sorted(checkpoints)[: len(checkpoints) - self.max_per_thread]:
+                del checkpoints[checkpoint_id]
+                self.writes.pop((thread_id, checkpoint_ns, checkpoint_id), None)
+                self._versions.pop((thread_id, checkpoint_ns, checkpoint_id), None)
+                self.counters["trimmed_checkpoints"] += 1
+
+            referenced = set()
+            for checkpoint_id in checkpoints:
+                versions = self._versions.get((thread_id, checkpoint_ns, checkpoint_id), {})
+                referenced.update((checkpoint_ns, k, v) for k, v in versions.items())
+            blob_keys = self._blob_keys.get(thread_id, set())
+            for key in [k for k in blob_keys if k[0] == checkpoint_ns and k not in referenced]:
+                self.blobs.pop((thread_id, *key), None)
+                blob_keys.discard(key)
+
+    def _measure(self, thread_id: str):
+        size = 0
+        for checkpoint_ns, checkpoints in self.storage.get(thread_id, {}).items():
+            for checkpoint_id, saved in checkpoints.items():
+                size += _typed_size(saved[0]) + _typed_size(saved[1])
+                writes = self.writes.get((thread_id, checkpoint_ns, checkpoint_id), {})
+                size += sum(_typed_size(w[2]) for w in writes.values())
+        for key in self._blob_keys.get(thread_id, ()):
+            size += _typed_size(self.blobs.get((thread_id, *key)))
+        self._total_bytes += size - self._thread_bytes.get(thread_id, 0)
+        self._thread_bytes[thread_id] = size
+
+    @metrics.timed("agent_stage", stage="checkpoint_put")
+    def put(self, config, checkpoint, metadata, new_versions):
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        result = super().put(config, checkpoint, metadata, new_versions)
+        self._versions[(thread_id, checkpoint_ns, checkpoint["id"])] = dict(checkpoint["channel_versions"])
+        self._blob_keys.setdefault(thread_id, set()).update((checkpoint_ns, k, v) for k, v in new_versions.items())
+        self._trim(thread_id, checkpoint_ns)
+        self._measure(thread_id)
+        self._touch(thread_id)
+        self._expire(exclude=thread_id)
+        self._enforce_limits(thread_id)
+        return result
+
+    def put_writes(self, config, writes, task_id, task_path=""):
+        super().put_writes(config, writes, task_id, task_path)
+        self._touch(config["configurable"]["thread_id"])
+
+    def get_tuple(self, config):
+        thread_id = config["configurable"]["thread_id"]
+        last_access = self._access.get(thread_id)
+        if last_access is not None and time.monotonic() - last_access > self.thread_ttl:
+            self.delete_thread(thread_id)
+            self.counters["ttl_evictions"] += 1
+            return None
+        result = super().get_tuple(config)
+        if result is not None:
+            self._touch(thread_id)
+        return result
+
+    def delete_thread(self, thread_id: str) -> None:
+        super().delete_thread(thread_id)
+        self._access.pop(thread_id, None)
+        self._total_bytes -= self._thread_bytes.pop(thread_id, 0)
+        self._blob_keys.pop(thread_id, None)
+        for key in [k for k in self._versions if k[0] == thread_id]:
+            del self._versions[key]
+
+    def total_bytes(self) -> int:
+        """当前检查点数据的总字节数（序列化后大小）"""
+        return self._total_bytes
+
+    def stats(self) -> dict:
+        """内存使用统计，用于监控"""
+        return {
+            **self.counters,
+            "threads": len(self._access),
+            "checkpoints": sum(len(c) for ns in self.storage.values() for c in ns.values()),
+            "bytes": self.total_bytes(),
+            "max_threads": self.max_threads,
+            "max_bytes": self.max_bytes,
+        }
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    parent_checkpoint_id TEXT,
+    type TEXT NOT NULL,
+    checkpoint BLOB NOT NULL,
+    metadata_type TEXT NOT NULL,
+    metadata BLOB NOT NULL,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    type TEXT NOT NULL,
+    value BLOB NOT NULL,
+    task_path TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+"""
+
+
+class SqliteCheckpointSaver(BaseCheckpointSaver):
+    """
+    SQLite持久化检查点保存器
+    - WAL模式，多个worker进程可共享同一个数据库文件，重启后会话不丢失
+    - 状态使用serde的msgpack二进制序列化，较大的数据再用zlib压缩
+    - flush_delay > 0 时，异步路径下同一图步骤的put_writes先缓冲，与下一次put（或短暂延迟后）合并为一个事务写入；
+      写入失败时缓冲的数据放回队列，稍后重试
+    """
+
+    def __init__(self, path: str = DEFAULT_SQLITE_PATH, *, flush_delay: float = DEFAULT_FLUSH_DELAY, **kwargs: Any):
+        super().__init__(**kwargs)
+        self.path = path
+        self.flush_delay = flush_delay
+        # _lock 保护数据库连接（整个事务期间持有）；_pending_lock 只保护缓冲队列和定时器，持有时间很短
+        self._lock = threading.Lock()
+        self._pending_lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._pending: list[tuple] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._flush_tasks: set[asyncio.Task] = set()
+        self.counters = {"transactions": 0, "batched_writes": 0, "flush_errors": 0}
+        # 最近一次统计的 {"threads", "checkpoints"} 及统计时间（time.monotonic）
+        self._db_stats = {"threads": 0, "checkpoints": 0}
+        self._stats_at: Optional[float] = None
+        self._stats_task: Optional[asyncio.Task] = None
+
+    # ---- 序列化 ----
+
+    def _dump(self, value: Any) -> tuple[str, bytes]:
+        type_, data = self.serde.dumps_typed(value)
+        if len(data) > COMPRESS_THRESHOLD:
+            return f"{type_}+z", zlib.compress(data, 1)
+        return type_, data
+
+    def _load(self, type_: str, data: bytes) -> Any:
+        if type_.endswith("+z"):
+            return self.serde.loads_typed((type_[:-2], zlib.decompress(data)))
+        return self.serde.loads_typed((type_, data))
+
+    # ---- 写入 ----
+
+    def _write_rows(self, writes: list[tuple]):
+        """在一个事务中写入缓冲的写入和（可选的）检查点"""
+        with self._lock:
+            with self._pending_lock:
+                pending, self._pending = self._pending, []
+            if not pending and not writes:
+                return
+            try:
+                self._conn.execute("BEGIN IMMEDIATE")
+                for sql, params in pending + writes:
+                    self._conn.execute(sql, params)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                if self._conn.in_transaction:
+                    self._conn.execute("ROLLBACK")
+                # 缓冲的写入放回队首，保持原有顺序，下次写入时重试
+                with self._pending_lock:
+                    self._pending[:0] = pending
+                raise
+            self.counters["transactions"] += 1
+            self.counters["batched_writes"] += len(pending)
+
+    def _flush(self):
+        """落盘缓冲的写入（可在任意线程调用，不触碰事件循环上的定时器）"""
+        self._write_rows([])
+
+    def _schedule_flush(self, delay: float):
+        """在事件循环上安排一次延迟落盘（已有定时器时不重复安排）"""
+        loop = asyncio.get_running_loop()
+        with self._pending_lock:
+            if self._flush_handle is None:
+                self._flush_handle = loop.call_later(delay, self._start_flush)
+
+    def _start_flush(self):
+        with self._pending_lock:
+            self._flush_handle = None
+        task = asyncio.get_running_loop().create_task(asyncio.to_thread(self._flush))
+        self._flush_tasks.add(task)
+        task.add_done_callback(self._flush_done)
+
+    def _flush_done(self, task: asyncio.Task):
+        self._flush_tasks.discard(task)
+        if task.cancelled() or task.exception() is None:
+            return
+        self.counters["flush_errors"] += 1
+        logger.warning(f"⚠️ 检查点批量写入失败，{FLUSH_RETRY_DELAY:g}s后重试: {task.exception()}")
+        self._schedule_flush(FLUSH_RETRY_DELAY)
+
+    def _writes_rows(self, config, writes, task_id: str, task_path: str) -> list[tuple]:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        rows = []
+        for idx, (channel, value) in enumerate(writes):
+            write_idx = WRITES_IDX_MAP.get(channel, idx)
+            # 普通写入保留首次结果，特殊写入（错误、中断等）覆盖
+            verb = "INSERT OR IGNORE" if write_idx >= 0 else "INSERT OR REPLACE"
+            type_, data = self._dump(value)
+            rows.append((
+                f"{verb} INTO writes (thread_id, checkpoint_ns, checkpoint_id, task_id, idx, channel, type, value, task_path) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (thread_id, checkpoint_ns, checkpoint_id, task_id, write_idx, channel, type_, data, task_path),
+            ))
+        return rows
+
+    @metrics.timed("agent_stage", stage="checkpoint_put")
+    def put(self, config, checkpoint, metadata, new_versions):
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        type_, data = self._dump(checkpoint)
+        metadata_type, metadata_data = self._dump(get_checkpoint_metadata(config, metadata))
+        self._write_rows([(
+            "INSERT OR REPLACE INTO checkpoints "
+            "(thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                thread_id,
+                checkpoint_ns,
+                checkpoint["id"],
+                config["configurable"].get("checkpoint_id"),
+                type_,
+                data,
+                metadata_type,
+                metadata_data,
+            ),
+        )])
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    def put_writes(self, config, writes, task_id, task_path=""):
+        self._write_rows(self._writes_rows(config, writes, task_id, task_path))
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        # 缓冲的写入随本次put一起落盘
+        with self._pending_lock:
+            if self._flush_handle is not None:
+                self._flush_handle.cancel()
+                self._flush_handle = None
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config, writes, task_id, task_path=""):
+        rows = self._writes_rows(config, writes, task_id, task_path)
+        if self.flush_delay <= 0:
+            await asyncio.to_thread(self._write_rows, rows)
+            return
+        with self._pending_lock:
+            self._pending.extend(rows)
+        # 没有后续put时（如本轮结束或中断），延迟后自动落盘
+        self._schedule_flush(self.flush_delay)
+
+    # ---- 读取 ----
+
+    def _pending_writes(self, thread_id: str, checkpoint_ns: str, checkpoint_id: str) -> list:
+        rows = self._conn.execute(
+            "SELECT task_id, channel, type, value FROM writes "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? ORDER BY task_id, idx",
+            (thread_id, checkpoint_ns, checkpoint_id),
+        ).fetchall()
+        return [(task_id, channel, self._load(type_, value)) for task_id, channel, type_, value in rows]
+
+    def _to_tuple(self, thread_id: str, checkpoint_ns: str, row: tuple, metadata: Optional[dict] = None) -> CheckpointTuple:
+        checkpoint_id, parent_checkpoint_id, type_, data, metadata_type, metadata_data = row
+        return CheckpointTuple(
+            config={
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": checkpoint_id,
+                }
+            },
+            checkpoint=self._load(type_, data),
+            metadata=metadata if metadata is not None else self._load(metadata_type, metadata_data),
+            parent_config=(
+                {
+                    "configurable": {
+                        "thread_id": thread_id,
+                        "checkpoint_ns": checkpoint_ns,
+                        "checkpoint_id": parent_checkpoint_id,
+                    }
+                }
+                if parent_checkpoint_id
+                else None
+            ),
+            pending_writes=self._pending_writes(thread_id, checkpoint_ns, checkpoint_id),
+        )
+
+    def get_tuple(self, config):
+        self._flush()
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        columns = "checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata"
+        with self._lock:
+            if checkpoint_id := get_checkpoint_id(config):
+                row = self._conn.execute(
+                    f"SELECT {columns} FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                    (thread_id, checkpoint_ns, checkpoint_id),
+                ).fetchone()
+            else:
+                row = self._conn.execute(
+                    f"SELECT {columns} FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+                    "ORDER BY checkpoint_id DESC LIMIT 1",
+                    (thread_id, checkpoint_ns),
+                ).fetchone()
+            if row is None:
+                return None
+            return self._to_tuple(thread_id, checkpoint_ns, row)
+
+    def list(self, config, *, filter=None, before=None, limit=None) -> Iterator[CheckpointTuple]:
+        self._flush()
+        clauses, params = [], []
+        if config is not None:
+            clauses.append("thread_id = ?")
+            params.append(config["configurable"]["thread_id"])
+            if (checkpoint_ns := config["configurable"].get("checkpoint_ns")) is not None:
+                clauses.append("checkpoint_ns = ?")
+                params.append(checkpoint_ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                clauses.append("checkpoint_id = ?")
+                params.append(checkpoint_id)
+        if before is not None and (before_id := get_checkpoint_id(before)):
+            clauses.append("checkpoint_id < ?")
+            params.append(before_id)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, "
+                f"metadata_type, metadata FROM checkpoints {where} ORDER BY checkpoint_id DESC",
+                params,
+            ).fetchall()
+            results = []
+            for thread_id, checkpoint_ns, *row in rows:
+                metadata = self._load(row[4], row[5])
+                if filter and not all(metadata.get(k) == v for k, v in filter.items()):
+                    continue
+                results.append(self._to_tuple(thread_id, checkpoint_ns, tuple(row), metadata))
+                if limit is not None and len(results) >= limit:
+                    break
+        yield from results
+
+    async def aget_tuple(self, config):
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(self, config, *, filter=None, before=None, limit=None) -> AsyncIterator[CheckpointTuple]:
+        results = await asyncio.to_thread(lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+        for item in results:
+            yield item
+
+    def delete_thread(self, thread_id: str) -> None:
+        self._flush()
+        with self._lock:
+            self._conn.execute("DELETE FROM checkpoints WHERE thread_id = ?", (thread_id,))
+            self._conn.execute("DELETE FROM writes WHERE thread_id = ?", (thread_id,))
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+    def _count(self) -> dict:
+        """统计检查点和会话数（全表扫描，阻塞）"""
+        with self._lock:
+            checkpoints = self._conn.execute("SELECT COUNT(*) FROM checkpoints").fetchone()[0]
+            threads = self._conn.execute("SELECT COUNT(DISTINCT thread_id) FROM checkpoints").fetchone()[0]
+        return {"threads": threads, "checkpoints": checkpoints}
+
+    def _refresh_done(self, task: asyncio.Task):
+        self._stats_task = None
+        if task.cancelled():
+            return
+        if task.exception() is not None:
+            logger.warning(f"⚠️ 检查点统计失败: {task.exception()}")
+            return
+        self._db_stats = task.result()
+
+    def stats(self) -> dict:
+        """
+        存储统计，用于监控
+        在事件循环中调用时返回缓存的数据库统计，过期后在工作线程中刷新（不阻塞本次调用）；
+        没有运行中的事件循环时同步统计
+        """
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        if loop is None:
+            self._db_stats = self._count()
+            self._stats_at = time.monotonic()
+        elif self._stats_task is None and (
+            self._stats_at is None or time.monotonic() - self._stats_at >= STATS_REFRESH_INTERVAL
+        ):
+            self._stats_at = time.monotonic()
+            self._stats_task = loop.create_task(asyncio.to_thread(self._count))
+            self._stats_task.add_done_callback(self._refresh_done)
+        return {**self.counters, **self._db_stats, "pending": len(self._pending)}
+
+    def close(self):
+        """落盘缓冲的写入并关闭连接"""
+        self._flush()
+        self._conn.close()
+
+
+def build_checkpointer(kind: str = "bounded", **options: Any):
+    """
+    根据配置创建检查点保存器
+
+    Args:
+        kind: "memory"（不限量的MemorySaver）、"bounded"（BoundedMemorySaver）
+              或 "sqlite"（SqliteCheckpointSaver，可多worker共享）
+        options: 传给检查点保存器的其他参数
+    """
+    if kind == "memory":
+        return MemorySaver()
+    if kind == "bounded":
+        return BoundedMemorySaver(**options)
+    if kind == "sqlite":
+        return SqliteCheckpointSaver(**options)
+    raise ValueError(f"未知的检查点类型: {kind}")
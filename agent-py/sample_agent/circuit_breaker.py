@@ -0,0 +1,144 @@
+"""
+熔断器 - 保护对Tavily/MCP等外部依赖的调用
+故障期间直接快速失败，由调用方立即回退到默认数据，而不是每次都等到超时
+"""
+import logging
+import os
+import time
+from collections import deque
+from typing import Optional
+
+logger = logging.getLogger("agent")
+
+# 熔断器配置（可通过环境变量覆盖）
+DEFAULT_WINDOW = int(os.getenv("MCP_BREAKER_WINDOW", "20"))
+DEFAULT_MIN_CALLS = int(os.getenv("MCP_BREAKER_MIN_CALLS", "5"))
+DEFAULT_FAILURE_RATE = float(os.getenv("MCP_BREAKER_FAILURE_RATE", "0.5"))
+DEFAULT_COOLDOWN = float(os.getenv("MCP_BREAKER_COOLDOWN", "30"))
+DEFAULT_HALF_OPEN_CALLS = int(os.getenv("MCP_BREAKER_HALF_OPEN_CALLS", "1"))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(RuntimeError):
+    """熔断器打开时拒绝调用"""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"{name} 熔断中，{retry_after:.1f}s后重试")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    基于失败率的熔断器
+    - closed: 记录最近 window 次调用结果，至少 min_calls 次且失败率达到阈值时打开
+    - open: 在 cooldown 秒内拒绝所有调用
+    - half_open: 冷却结束后放行最多 half_open_calls 个探测调用，成功则关闭，失败则重新打开
+
+    用法:
+        breaker.before_call()   # 打开时抛出 CircuitOpenError
+        ... 调用外部依赖 ...
+        breaker.record_success() / breaker.record_failure()（被取消时 breaker.release()）
+    """
+
+    def __init__(
+        self,
+        name: str,
+        window: int = DEFAULT_WINDOW,
+        min_calls: int = DEFAULT_MIN_CALLS,
+        failure_rate: float = DEFAULT_FAILURE_RATE,
+        cooldown: float = DEFAULT_COOLDOWN,
+        half_open_calls: int = DEFAULT_HALF_OPEN_CALLS,
+    ):
+        self.name = name
+        self.min_calls = max(1, min_calls)
+        self.failure_rate = failure_rate
+        self.cooldown = cooldown
+        self.half_open_calls = max(1, half_open_calls)
+        self.state = CLOSED
+        # 最近调用结果，True表示失败
+        self._outcomes: deque = deque(maxlen=max(self.min_calls, window))
+        self._opened_at = 0.0
+        self._probes = 0
+        self.counters = {"successes": 0, "failures": 0, "rejected": 0, "opened": 0, "half_opened": 0, "closed": 0}
+
+    def _transition(self, state: str, reason: str):
+        previous, self.state = self.state, state
+        if state == OPEN:
+            self._opened_at = time.monotonic()
+            self.counters["opened"] += 1
+            logger.warning(f"🚨 熔断器[{self.name}] {previous} -> open: {reason}，冷却 {self.cooldown}s")
+        elif state == HALF_OPEN:
+            self._probes = 0
+            self.counters["half_opened"] += 1
+            logger.info(f"🔁 熔断器[{self.name}] open -> half_open: {reason}")
+        else:
+            self._outcomes.clear()
+            self.counters["closed"] += 1
+            logger.info(f"✅ 熔断器[{self.name}] {previous} -> closed: {reason}")
+
+    def retry_after(self) -> float:
+        """距离冷却结束的剩余秒数"""
+        if self.state != OPEN:
+            return 0.0
+        return max(0.0, self._opened_at + self.cooldown - time.monotonic())
+
+    def before_call(self):
+        """
+        调用前检查是否放行
+
+        Raises:
+            CircuitOpenError: 熔断器打开，或半开状态下探测名额已用完
+        """
+        if self.state == OPEN:
+            if self.retry_after() > 0:
+                self.counters["rejected"] += 1
+                raise CircuitOpenError(self.name, self.retry_after())
+            self._transition(HALF_OPEN, "冷却结束，开始探测")
+        if self.state == HALF_OPEN:
+            if self._probes >= self.half_open_calls:
+                self.counters["rejected"] += 1
+                raise CircuitOpenError(self.name, 0.0)
+            self._probes += 1
+
+    def release(self):
+        """调用被取消（既不算成功也不算失败）时归还半开探测名额"""
+        if self.state == HALF_OPEN and self._probes > 0:
+            self._probes -= 1
+
+    def record_success(self):
+        self.counters["successes"] += 1
+        if self.state == HALF_OPEN:
+            self._transition(CLOSED, "探测调用成功")
+            return
+        self._outcomes.append(False)
+
+    def record_failure(self):
+        self.counters["failures"] += 1
+        if self.state == HALF_OPEN:
+            self._transition(OPEN, "探测调用失败")
+            return
+        if self.state == OPEN:
+            return
+        self._outcomes.append(True)
+        rate = self.current_failure_rate()
+        if len(self._outcomes) >= self.min_calls and rate is not None and rate >= self.failure_rate:
+            self._transition(OPEN, f"最近{len(self._outcomes)}次调用失败率 {rate:.0%}")
+
+    def current_failure_rate(self) -> Optional[float]:
+        if not self._outcomes:
+            return None
+        return sum(self._outcomes) / len(self._outcomes)
+
+    def snapshot(self) -> dict:
+        """熔断器状态，用于监控"""
+        rate = self.current_failure_rate()
+        return {
+            "state": self.state,
+            "failure_rate": round(rate, 4) if rate is not None else 0.0,
+            "window_calls": len(self._outcomes),
+            "retry_after": round(self.retry_after(), 3),
+            **self.counters,
+        }
@@ -3,17 +3,72 @@ This serves the "sample_agent" agent. This is an example of self-hosting an agen
 through our FastAPI integration. However, you can also host in LangGraph platform.
 """
 
+import asyncio
+import hmac
 import os
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 load_dotenv() # pylint: disable=wrong-import-position
 
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
+from pydantic import BaseModel, Field
 import uvicorn
 from copilotkit.integrations.fastapi import add_fastapi_endpoint
 from copilotkit import CopilotKitRemoteEndpoint, LangGraphAgent
-from sample_agent.agent import graph
+from sample_agent.admission import AdmissionMiddleware, get_admission_controller
+from sample_agent.agent import graph, get_exchange_plans_batch, price_flight, refresh_all_prices, tools_state, warm_up
+from sample_agent.intent import close_intent_model, intent_counters
+from sample_agent.intent_cache import get_intent_cache
+from sample_agent.loop_monitor import get_loop_monitor
+from sample_agent.mcp_pool import get_mcp_pool, shutdown_mcp_pool
+from sample_agent.metrics import get_metrics
+from sample_agent.payload_store import get_payload_store
+from sample_agent.price_cache import get_price_cache
+from sample_agent.price_refresher import PriceRefresher
+from sample_agent.quote_engine import get_quote_engine
+from sample_agent.profiler import ProfilerBusy, render_collapsed, sample_stacks
+from sample_agent.retention import merge_new_messages
+from sample_agent.shared_prices import get_shared_price_table
+
+
+def _is_price_writer() -> bool:
+    """
+    多worker共享价格表时只有写入者刷新价格；其他worker每轮尝试接任（写入者退出后锁自动释放）
+    """
+    shared = get_shared_price_table()
+    return shared is None or shared.try_become_writer()
+
+
+# 后台价格刷新（PRICE_REFRESH_ENABLED=0 关闭）
+price_refresher = PriceRefresher(refresh_all_prices, should_run=_is_price_writer)
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    """
+    应用生命周期：后台预热工具、启动价格刷新和事件循环延迟监控（不阻塞服务启动）；
+    退出时停止后台任务并关闭常驻的MCP会话池和意图模型连接池
+    """
+    if os.getenv("LOOP_MONITOR_ENABLED", "1") != "0":
+        get_loop_monitor().start()
+    warm_task = asyncio.create_task(warm_up(), name="agent-warm-up")
+    if os.getenv("PRICE_REFRESH_ENABLED", "1") != "0":
+        price_refresher.start()
+    yield
+    warm_task.cancel()
+    await price_refresher.stop()
+    await shutdown_mcp_pool()
+    await close_intent_model()
+    await asyncio.to_thread(get_intent_cache().close)
+    await asyncio.to_thread(get_payload_store().close)
+    if get_shared_price_table() is not None:
+        get_shared_price_table().close()
+    await get_loop_monitor().stop()
+
+
+app = FastAPI(lifespan=lifespan)
 
-app = FastAPI()
 sdk = CopilotKitRemoteEndpoint(
     agents=[
         LangGraphAgent(
@@ -21,12 +76,177 @@ sdk = CopilotKitRemoteEndpoint(
             description="一个模拟智能体",
             graph=graph,
             config={"recursion_limit": 50},  # 增加递归限制
+            # 只合并前端的新消息，避免保留策略删除的旧消息被重新加回
+            copilotkit_config={"merge_state": merge_new_messages},
         )
     ],
 )
 
 add_fastapi_endpoint(app, sdk, "/copilotkit")
 
+# 智能体执行请求的准入控制：全局并发上限 + 有界等待队列 + 每会话令牌桶（ADMISSION_ENABLED=0 关闭）
+# info、状态查询等其他 /copilotkit 请求不受限制
+if os.getenv("ADMISSION_ENABLED", "1") != "0":
+    app.add_middleware(AdmissionMiddleware, controller=get_admission_controller(), prefix="/copilotkit")
+
+# 单次批量报价的最大交易对数量
+BATCH_QUOTE_LIMIT = int(os.getenv("BATCH_QUOTE_LIMIT", "100"))
+
+
+class QuoteRequest(BaseModel):
+    """单个兑换报价请求"""
+    from_token: str = Field(min_length=1, max_length=16)
+    to_token: str = Field(min_length=1, max_length=16)
+    amount: float = Field(gt=0)
+
+
+class BatchQuoteRequest(BaseModel):
+    """批量兑换报价请求"""
+    quotes: list[QuoteRequest] = Field(min_length=1, max_length=BATCH_QUOTE_LIMIT)
+
+
+@app.post("/quotes/batch")
+async def batch_quotes(request: BatchQuoteRequest):
+    """
+    批量报价：一次返回多个交易对的全部兑换方案，不经过LangGraph对话
+    包含报价引擎不支持的代币时整批返回422（不为未知代币发起搜索，也不返回占位价格）
+    """
+    supported = get_quote_engine().index
+    unsupported = sorted({
+        token.upper() for q in request.quotes for token in (q.from_token, q.to_token)
+        if token.upper() not in supported
+    })
+    if unsupported:
+        raise HTTPException(
+            status_code=422,
+            detail={"error": "unsupported tokens", "tokens": unsupported, "supported": list(supported)},
+        )
+    results = await get_exchange_plans_batch(
+        [(q.from_token, q.to_token, q.amount) for q in request.quotes]
+    )
+    return {"count": len(results), "quotes": results}
+
+# 熔断器状态数值: closed=0, half_open=1, open=2
+BREAKER_STATES = {"closed": 0, "half_open": 1, "open": 2}
+
+
+def _runtime_metrics():
+    """输出时采集缓存命中率、意图来源、单飞合并、MCP池和后台刷新状态"""
+    caches = {
+        "price": get_price_cache().stats(),
+        "intent": get_intent_cache().stats(),
+        "payload": get_payload_store().stats(),
+    }
+    for name, stats in caches.items():
+        ratio = stats.get("hit_ratio", stats.get("hit_rate", 0.0))
+        yield "agent_cache_hit_ratio", "gauge", "缓存命中率", {"cache": name}, ratio
+        yield "agent_cache_entries", "gauge", "缓存条目数", {"cache": name}, stats["size"]
+    for source, count in intent_counters.items():
+        yield "agent_intent_total", "counter", "意图分类来源计数", {"source": source}, count
+    for outcome, count in price_flight.counters.items():
+        yield "agent_singleflight_total", "counter", "价格搜索单飞结果计数", {"outcome": outcome}, count
+    pool = get_mcp_pool().snapshot()
+    breaker = pool["breaker"]
+    yield "agent_mcp_sessions_alive", "gauge", "存活的MCP会话数", {}, pool["alive"]
+    yield "agent_mcp_respawns_total", "counter", "MCP会话重启次数", {}, pool["respawns"]
+    yield "agent_mcp_breaker_state", "gauge", "MCP熔断器状态(0=closed,1=half_open,2=open)", {}, BREAKER_STATES[breaker["state"]]
+    yield "agent_mcp_breaker_rejected_total", "counter", "熔断器拒绝的调用数", {}, breaker["rejected"]
+    yield "agent_mcp_breaker_opened_total", "counter", "熔断器打开次数", {}, breaker["opened"]
+    refresher = price_refresher.snapshot()
+    yield "agent_price_refresh_total", "counter", "后台价格刷新次数", {}, refresher["runs"]
+    yield "agent_price_refresh_errors_total", "counter", "后台价格刷新失败次数", {}, refresher["errors"]
+    admission = get_admission_controller().snapshot()
+    yield "agent_admission_in_flight", "gauge", "正在执行的/copilotkit请求数", {}, admission["in_flight"]
+    yield "agent_admission_queue_depth", "gauge", "排队等待的/copilotkit请求数", {}, admission["queue_depth"]
+    for outcome in ("admitted", "queued", "rate_limited", "shed_queue_full", "shed_timeout", "body_too_large"):
+        yield "agent_admission_total", "counter", "/copilotkit准入结果计数", {"outcome": outcome}, admission[outcome]
+    shared = get_shared_price_table()
+    if shared is not None:
+        stats = shared.stats()
+        yield "agent_shared_prices_writer", "gauge", "本worker是否为共享价格表写入者", {}, int(stats["writer"])
+        yield "agent_shared_prices_attached", "gauge", "共享价格表是否已映射", {}, int(stats["attached"])
+        yield "agent_shared_prices_read_retries_total", "counter", "共享价格表seqlock读取重试次数", {}, stats["read_retries"]
+    loop = get_loop_monitor().snapshot()
+    yield "agent_loop_lag_seconds", "gauge", "最近一次心跳测得的事件循环延迟", {}, loop["last_lag"]
+    yield "agent_loop_max_lag_seconds", "gauge", "启动以来最大的事件循环延迟", {}, loop["max_lag"]
+    checkpointer_stats = getattr(graph.checkpointer, "stats", None)
+    if checkpointer_stats is not None:
+        stats = checkpointer_stats()
+        yield "agent_checkpoint_threads", "gauge", "检查点中的会话线程数", {}, stats.get("threads", 0)
+        if "bytes" in stats:
+            yield "agent_checkpoint_bytes", "gauge", "内存检查点占用字节数", {}, stats["bytes"]
+
+
+get_metrics().add_collector(_runtime_metrics)
+
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus文本格式的指标"""
+    return PlainTextResponse(get_metrics().render(), media_type="text/plain; version=0.0.4")
+
+# 管理接口的访问令牌；未设置时只允许本机访问
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+
+def _require_admin(request: Request):
+    if ADMIN_TOKEN:
+        # 常数时间比较，避免通过响应耗时逐字节猜出令牌
+        if not hmac.compare_digest(request.headers.get("x-admin-token", "").encode(), ADMIN_TOKEN.encode()):
+            raise HTTPException(status_code=403, detail="invalid admin token")
+    elif request.client is None or request.client.host not in ("127.0.0.1", "::1"):
+        raise HTTPException(status_code=403, detail="admin routes are local-only without ADMIN_TOKEN")
+
+
+@app.get("/admin/loop")
+async def admin_loop(request: Request):
+    """事件循环延迟统计和最近几次阻塞的调用栈"""
+    _require_admin(request)
+    return get_loop_monitor().snapshot()
+
+@app.get("/admin/profile")
+async def admin_profile(
+    request: Request,
+    seconds: float = 10.0,
+    interval_ms: float = 5.0,
+    lines: bool = False,
+    thread: str = "",
+):
+    """
+    对运行中的进程做限时采样，返回折叠栈文本（可直接生成火焰图）
+    采样在线程中进行，采样期间事件循环照常处理请求
+    """
+    _require_admin(request)
+    try:
+        stacks, rounds = await asyncio.to_thread(
+            sample_stacks, seconds, interval_ms / 1000, lines, thread or None
+        )
+    except ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return PlainTextResponse(render_collapsed(stacks), headers={"X-Profile-Samples": str(rounds)})
+
+@app.get("/payloads/{digest}")
+async def get_payload(digest: str):
+    """按哈希获取工具结果载荷（内容寻址，可永久缓存）"""
+    content = await get_payload_store().aget(digest)
+    if content is None:
+        raise HTTPException(status_code=404, detail="payload not found")
+    return Response(
+        content,
+        media_type="application/json",
+        headers={"Cache-Control": "public, max-age=31536000, immutable", "ETag": f'"{digest}"'},
+    )
+
+@app.get("/ready")
+async def ready():
+    """就绪检查：工具预热完成前返回503"""
+    return JSONResponse(tools_state, status_code=200 if tools_state["ready"] else 503)
+
+@app.get("/mcp/status")
+async def mcp_status():
+    """MCP会话池与熔断器状态"""
+    return get_mcp_pool().snapshot()
+
 def main():
     """Run the   uvicorn server."""
     port = int(os.getenv("PORT", "8080"))
@@ -0,0 +1,251 @@
+"""
+用户意图分析 - 共享的异步LLM客户端
+所有会话复用同一个模型实例和HTTP连接池，并限制并发与单次调用时长
+"""
+import asyncio
+import json
+import logging
+import os
+import re
+from typing import Optional
+
+from langchain_core.messages import SystemMessage
+
+from sample_agent.intent_cache import get_intent_cache, normalize_message
+from sample_agent.metrics import get_metrics
+from sample_agent.price_parser import _NUMBER
+
+logger = logging.getLogger("agent")
+
+# 意图分析配置（可通过环境变量覆盖）
+INTENT_MODEL = os.getenv("INTENT_MODEL", "gpt-4o-mini")
+INTENT_TIMEOUT = float(os.getenv("INTENT_TIMEOUT", "8"))
+INTENT_MAX_CONCURRENCY = int(os.getenv("INTENT_MAX_CONCURRENCY", "16"))
+INTENT_MAX_CONNECTIONS = int(os.getenv("INTENT_MAX_CONNECTIONS", "32"))
+# 本地规则置信度达到该阈值时直接采用，不再调用LLM
+INTENT_LOCAL_CONFIDENCE = float(os.getenv("INTENT_LOCAL_CONFIDENCE", "0.85"))
+
+# 本地快速分类器使用的词表与预编译正则
+TOKEN_SYMBOLS = frozenset(["BTC", "ETH", "USDT", "USDC", "BNB", "ADA", "SOL", "DOT", "MATIC", "AVAX"])
+EXCHANGE_KEYWORDS = ("兑换", "交换", "换成", "换到", "转换为", "换", "CONVERT", "EXCHANGE", "SWAP")
+TOKEN_LIST_KEYWORDS = ("代币", "TOKEN", "币种", "选择", "列表", "查看", "显示", "展示")
+GREETING_KEYWORDS = ("你好", "您好", "嗨")
+# 英文问候词按单词边界匹配，避免 "THIS"、"WHICH"、"SHIP IT" 被误判为问候
+_GREETING_WORD_RE = re.compile(r"(?<![A-Z])(HELLO|HI|HEY)(?![A-Z])")
+HELP_KEYWORDS = ("帮助", "HELP", "怎么用", "能做什么", "如何使用")
+
+_SYMBOL_ALT = "|".join(sorted(TOKEN_SYMBOLS, key=len, reverse=True))
+_SYMBOL_RE = re.compile(rf"(?<![A-Z])({_SYMBOL_ALT})(?![A-Z])")
+_PAIR_RE = re.compile(
+    rf"(?:(?<![0-9.,])({_NUMBER})\s*)?(?<![A-Z])({_SYMBOL_ALT})(?![A-Z])\s*"
+    rf"(兑换到|兑换成|兑换为|兑换|交换成|交换|换成|换到|换|转换为|转换成|转成|到|TO|INTO|->|→)\s*"
+    rf"(?<![A-Z])({_SYMBOL_ALT})(?![A-Z])"
+)
+# 仅表示方向的连接词，需要配合兑换关键词才能确定是兑换意图
+_WEAK_CONNECTORS = frozenset(["到", "TO", "INTO"])
+# 匹配到的数量前紧挨着数字、符号或科学计数法（如 "1,0000"、"-5"、"1E3"），数量不可靠，交给LLM判断
+_AMBIGUOUS_AMOUNT_PREFIX = re.compile(r"(?:[0-9.,+-]|[0-9]E[+-]?)\s*$")
+
+# 意图来源计数（本地规则 / 缓存 / LLM）
+intent_counters = {"local": 0, "cached": 0, "llm": 0, "llm_failed": 0}
+
+_intent_model = None
+_http_client = None
+# (事件循环, 并发信号量)，事件循环变化时重建（asyncio原语不能跨事件循环复用）
+_semaphore: Optional[tuple] = None
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    global _semaphore
+    loop = asyncio.get_running_loop()
+    if _semaphore is None or _semaphore[0] is not loop:
+        _semaphore = (loop, asyncio.Semaphore(INTENT_MAX_CONCURRENCY))
+    return _semaphore[1]
+
+
+def build_intent_prompt(message: str) -> str:
+    """构建意图分析提示"""
+    return f"""
+            分析用户消息的意图，并返回JSON格式的响应。
+
+            用户消息: "{message}"
+
+            可能的意图类型:
+            1. "token_list" - 用户想查看代币列表
+            2. "exchange" - 用户想进行代币兑换
+            3. "greeting" - 用户打招呼
+            4. "help" - 用户需要帮助
+            5. "unclear" - 意图不明确
+
+            对于兑换意图，还需要提取:
+            - from_token: 源代币符号
+            - to_token: 目标代币符号
+            - amount: 兑换数量
+
+            请返回JSON格式:
+            {{
+                "intent": "意图类型",
+                "confidence": 0.9,
+                "from_token": "BTC",
+                "to_token": "ETH",
+                "amount": 1.0,
+                "reasoning": "分析原因"
+            }}
+            """
+
+
+async def get_intent_model():
+    """获取共享的意图分析模型（首次调用时创建，复用HTTP连接池）"""
+    global _intent_model, _http_client
+    if _intent_model is None:
+        import httpx
+        from langchain_openai import ChatOpenAI
+
+        http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=INTENT_MAX_CONNECTIONS,
+                max_keepalive_connections=INTENT_MAX_CONNECTIONS,
+            ),
+            timeout=httpx.Timeout(INTENT_TIMEOUT),
+        )
+        # 模型创建失败（如缺少API Key）时关闭连接池，下次调用重试
+        try:
+            model = ChatOpenAI(
+                model=INTENT_MODEL,
+                temperature=0.1,
+                api_key=os.getenv("OPENAI_API_KEY"),
+                http_async_client=http_client,
+                max_retries=0,
+            )
+        except BaseException:
+            await http_client.aclose()
+            raise
+        _intent_model, _http_client = model, http_client
+    return _intent_model
+
+
+def classify_locally(message: str) -> dict:
+    """
+    确定性的本地意图分类，返回与LLM相同结构的结果和置信度
+
+    Returns:
+        dict: {"intent", "confidence", "from_token", "to_token", "amount", "reasoning"}
+    """
+    text = normalize_message(message).upper()
+    result = {"intent": "unclear", "confidence": 0.0, "from_token": "", "to_token": "", "amount": 1.0, "reasoning": "local"}
+    symbols = _SYMBOL_RE.findall(text)
+    has_exchange = any(keyword in text for keyword in EXCHANGE_KEYWORDS)
+
+    pair = _PAIR_RE.search(text)
+    if pair and pair.group(2) != pair.group(4):
+        amount, from_token, connector, to_token = pair.groups()
+        value = float(amount.replace(",", "")) if amount else 1.0
+        if _AMBIGUOUS_AMOUNT_PREFIX.search(text, 0, pair.start()) or value <= 0:
+            confidence, reasoning = 0.5, "local: ambiguous amount"
+        elif connector in _WEAK_CONNECTORS and not has_exchange:
+            confidence, reasoning = 0.7, "local: pair pattern"
+        else:
+            confidence, reasoning = (0.98 if amount else 0.9), "local: pair pattern"
+        result.update(
+            intent="exchange",
+            from_token=from_token,
+            to_token=to_token,
+            amount=value,
+            confidence=confidence,
+            reasoning=reasoning,
+        )
+        return result
+
+    if symbols and has_exchange:
+        # 只识别到单个代币，目标不明确，交给LLM判断
+        result.update(intent="exchange", from_token=symbols[0], confidence=0.6, reasoning="local: single token")
+        return result
+
+    if any(keyword in text for keyword in TOKEN_LIST_KEYWORDS) and not symbols and not has_exchange:
+        result.update(intent="token_list", confidence=0.95, reasoning="local: token list keyword")
+        return result
+
+    if any(keyword in text for keyword in HELP_KEYWORDS):
+        result.update(intent="help", confidence=0.9, reasoning="local: help keyword")
+        return result
+
+    if len(text) <= 12 and (any(keyword in text for keyword in GREETING_KEYWORDS) or _GREETING_WORD_RE.search(text)):
+        result.update(intent="greeting", confidence=0.95, reasoning="local: greeting")
+        return result
+
+    return result
+
+
+async def classify_intent(message: str) -> dict:
+    """
+    分层意图分类：先用本地规则，置信度不足时查缓存，最后才调用LLM
+
+    Raises:
+        Exception: LLM调用失败或超时（由调用方回退到规则匹配）
+    """
+    local = classify_locally(message)
+    if local["confidence"] >= INTENT_LOCAL_CONFIDENCE:
+        intent_counters["local"] += 1
+        return local
+    cache = get_intent_cache()
+    cached = cache.get(message)
+    if cached is not None:
+        intent_counters["cached"] += 1
+        return cached
+    try:
+        result = await analyze_intent(message)
+    except Exception:
+        intent_counters["llm_failed"] += 1
+        raise
+    intent_counters["llm"] += 1
+    cache.set(message, result)
+    return result
+
+
+def intent_stats() -> dict:
+    """本地/缓存/LLM意图分类计数，用于监控"""
+    total = sum(intent_counters.values())
+    return {
+        **intent_counters,
+        "local_ratio": round(intent_counters["local"] / total, 4) if total else 0.0,
+        "cache": get_intent_cache().stats(),
+    }
+
+
+async def analyze_intent(message: str, timeout: Optional[float] = None) -> dict:
+    """
+    使用LLM分析用户意图
+
+    Args:
+        message: 用户消息
+        timeout: 单次调用超时（秒），默认INTENT_TIMEOUT
+
+    Returns:
+        dict: 意图分析结果
+
+    Raises:
+        asyncio.TimeoutError: 超过截止时间（包括排队等待并发名额的时间）
+    """
+    timeout = INTENT_TIMEOUT if timeout is None else timeout
+
+    async def _invoke():
+        async with _get_semaphore():
+            model = await get_intent_model()
+            return await model.ainvoke([SystemMessage(content=build_intent_prompt(message))])
+
+    try:
+        with get_metrics().time("agent_stage", stage="intent_llm"):
+            response = await asyncio.wait_for(_invoke(), timeout=timeout)
+    except asyncio.TimeoutError:
+        logger.warning(f"⏱️ AI意图分析超时({timeout}s)")
+        raise
+    return json.loads(response.content)
+
+
+async def close_intent_model():
+    """关闭共享的HTTP连接池（在FastAPI lifespan结束时调用）"""
+    global _intent_model, _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+    _intent_model = None
+    _http_client = None
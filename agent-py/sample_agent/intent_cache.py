@@ -0,0 +1,190 @@
+"""
+意图分析结果缓存 - 以规范化后的用户消息为键
+LRU + TTL，可选SQLite持久化（后台线程写入），重启后无需冷启动
+"""
+import json
+import logging
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Optional
+
+logger = logging.getLogger("agent")
+
+# 缓存配置（可通过环境变量覆盖，INTENT_CACHE_PATH为空表示只用内存）
+DEFAULT_MAX_ENTRIES = int(os.getenv("INTENT_CACHE_SIZE", "1024"))
+DEFAULT_TTL = float(os.getenv("INTENT_CACHE_TTL", "3600"))
+DEFAULT_PATH = os.getenv("INTENT_CACHE_PATH", "")
+
+_WHITESPACE_RE = re.compile(r"\s+")
+# 非ASCII字符（如中文）两侧的空格没有语义
+_CJK_SPACE_RE = re.compile(r" (?=[^\x00-\x7f])|(?<=[^\x00-\x7f]) ")
+
+
+def normalize_message(message: str) -> str:
+    """
+    规范化用户消息：全角转半角、大小写折叠、合并空白
+
+    例如 "BTC换ETH" 和 "btc 换 eth " 得到相同的键
+    """
+    text = unicodedata.normalize("NFKC", message).casefold()
+    text = _WHITESPACE_RE.sub(" ", text).strip()
+    return _CJK_SPACE_RE.sub("", text)
+
+
+class IntentCache:
+    """
+    意图分析结果缓存
+    读写都只访问内存；配置了SQLite时由后台线程加载历史条目并按写入顺序落盘（write-behind），
+    事件循环上不做任何数据库I/O
+    """
+
+    def __init__(
+        self,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        ttl: float = DEFAULT_TTL,
+        path: Optional[str] = DEFAULT_PATH or None,
+    ):
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+        self.path = path
+        # 值为 (写入时间戳, 意图结果)
+        self._entries: "OrderedDict[str, tuple[float, dict]]" = OrderedDict()
+        self._db: Optional[sqlite3.Connection] = None
+        self.counters = {"hits": 0, "misses": 0, "evictions": 0}
+        # 后台线程加载历史条目时与事件循环上的读写互斥
+        self._lock = threading.Lock()
+        self._writes: "queue.SimpleQueue[Optional[tuple[str, tuple]]]" = queue.SimpleQueue()
+        self._writer: Optional[threading.Thread] = None
+        if path:
+            self._writer = threading.Thread(target=self._write_loop, args=(path,), name="intent-cache-writer", daemon=True)
+            self._writer.start()
+
+    def _open(self, path: str) -> bool:
+        try:
+            self._db = sqlite3.connect(path, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS intent_cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            cutoff = time.time() - self.ttl
+            self._db.execute("DELETE FROM intent_cache WHERE created_at < ?", (cutoff,))
+            rows = self._db.execute(
+                "SELECT key, value, created_at FROM intent_cache ORDER BY created_at DESC LIMIT ?",
+                (self.max_entries,),
+            ).fetchall()
+            loaded = [(key, created_at, json.loads(value)) for key, value, created_at in rows]
+        except (sqlite3.Error, ValueError) as e:
+            logger.warning(f"⚠️ 意图缓存持久化不可用，仅使用内存: {e}")
+            if self._db is not None:
+                self._db.close()
+            self._db = None
+            return False
+        # 加载期间已写入内存的条目更新，保留它们；历史条目按从新到旧依次放到LRU队首
+        with self._lock:
+            for key, created_at, intent_data in loaded:
+                if key not in self._entries and len(self._entries) < self.max_entries:
+                    self._entries[key] = (created_at, intent_data)
+                    self._entries.move_to_end(key, last=False)
+        logger.info(f"💾 意图缓存已从 {path} 加载 {len(rows)} 条")
+        return True
+
+    def _write_loop(self, path: str):
+        """后台写入线程：打开数据库并加载历史条目，之后按顺序批量执行排队的写入"""
+        persistent = self._open(path)
+        while True:
+            item = self._writes.get()
+            batch = [item]
+            while item is not None:
+                try:
+                    item = self._writes.get_nowait()
+                except queue.Empty:
+                    break
+                batch.append(item)
+            if persistent:
+                self._apply([op for op in batch if op is not None])
+            if batch[-1] is None:
+                break
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def _apply(self, batch: list):
+        if not batch:
+            return
+        try:
+            self._db.execute("BEGIN")
+            for sql, params in batch:
+                self._db.execute(sql, params)
+            self._db.execute("COMMIT")
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ 意图缓存写入失败: {e}")
+            if self._db.in_transaction:
+                self._db.execute("ROLLBACK")
+
+    def get(self, message: str) -> Optional[dict]:
+        """按规范化消息读取缓存的意图结果"""
+        key = normalize_message(message)
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None or time.time() - item[0] > self.ttl:
+                self.counters["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.counters["hits"] += 1
+        return dict(item[1])
+
+    def set(self, message: str, intent_data: dict):
+        """写入意图结果，超出容量时淘汰最久未使用的条目（落盘由后台线程完成）"""
+        key = normalize_message(message)
+        created_at = time.time()
+        with self._lock:
+            self._entries[key] = (created_at, intent_data)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                evicted, _ = self._entries.popitem(last=False)
+                self.counters["evictions"] += 1
+                self._enqueue("DELETE FROM intent_cache WHERE key = ?", (evicted,))
+        self._enqueue(
+            "INSERT OR REPLACE INTO intent_cache (key, value, created_at) VALUES (?, ?, ?)",
+            (key, json.dumps(intent_data, ensure_ascii=False), created_at),
+        )
+
+    def _enqueue(self, sql: str, params: tuple):
+        if self._writer is not None:
+            self._writes.put((sql, params))
+
+    def stats(self) -> dict:
+        """命中率统计，用于监控"""
+        lookups = self.counters["hits"] + self.counters["misses"]
+        return {
+            **self.counters,
+            "size": len(self._entries),
+            "hit_rate": round(self.counters["hits"] / lookups, 4) if lookups else 0.0,
+            "persistent": self._db is not None,
+        }
+
+    def close(self, timeout: float = 5.0):
+        """写完排队中的条目后关闭数据库（会阻塞，在事件循环中应通过 asyncio.to_thread 调用）"""
+        writer, self._writer = self._writer, None
+        if writer is not None:
+            self._writes.put(None)
+            writer.join(timeout)
+
+
+# 进程级单例
+_cache: Optional[IntentCache] = None
+
+
+def get_intent_cache() -> IntentCache:
+    """获取进程级意图缓存"""
+    global _cache
+    if _cache is None:
+        _cache = IntentCache()
+    return _cache
@@ -0,0 +1,136 @@
+"""
+日志配置 - 基于队列的非阻塞日志管道
+事件循环中只把日志记录放入队列，由后台线程负责格式化和写文件/控制台，
+文件输出为按大小轮转的JSON行，并支持对高频事件采样
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import time
+from typing import Optional
+
+# 日志配置（可通过环境变量覆盖）
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FILE = os.getenv("LOG_FILE", "agent.log")
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+# 文件日志格式: json（默认）或 text
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+# 高频事件采样率，例如 "tool_call=0.1,intent=0.5"；未列出的事件全部记录
+LOG_SAMPLE_RATES = os.getenv("LOG_SAMPLE_RATES", "")
+# 调试用的状态转储（默认关闭），开启后按长度截断
+DEBUG_STATE = os.getenv("AGENT_DEBUG_STATE", "0") == "1"
+DUMP_MAX_CHARS = int(os.getenv("LOG_DUMP_MAX_CHARS", "2000"))
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# LogRecord自带的属性，其余属性视为extra字段写入JSON
+_RECORD_ATTRS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "taskName"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def parse_sample_rates(spec: str) -> dict:
+    """解析 "事件=采样率" 列表"""
+    rates = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        event, _, rate = item.partition("=")
+        try:
+            rates[event.strip()] = min(1.0, max(0.0, float(rate)))
+        except ValueError:
+            continue
+    return rates
+
+
+class JsonFormatter(logging.Formatter):
+    """每条记录输出为一行JSON，extra字段一并写入"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(record.created)) + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    按事件采样：带 extra={"event": 名称} 的记录按配置的采样率保留
+    WARNING及以上级别始终保留
+    """
+
+    def __init__(self, rates: dict):
+        super().__init__()
+        self.rates = rates
+        self.dropped = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        rate = self.rates.get(getattr(record, "event", None))
+        if rate is None or rate >= 1.0 or record.levelno >= logging.WARNING:
+            return True
+        if random.random() < rate:
+            return True
+        self.dropped += 1
+        return False
+
+
+def setup_logging(level: str = LOG_LEVEL, log_file: str = LOG_FILE) -> Optional[logging.handlers.QueueListener]:
+    """
+    配置根日志器使用队列（幂等；根日志器已有其他处理器时不做修改）
+
+    Returns:
+        QueueListener: 后台写日志的监听线程
+    """
+    global _listener
+    root = logging.getLogger()
+    if _listener is not None or root.handlers:
+        return _listener
+
+    file_handler = logging.handlers.RotatingFileHandler(
+        log_file, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8"
+    )
+    file_handler.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else logging.Formatter(TEXT_FORMAT))
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(parse_sample_rates(LOG_SAMPLE_RATES)))
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, file_handler, console_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+    return _listener
+
+
+def shutdown_logging():
+    """停止监听线程并写完队列中剩余的日志"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+def debug_dump(logger: logging.Logger, label: str, value) -> None:
+    """调试用的状态转储：仅在 AGENT_DEBUG_STATE=1 时输出，并截断到 LOG_DUMP_MAX_CHARS"""
+    if not DEBUG_STATE:
+        return
+    text = repr(value)
+    if len(text) > DUMP_MAX_CHARS:
+        text = f"{text[:DUMP_MAX_CHARS]}...(共{len(text)}字符)"
+    logger.info(f"🐞 {label}: {text}", extra={"event": "state_dump"})
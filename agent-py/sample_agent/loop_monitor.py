@@ -0,0 +1,145 @@
+"""
+事件循环延迟监控 - 发现异步节点中的同步阻塞（同步LLM调用、大段日志、长正则等）
+
+事件循环中的心跳协程按固定间隔记录时间戳，后台看门狗线程发现心跳超过阈值未更新时，
+抓取事件循环线程当前的调用栈（即正在阻塞循环的代码）；心跳恢复后记录本次阻塞时长并计数
+"""
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Optional
+
+from sample_agent.metrics import get_metrics
+
+logger = logging.getLogger("agent")
+
+# 监控配置（可通过环境变量覆盖）
+LAG_THRESHOLD = float(os.getenv("LOOP_LAG_THRESHOLD", "0.1"))
+LAG_INTERVAL = float(os.getenv("LOOP_LAG_INTERVAL", "0.05"))
+STALL_HISTORY = int(os.getenv("LOOP_STALL_HISTORY", "20"))
+STACK_LIMIT = int(os.getenv("LOOP_STALL_STACK_LIMIT", "30"))
+
+
+class LoopLagMonitor:
+    """
+    事件循环阻塞监控
+    - start()/stop(): 在事件循环中启动/停止心跳协程和看门狗线程
+    - snapshot(): 阻塞次数、最大延迟和最近几次阻塞的调用栈
+    """
+
+    def __init__(self, threshold: float = LAG_THRESHOLD, interval: float = LAG_INTERVAL, history: int = STALL_HISTORY):
+        self.threshold = threshold
+        self.interval = interval
+        self.counters = {"stalls": 0, "stall_seconds": 0.0, "max_lag": 0.0}
+        self.last_lag = 0.0
+        self.recent: deque = deque(maxlen=history)
+        self._beat = time.monotonic()
+        self._captured: Optional[dict] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """在当前事件循环中启动监控（重复调用无副作用）"""
+        if self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.create_task(self._heartbeat(), name="loop-lag-monitor")
+        self._watchdog = threading.Thread(target=self._watch, name="loop-lag-watchdog", daemon=True)
+        self._watchdog.start()
+        logger.info(f"🩺 事件循环延迟监控已启动，阈值 {self.threshold * 1000:.0f}ms")
+
+    async def stop(self):
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._watchdog is not None:
+            await asyncio.to_thread(self._watchdog.join, self.interval * 4)
+            self._watchdog = None
+
+    async def _heartbeat(self):
+        """按固定间隔醒来，实际间隔超出预期的部分即事件循环延迟"""
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self._beat = now
+            lag = max(0.0, now - expected)
+            self.last_lag = lag
+            if lag >= self.threshold:
+                self._record(lag)
+
+    def _watch(self):
+        """看门狗线程：心跳超时时抓取事件循环线程的调用栈（每次阻塞只抓一次）"""
+        poll = max(0.005, self.threshold / 2)
+        captured_beat = None
+        while not self._stopped.wait(poll):
+            beat = self._beat
+            if beat == captured_beat or time.monotonic() - beat < self.interval + self.threshold:
+                continue
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is None:
+                continue
+            task = asyncio.current_task(self._loop)
+            self._captured = {
+                "task": task.get_name() if task is not None else None,
+                "stack": traceback.format_stack(frame, limit=STACK_LIMIT),
+            }
+            captured_beat = beat
+
+    def _record(self, lag: float):
+        captured, self._captured = self._captured, None
+        self.counters["stalls"] += 1
+        self.counters["stall_seconds"] += lag
+        self.counters["max_lag"] = max(self.counters["max_lag"], lag)
+        get_metrics().observe("agent_loop_stall", lag)
+        stall = {"at": time.time(), "lag": round(lag, 4), **(captured or {"task": None, "stack": []})}
+        self.recent.append(stall)
+        where = "".join(stall["stack"][-3:]).rstrip() or "（阻塞时间短于看门狗采样间隔，未抓到调用栈）"
+        logger.warning(
+            f"🐢 事件循环阻塞 {lag * 1000:.0f}ms，任务: {stall['task']}\n{where}",
+            extra={"event": "loop_stall", "lag_ms": round(lag * 1000, 1), "task": stall["task"]},
+        )
+
+    def snapshot(self) -> dict:
+        """监控统计和最近的阻塞记录"""
+        return {
+            **self.counters,
+            "stall_seconds": round(self.counters["stall_seconds"], 4),
+            "max_lag": round(self.counters["max_lag"], 4),
+            "last_lag": round(self.last_lag, 4),
+            "threshold": self.threshold,
+            "running": self.running,
+            "recent": list(self.recent),
+        }
+
+
+# 进程级单例
+_monitor: Optional[LoopLagMonitor] = None
+
+
+def get_loop_monitor() -> LoopLagMonitor:
+    """获取进程级事件循环监控"""
+    global _monitor
+    if _monitor is None:
+        _monitor = LoopLagMonitor()
+    return _monitor
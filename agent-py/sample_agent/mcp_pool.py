@@ -0,0 +1,363 @@
+"""
+Tavily MCP 会话池 - 进程级常驻的stdio会话
+避免每次工具调用都重新启动 `npx tavily-mcp` 子进程
+"""
+import asyncio
+import logging
+import os
+import shlex
+from contextlib import asynccontextmanager
+from typing import Any, Optional
+
+from langchain_core.tools import StructuredTool
+
+from sample_agent.circuit_breaker import CircuitBreaker
+from sample_agent.metrics import get_metrics
+
+logger = logging.getLogger("agent")
+
+# MCP服务名称
+TAVILY_SERVER = "tavily"
+
+# 连接池配置（可通过环境变量覆盖）
+DEFAULT_POOL_SIZE = int(os.getenv("MCP_POOL_SIZE", "2"))
+DEFAULT_HEALTH_INTERVAL = float(os.getenv("MCP_HEALTH_INTERVAL", "30"))
+DEFAULT_CALL_TIMEOUT = float(os.getenv("MCP_CALL_TIMEOUT", "20"))
+DEFAULT_START_TIMEOUT = float(os.getenv("MCP_START_TIMEOUT", "60"))
+
+
+def tavily_connection() -> dict:
+    """构建Tavily MCP的stdio连接配置"""
+    env_vars = os.environ.copy()
+    if "TAVILY_API_KEY" not in env_vars:
+        logger.warning("⚠️ TAVILY_API_KEY 环境变量未设置")
+    return {
+        "command": os.getenv("TAVILY_MCP_COMMAND", "npx"),
+        "args": shlex.split(os.getenv("TAVILY_MCP_ARGS", "-y tavily-mcp")),
+        "env": env_vars,
+        "transport": "stdio",
+    }
+
+
+def _retrieve_exception(task: asyncio.Future):
+    """取出被放弃等待的任务的异常，避免 "Task exception was never retrieved" 告警"""
+    if not task.cancelled():
+        task.exception()
+
+
+class _PooledSession:
+    """
+    池中的单个MCP会话
+    会话由独立的后台任务持有并在同一任务中关闭，满足anyio对取消作用域的要求
+    """
+
+    def __init__(self, index: int, connection: dict):
+        self.index = index
+        self.connection = connection
+        self.session = None
+        self.spawn_count = 0
+        self._task: Optional[asyncio.Task] = None
+        self._ready: Optional[asyncio.Event] = None
+        self._closing: Optional[asyncio.Event] = None
+        self._error: Optional[BaseException] = None
+
+    @property
+    def alive(self) -> bool:
+        """会话是否可用（后台任务仍在运行且已完成握手）"""
+        return self.session is not None and self._task is not None and not self._task.done()
+
+    async def start(self, timeout: float):
+        """启动stdio子进程并完成MCP握手"""
+        from langchain_mcp_adapters.client import MultiServerMCPClient
+
+        self._ready = asyncio.Event()
+        self._closing = asyncio.Event()
+        self._error = None
+        client = MultiServerMCPClient({TAVILY_SERVER: self.connection})
+
+        async def _run():
+            try:
+                async with client.session(TAVILY_SERVER) as session:
+                    self.session = session
+                    self._ready.set()
+                    await self._closing.wait()
+            except BaseException as e:  # noqa: BLE001 - 需要记录子进程的任何退出原因
+                self._error = e
+                if not isinstance(e, asyncio.CancelledError):
+                    logger.warning(f"⚠️ MCP会话#{self.index}已退出: {e}")
+            finally:
+                self.session = None
+                self._ready.set()
+
+        self.spawn_count += 1
+        self._task = asyncio.create_task(_run(), name=f"mcp-session-{self.index}")
+        with get_metrics().time("agent_stage", stage="mcp_spawn"):
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                await self.close()
+                raise TimeoutError(f"MCP会话#{self.index}启动超时({timeout}s)")
+            if self.session is None:
+                raise RuntimeError(f"MCP会话#{self.index}启动失败: {self._error}")
+        logger.info(f"🔌 MCP会话#{self.index}已就绪 (第{self.spawn_count}次启动)")
+
+    async def ping(self, timeout: float) -> bool:
+        """健康检查"""
+        if not self.alive:
+            return False
+        try:
+            await asyncio.wait_for(self.session.send_ping(), timeout=timeout)
+            return True
+        except Exception as e:
+            logger.warning(f"⚠️ MCP会话#{self.index}健康检查失败: {e}")
+            return False
+
+    async def close(self):
+        """关闭会话并等待子进程退出"""
+        task, self._task = self._task, None
+        if task is None:
+            return
+        if self._closing is not None:
+            self._closing.set()
+        try:
+            await asyncio.wait_for(asyncio.shield(task), timeout=5)
+        except (asyncio.TimeoutError, Exception):
+            pass
+        finally:
+            # 超时或关闭本身被取消时强制取消，并等待子进程和上下文管理器退出完毕
+            if not task.done():
+                task.cancel()
+            try:
+                await task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self.session = None
+
+
+class MCPSessionPool:
+    """
+    进程级MCP会话池
+    - 固定数量的常驻会话，支持并发调用
+    - 定期健康检查，自动重启已退出或无响应的stdio子进程
+    - 跨事件循环时自动重建（例如模块导入阶段的asyncio.run）
+    - 所有调用经过熔断器，并受单次截止时间约束（包括排队和会话启动的时间）
+    """
+
+    def __init__(
+        self,
+        size: int = DEFAULT_POOL_SIZE,
+        connection: Optional[dict] = None,
+        health_interval: float = DEFAULT_HEALTH_INTERVAL,
+        call_timeout: float = DEFAULT_CALL_TIMEOUT,
+        start_timeout: float = DEFAULT_START_TIMEOUT,
+    ):
+        self.size = max(1, size)
+        self.connection = connection
+        self.health_interval = health_interval
+        self.call_timeout = call_timeout
+        self.start_timeout = start_timeout
+        self._slots: list[_PooledSession] = []
+        self._idle: Optional[asyncio.Queue] = None
+        self._start_lock: Optional[asyncio.Lock] = None
+        self._health_task: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._started = False
+        self.stats = {"calls": 0, "errors": 0, "timeouts": 0, "respawns": 0}
+        self.breaker = CircuitBreaker("mcp")
+
+    async def start(self):
+        """启动连接池（幂等）"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            if self._started:
+                logger.warning("⚠️ 事件循环已变化，丢弃旧的MCP会话池")
+            self._reset(loop)
+        async with self._start_lock:
+            if self._started:
+                return
+            connection = self.connection or tavily_connection()
+            self._slots = [_PooledSession(i, connection) for i in range(self.size)]
+            # 首个会话启动失败时直接抛出，其余会话在取用时按需重启
+            await self._slots[0].start(self.start_timeout)
+            await asyncio.gather(
+                *(slot.start(self.start_timeout) for slot in self._slots[1:]),
+                return_exceptions=True,
+            )
+            for slot in self._slots:
+                self._idle.put_nowait(slot)
+            if self.health_interval > 0:
+                self._health_task = asyncio.create_task(self._health_loop(), name="mcp-pool-health")
+            self._started = True
+            logger.info(f"✅ MCP会话池已启动，大小: {self.size}")
+
+    def _reset(self, loop: asyncio.AbstractEventLoop):
+        self._loop = loop
+        self._slots = []
+        self._idle = asyncio.Queue()
+        self._start_lock = asyncio.Lock()
+        self._health_task = None
+        self._started = False
+
+    async def _ensure_alive(self, slot: _PooledSession):
+        if not slot.alive:
+            await self._respawn(slot)
+
+    async def _respawn(self, slot: _PooledSession):
+        """关闭并重启会话（包括任务仍在运行、但子进程已无响应的会话）"""
+        await slot.close()
+        self.stats["respawns"] += 1
+        logger.info(f"♻️ 重启MCP会话#{slot.index}")
+        await slot.start(self.start_timeout)
+
+    @asynccontextmanager
+    async def acquire(self):
+        """借出一个可用的MCP会话，用完自动归还"""
+        # 调用方超时不中断连接池启动，避免遗留半启动的子进程
+        start = asyncio.ensure_future(self.start())
+        start.add_done_callback(_retrieve_exception)
+        await asyncio.shield(start)
+        slot = await self._idle.get()
+        try:
+            await self._ensure_alive(slot)
+            yield slot.session
+        finally:
+            self._idle.put_nowait(slot)
+
+    async def _guarded(self, label: str, call, timeout: Optional[float] = None):
+        """
+        在熔断器和截止时间保护下执行一次MCP调用
+
+        Raises:
+            CircuitOpenError: 熔断器打开，未发起调用
+            TimeoutError: 超过截止时间
+        """
+        self.breaker.before_call()
+        self.stats["calls"] += 1
+        deadline = timeout or self.call_timeout
+        try:
+            with get_metrics().time("agent_stage", stage="mcp_call"):
+                result = await asyncio.wait_for(call(), timeout=deadline)
+        except asyncio.CancelledError:
+            self.breaker.release()
+            raise
+        except asyncio.TimeoutError:
+            self.stats["errors"] += 1
+            self.stats["timeouts"] += 1
+            self.breaker.record_failure()
+            raise TimeoutError(f"{label} 超过截止时间({deadline}s)")
+        except Exception:
+            self.stats["errors"] += 1
+            self.breaker.record_failure()
+            raise
+        self.breaker.record_success()
+        return result
+
+    async def call_tool(self, name: str, arguments: dict, timeout: Optional[float] = None) -> str:
+        """
+        通过池中的会话调用MCP工具
+
+        Returns:
+            str: 工具返回的文本内容
+
+        Raises:
+            CircuitOpenError: 熔断器打开时立即抛出，调用方直接回退
+        """
+
+        async def _call():
+            async with self.acquire() as session:
+                result = await session.call_tool(name, arguments)
+            text = "\n".join(
+                getattr(block, "text", "") for block in result.content if getattr(block, "type", "") == "text"
+            )
+            if result.isError:
+                raise RuntimeError(f"MCP工具 {name} 返回错误: {text[:200]}")
+            return text
+
+        return await self._guarded(f"MCP工具 {name}", _call, timeout)
+
+    async def get_tools(self) -> list:
+        """
+        将MCP服务的工具包装为LangChain工具，调用统一走连接池
+
+        Returns:
+            list: StructuredTool列表
+        """
+        async def _list():
+            async with self.acquire() as session:
+                return await session.list_tools()
+
+        listed = await self._guarded("MCP工具列表", _list, self.start_timeout)
+
+        def _make_tool(mcp_tool) -> StructuredTool:
+            async def _call(**kwargs: Any) -> str:
+                return await self.call_tool(mcp_tool.name, kwargs)
+
+            return StructuredTool(
+                name=mcp_tool.name,
+                description=mcp_tool.description or "",
+                args_schema=mcp_tool.inputSchema,
+                coroutine=_call,
+            )
+
+        return [_make_tool(t) for t in listed.tools]
+
+    async def _health_loop(self):
+        """定期对空闲会话做健康检查，重启已退出或无响应的子进程"""
+        while True:
+            await asyncio.sleep(self.health_interval)
+            for _ in range(self._idle.qsize()):
+                try:
+                    slot = self._idle.get_nowait()
+                except asyncio.QueueEmpty:
+                    break
+                try:
+                    if not await slot.ping(timeout=5):
+                        await self._respawn(slot)
+                except Exception as e:
+                    logger.warning(f"⚠️ MCP会话#{slot.index}重启失败: {e}")
+                finally:
+                    self._idle.put_nowait(slot)
+
+    def snapshot(self) -> dict:
+        """连接池状态，用于监控"""
+        return {
+            "size": self.size,
+            "started": self._started,
+            "alive": sum(1 for slot in self._slots if slot.alive),
+            "idle": self._idle.qsize() if self._idle is not None else 0,
+            **self.stats,
+            "breaker": self.breaker.snapshot(),
+        }
+
+    async def close(self):
+        """关闭所有会话"""
+        if self._health_task is not None:
+            self._health_task.cancel()
+            try:
+                await self._health_task
+            except (asyncio.CancelledError, Exception):
+                pass
+        if self._loop is asyncio.get_running_loop():
+            await asyncio.gather(*(slot.close() for slot in self._slots), return_exceptions=True)
+        self._loop = None
+        self._slots = []
+        self._started = False
+        logger.info("🔌 MCP会话池已关闭")
+
+
+# 进程级单例
+_pool: Optional[MCPSessionPool] = None
+
+
+def get_mcp_pool() -> MCPSessionPool:
+    """获取进程级MCP会话池"""
+    global _pool
+    if _pool is None:
+        _pool = MCPSessionPool()
+    return _pool
+
+
+async def shutdown_mcp_pool():
+    """关闭进程级MCP会话池（在FastAPI lifespan结束时调用）"""
+    if _pool is not None:
+        await _pool.close()
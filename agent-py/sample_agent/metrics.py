@@ -0,0 +1,179 @@
+"""
+轻量级指标采集 - 延迟直方图、调用/错误计数和缓存命中率
+以Prometheus文本格式输出，不依赖prometheus_client；每次记录只是一次二分查找和几个计数器自增
+"""
+import asyncio
+import functools
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Iterable, Optional
+
+# 直方图桶上界（秒），覆盖本地规则（亚毫秒）到MCP子进程启动（数十秒）
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# 指标族说明
+FAMILY_HELP = {
+    "agent_node": "LangGraph节点执行",
+    "agent_tool": "工具调用",
+    "agent_get_all_tools": "get_all_tools调用（含缓存命中）",
+    "agent_stage": "内部阶段（MCP调用、意图LLM、价格解析、检查点写入）",
+    "agent_loop_stall": "事件循环阻塞（超过阈值的延迟）",
+    "agent_admission_wait": "/copilotkit准入排队",
+}
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _label_str(labels: tuple) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+
+class _Histogram:
+    __slots__ = ("counts", "total", "count", "errors")
+
+    def __init__(self, size: int):
+        self.counts = [0] * size
+        self.total = 0.0
+        self.count = 0
+        self.errors = 0
+
+
+class Metrics:
+    """
+    指标注册表
+    - observe()/time(): 记录一次调用的耗时及是否出错，按 (指标族, 标签) 分组
+    - add_collector(): 注册在输出时才计算的指标（如各缓存的命中率）
+    """
+
+    def __init__(self, buckets: tuple = DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._series: dict = {}
+        self._collectors: list[Callable[[], Iterable[tuple]]] = []
+        self._lock = threading.Lock()
+
+    def observe(self, family: str, seconds: float, error: bool = False, **labels):
+        key = (family, tuple(sorted(labels.items())))
+        index = bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = _Histogram(len(self.buckets) + 1)
+            series.counts[index] += 1
+            series.total += seconds
+            series.count += 1
+            if error:
+                series.errors += 1
+
+    @contextmanager
+    def time(self, family: str, **labels):
+        """计时上下文，异常时计入错误数后继续抛出（取消不计为错误）"""
+        started = time.perf_counter()
+        error = False
+        try:
+            yield
+        except Exception:
+            error = True
+            raise
+        finally:
+            self.observe(family, time.perf_counter() - started, error, **labels)
+
+    def timed(self, family: str, **labels):
+        """函数计时装饰器，支持同步和异步函数（保留函数签名，可用于LangGraph节点）"""
+
+        def decorator(fn):
+            if asyncio.iscoroutinefunction(fn):
+                @functools.wraps(fn)
+                async def async_wrapper(*args, **kwargs):
+                    with self.time(family, **labels):
+                        return await fn(*args, **kwargs)
+
+                return async_wrapper
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.time(family, **labels):
+                    return fn(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def add_collector(self, collector: Callable[[], Iterable[tuple]]):
+        """
+        注册输出时调用的采集函数
+
+        Args:
+            collector: 返回 (指标名, 类型gauge/counter, 说明, 标签dict, 数值) 的可迭代对象
+        """
+        self._collectors.append(collector)
+
+    def snapshot(self) -> dict:
+        """按指标族汇总的调用次数、错误数和平均耗时"""
+        with self._lock:
+            items = [(key, series.count, series.errors, series.total) for key, series in self._series.items()]
+        return {
+            f"{family}{_label_str(labels)}": {
+                "calls": count,
+                "errors": errors,
+                "mean_ms": round(total / count * 1000, 3) if count else 0.0,
+            }
+            for (family, labels), count, errors, total in items
+        }
+
+    def render(self) -> str:
+        """Prometheus文本格式"""
+        with self._lock:
+            series = sorted(
+                ((key, list(s.counts), s.total, s.count, s.errors) for key, s in self._series.items()),
+                key=lambda item: item[0],
+            )
+        lines = []
+        families = sorted({family for (family, _), *_ in series})
+        for family in families:
+            rows = [row for row in series if row[0][0] == family]
+            help_text = FAMILY_HELP.get(family, family)
+            lines.append(f"# HELP {family}_duration_seconds {help_text}耗时")
+            lines.append(f"# TYPE {family}_duration_seconds histogram")
+            for (_, labels), counts, total, count, _errors in rows:
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    lines.append(f"{family}_duration_seconds_bucket{_label_str(labels + (('le', bound),))} {cumulative}")
+                lines.append(f"{family}_duration_seconds_bucket{_label_str(labels + (('le', '+Inf'),))} {count}")
+                lines.append(f"{family}_duration_seconds_sum{_label_str(labels)} {total:.6f}")
+                lines.append(f"{family}_duration_seconds_count{_label_str(labels)} {count}")
+            for suffix, index, text in (("calls_total", 3, "次数"), ("errors_total", 4, "错误次数")):
+                lines.append(f"# HELP {family}_{suffix} {help_text}{text}")
+                lines.append(f"# TYPE {family}_{suffix} counter")
+                for row in rows:
+                    lines.append(f"{family}_{suffix}{_label_str(row[0][1])} {row[index]}")
+
+        # 同名指标的样本必须连续输出
+        collected: dict = {}
+        for collector in self._collectors:
+            for name, kind, help_text, labels, value in collector():
+                collected.setdefault(name, (kind, help_text, []))[2].append((labels, value))
+        for name, (kind, help_text, samples) in collected.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{name}{_label_str(tuple(sorted(labels.items())))} {float(value)}")
+        return "\n".join(lines) + "\n"
+
+
+# 进程级单例
+_metrics: Optional[Metrics] = None
+
+
+def get_metrics() -> Metrics:
+    """获取进程级指标注册表"""
+    global _metrics
+    if _metrics is None:
+        _metrics = Metrics()
+    return _metrics
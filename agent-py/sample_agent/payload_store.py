@@ -0,0 +1,346 @@
+"""
+工具结果载荷存储 - 紧凑序列化 + 按内容寻址的大结果存储
+大体积的工具结果只保存一份，状态/检查点中只保留哈希引用，前端按需拉取
+引用必须在重启、多worker和内存淘汰后仍可解析，因此只有配置了持久化存储时才外置大结果
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+try:
+    import orjson
+except ImportError:  # 可选依赖，未安装时使用标准库json
+    orjson = None
+
+logger = logging.getLogger("agent")
+
+# 存储配置（可通过环境变量覆盖，PAYLOAD_STORE_PATH为空时不外置，工具结果保留在消息中）
+INLINE_MAX_BYTES = int(os.getenv("PAYLOAD_INLINE_MAX", "2048"))
+DEFAULT_MAX_ENTRIES = int(os.getenv("PAYLOAD_STORE_SIZE", "512"))
+DEFAULT_MAX_BYTES = int(os.getenv("PAYLOAD_STORE_MAX_BYTES", str(64 * 1024 * 1024)))
+DEFAULT_PATH = os.getenv("PAYLOAD_STORE_PATH", "")
+# SQLite中载荷的保留时间（秒）和总字节数上限，由后台写入线程定期清理（0表示不限制）
+DEFAULT_TTL = float(os.getenv("PAYLOAD_STORE_TTL", str(7 * 24 * 3600)))
+DEFAULT_DB_MAX_BYTES = int(os.getenv("PAYLOAD_STORE_DB_MAX_BYTES", str(256 * 1024 * 1024)))
+PRUNE_INTERVAL = float(os.getenv("PAYLOAD_STORE_PRUNE_INTERVAL", "60"))
+
+# 引用消息中的哈希字段
+REF_KEY = "payload_ref"
+
+
+def compact_dumps(value: Any) -> str:
+    """紧凑JSON序列化（无缩进、不转义中文），安装了orjson时优先使用"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(value, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+        except TypeError:
+            pass
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+class PayloadMissing(ValueError):
+    """引用的载荷不在存储中（已淘汰或来自其他存储）"""
+
+
+def parse_ref(content: str) -> Optional[str]:
+    """内容是载荷引用时返回哈希，否则返回None"""
+    if not content.startswith('{"' + REF_KEY):
+        return None
+    try:
+        return json.loads(content)[REF_KEY]
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+class PayloadStore:
+    """
+    按内容寻址的载荷存储（sha256 -> JSON文本）
+    内存LRU（按条目数和总字节数淘汰）作为SQLite持久化存储的读缓存，SQLite供多个worker共享
+    写入由后台线程批量落盘并按保留时间/总大小清理（write-behind），内存未命中的读取通过 aget/aresolve 在工作线程中查询，
+    事件循环上不做数据库I/O
+    """
+
+    def __init__(
+        self,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        path: Optional[str] = DEFAULT_PATH or None,
+        ttl: float = DEFAULT_TTL,
+        db_max_bytes: int = DEFAULT_DB_MAX_BYTES,
+    ):
+        self.max_entries = max(1, max_entries)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.db_max_bytes = db_max_bytes
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._bytes = 0
+        self._db: Optional[sqlite3.Connection] = None
+        self.counters = {"stored": 0, "deduplicated": 0, "hits": 0, "misses": 0, "evictions": 0, "pruned": 0}
+        # 已排队、尚未落盘的载荷（可能已被内存LRU淘汰，读取时仍需可见），与写入线程共享
+        self._pending: dict = {}
+        self._pending_lock = threading.Lock()
+        # 读连接在工作线程中使用，同一时间只允许一个查询
+        self._read_lock = threading.Lock()
+        self._writes: "queue.SimpleQueue[Optional[tuple[str, str, float]]]" = queue.SimpleQueue()
+        self._writer: Optional[threading.Thread] = None
+        if path:
+            self._open(path)
+
+    def _open(self, path: str):
+        try:
+            self._db = _connect(path)
+            logger.info(f"💾 载荷存储已打开: {path}")
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ 载荷存储持久化不可用，仅使用内存: {e}")
+            self._db = None
+            return
+        self._writer = threading.Thread(target=self._write_loop, args=(path,), name="payload-store-writer", daemon=True)
+        self._writer.start()
+
+    def _write_loop(self, path: str):
+        """后台写入线程：按顺序批量写入排队的载荷，并定期清理过期和超出总大小的载荷"""
+        try:
+            db = _connect(path)
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ 载荷写入线程无法打开数据库: {e}")
+            db = None
+        last_prune = 0.0
+        while True:
+            item = self._writes.get()
+            batch = [item]
+            while item is not None:
+                try:
+                    item = self._writes.get_nowait()
+                except queue.Empty:
+                    break
+                batch.append(item)
+            rows = [row for row in batch if row is not None]
+            if db is not None:
+                self._apply(db, rows)
+                if time.monotonic() - last_prune >= PRUNE_INTERVAL:
+                    self._prune(db)
+                    last_prune = time.monotonic()
+            with self._pending_lock:
+                for digest, _, _ in rows:
+                    self._pending.pop(digest, None)
+            if batch[-1] is None:
+                break
+        if db is not None:
+            db.close()
+
+    def _apply(self, db: sqlite3.Connection, rows: list):
+        if not rows:
+            return
+        try:
+            db.execute("BEGIN")
+            db.executemany("INSERT OR IGNORE INTO payloads (digest, content, created_at) VALUES (?, ?, ?)", rows)
+            db.execute("COMMIT")
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ 载荷写入失败: {e}")
+            if db.in_transaction:
+                db.execute("ROLLBACK")
+
+    def _prune(self, db: sqlite3.Connection):
+        """删除超过保留时间的载荷；总大小超过上限时从最旧的开始删除（引用失效后解析为PayloadMissing）"""
+        try:
+            pruned = 0
+            if self.ttl > 0:
+                pruned += db.execute("DELETE FROM payloads WHERE created_at < ?", (time.time() - self.ttl,)).rowcount
+            if self.db_max_bytes > 0:
+                total, cutoff = 0, None
+                for created_at, size in db.execute(
+                    "SELECT created_at, LENGTH(CAST(content AS BLOB)) FROM payloads ORDER BY created_at DESC"
+                ):
+                    total += size
+                    if total > self.db_max_bytes:
+                        cutoff = created_at
+                        break
+                if cutoff is not None:
+                    pruned += db.execute("DELETE FROM payloads WHERE created_at <= ?", (cutoff,)).rowcount
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ 载荷清理失败: {e}")
+            return
+        if pruned:
+            self.counters["pruned"] += pruned
+            logger.info(f"🧹 载荷存储清理了 {pruned} 条")
+
+    def put(self, content: str) -> str:
+        """
+        保存载荷（相同内容只保存一次）
+
+        Returns:
+            str: 内容的sha256哈希
+        """
+        digest = hashlib.sha256(content.encode()).hexdigest()
+        if digest in self._entries:
+            self._entries.move_to_end(digest)
+            self.counters["deduplicated"] += 1
+            return digest
+        self._remember(digest, content)
+        self.counters["stored"] += 1
+        if self._writer is not None:
+            with self._pending_lock:
+                self._pending[digest] = content
+            self._writes.put((digest, content, time.time()))
+        return digest
+
+    def _remember(self, digest: str, content: str):
+        self._entries[digest] = content
+        self._bytes += len(content)
+        while len(self._entries) > 1 and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= len(evicted)
+            self.counters["evictions"] += 1
+
+    def _get_local(self, digest: str) -> Optional[str]:
+        """只查内存LRU和待落盘队列"""
+        content = self._entries.get(digest)
+        if content is not None:
+            self._entries.move_to_end(digest)
+            return content
+        with self._pending_lock:
+            return self._pending.get(digest)
+
+    def _load(self, digest: str) -> Optional[str]:
+        """查询SQLite（阻塞，在工作线程中调用）"""
+        db = self._db
+        if db is None:
+            return None
+        try:
+            with self._read_lock:
+                row = db.execute("SELECT content FROM payloads WHERE digest = ?", (digest,)).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"⚠️ 载荷读取失败: {e}")
+            return None
+        return row[0] if row is not None else None
+
+    def _found(self, digest: str, content: Optional[str], local: bool) -> Optional[str]:
+        if content is None:
+            self.counters["misses"] += 1
+            return None
+        if not local:
+            self._remember(digest, content)
+        self.counters["hits"] += 1
+        return content
+
+    def get(self, digest: str) -> Optional[str]:
+        """按哈希读取载荷，内存未命中时查询SQLite（阻塞；事件循环中使用 aget）"""
+        content = self._get_local(digest)
+        if content is not None:
+            return self._found(digest, content, True)
+        return self._found(digest, self._load(digest), False)
+
+    async def aget(self, digest: str) -> Optional[str]:
+        """按哈希读取载荷，内存未命中时在工作线程中查询SQLite"""
+        content = self._get_local(digest)
+        if content is not None:
+            return self._found(digest, content, True)
+        if self._db is None:
+            return self._found(digest, None, False)
+        return self._found(digest, await asyncio.to_thread(self._load, digest), False)
+
+    @property
+    def persistent(self) -> bool:
+        return self._db is not None
+
+    def externalize(self, content: str, tool_name: str) -> str:
+        """
+        超过 INLINE_MAX_BYTES 的内容存入载荷存储，返回引用JSON；否则原样返回
+        未配置持久化存储时总是原样返回（进程内LRU中的引用在重启、其他worker或淘汰后会失效）
+        """
+        if not self.persistent:
+            return content
+        size = len(content.encode())
+        if size <= INLINE_MAX_BYTES:
+            return content
+        digest = self.put(content)
+        return compact_dumps({REF_KEY: digest, "tool": tool_name, "bytes": size})
+
+    def resolve(self, content: str, local_only: bool = False) -> str:
+        """
+        引用解析为完整内容；不是引用时原样返回
+
+        Args:
+            local_only: 只查内存，不访问SQLite（可在事件循环中直接调用）
+
+        Raises:
+            PayloadMissing: 引用的载荷已不在存储中（local_only时也包括不在内存中）
+        """
+        digest = parse_ref(content)
+        if digest is None:
+            return content
+        if local_only:
+            payload = self._found(digest, self._get_local(digest), True)
+        else:
+            payload = self.get(digest)
+        if payload is None:
+            raise PayloadMissing(f"载荷 {digest[:12]} 已不在存储中")
+        return payload
+
+    async def aresolve(self, content: str) -> str:
+        """
+        resolve 的异步版本，内存未命中时在工作线程中查询SQLite
+
+        Raises:
+            PayloadMissing: 引用的载荷已不在存储中
+        """
+        digest = parse_ref(content)
+        if digest is None:
+            return content
+        payload = await self.aget(digest)
+        if payload is None:
+            raise PayloadMissing(f"载荷 {digest[:12]} 已不在存储中")
+        return payload
+
+    def stats(self) -> dict:
+        """存储统计，用于监控"""
+        lookups = self.counters["hits"] + self.counters["misses"]
+        return {
+            **self.counters,
+            "size": len(self._entries),
+            "bytes": self._bytes,
+            "hit_rate": round(self.counters["hits"] / lookups, 4) if lookups else 0.0,
+            "persistent": self.persistent,
+        }
+
+    def close(self, timeout: float = 5.0):
+        """写完排队中的载荷后关闭数据库（会阻塞，在事件循环中应通过 asyncio.to_thread 调用）"""
+        writer, self._writer = self._writer, None
+        if writer is not None:
+            self._writes.put(None)
+            writer.join(timeout)
+        if self._db is not None:
+            with self._read_lock:
+                self._db.close()
+            self._db = None
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")
+    db.execute(
+        "CREATE TABLE IF NOT EXISTS payloads (digest TEXT PRIMARY KEY, content TEXT NOT NULL, created_at REAL NOT NULL)"
+    )
+    db.execute("CREATE INDEX IF NOT EXISTS payloads_created_at ON payloads (created_at)")
+    return db
+
+
+# 进程级单例
+_store: Optional[PayloadStore] = None
+
+
+def get_payload_store() -> PayloadStore:
+    """获取进程级载荷存储"""
+    global _store
+    if _store is None:
+        _store = PayloadStore()
+    return _store
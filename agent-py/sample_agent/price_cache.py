@@ -0,0 +1,168 @@
+"""
+进程内价格缓存 - TTL + LRU淘汰 + stale-while-revalidate
+按代币符号(symbol:BTC)和交易对(pair:BTC/ETH)缓存价格数据
+"""
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Optional
+
+logger = logging.getLogger("agent")
+
+# 缓存配置（可通过环境变量覆盖）
+DEFAULT_TTL = float(os.getenv("PRICE_CACHE_TTL", "30"))
+DEFAULT_STALE_TTL = float(os.getenv("PRICE_CACHE_STALE_TTL", "300"))
+DEFAULT_MAX_ENTRIES = int(os.getenv("PRICE_CACHE_MAX_ENTRIES", "256"))
+
+
+class _Entry:
+    __slots__ = ("value", "stored_at", "updated_at")
+
+    def __init__(self, value: Any, age: float = 0.0):
+        self.value = value
+        self.stored_at = time.monotonic() - age
+        self.updated_at = time.time() - age
+
+    @property
+    def age(self) -> float:
+        return time.monotonic() - self.stored_at
+
+
+class PriceCache:
+    """
+    价格缓存
+    - age <= ttl: 直接返回（新鲜命中）
+    - ttl < age <= ttl + stale_ttl: 立即返回旧值，同时后台刷新一次（陈旧命中）
+    - 其余情况: 等待加载函数返回（未命中）
+    """
+
+    def __init__(
+        self,
+        ttl: float = DEFAULT_TTL,
+        stale_ttl: float = DEFAULT_STALE_TTL,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+    ):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max(1, max_entries)
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._refreshing: dict[str, asyncio.Task] = {}
+        self.counters = {
+            "hits": 0,
+            "stale_hits": 0,
+            "misses": 0,
+            "refreshes": 0,
+            "refresh_errors": 0,
+            "evictions": 0,
+        }
+
+    def set(self, key: str, value: Any, age: float = 0.0):
+        """
+        写入缓存，超出容量时淘汰最久未使用的条目
+
+        Args:
+            age: 数据写入时已有的年龄（秒），如从其他worker读取的价格
+        """
+        self._entries[key] = _Entry(value, max(0.0, age))
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.counters["evictions"] += 1
+
+    def _lookup(self, key: str, max_age: float) -> Optional[_Entry]:
+        entry = self._entries.get(key)
+        if entry is None or entry.age > max_age:
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def get(self, key: str) -> Optional[Any]:
+        """只读取新鲜数据，不触发加载"""
+        entry = self._lookup(key, self.ttl)
+        if entry is None:
+            return None
+        self.counters["hits"] += 1
+        return entry.value
+
+    def peek(self, key: str) -> Optional[Any]:
+        """读取新鲜或陈旧数据，不触发加载（供同步工具使用）"""
+        entry = self._lookup(key, self.ttl + self.stale_ttl)
+        if entry is None:
+            return None
+        self.counters["hits" if entry.age <= self.ttl else "stale_hits"] += 1
+        return entry.value
+
+    def age(self, key: str) -> Optional[float]:
+        """条目年龄（秒），不存在时返回None"""
+        entry = self._entries.get(key)
+        return entry.age if entry is not None else None
+
+    async def get_or_load(self, key: str, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        读取缓存，必要时调用loader加载
+
+        Args:
+            key: 缓存键
+            loader: 无参异步加载函数，异常会在未命中时直接抛出
+        """
+        entry = self._lookup(key, self.ttl + self.stale_ttl)
+        if entry is not None and entry.age <= self.ttl:
+            self.counters["hits"] += 1
+            return entry.value
+        if entry is not None:
+            self.counters["stale_hits"] += 1
+            self._schedule_refresh(key, loader)
+            return entry.value
+
+        self.counters["misses"] += 1
+        value = await loader()
+        self.set(key, value)
+        return value
+
+    def _schedule_refresh(self, key: str, loader: Callable[[], Awaitable[Any]]):
+        """每个键同时只允许一个后台刷新"""
+        if key in self._refreshing:
+            return
+
+        async def _refresh():
+            try:
+                self.set(key, await loader())
+                self.counters["refreshes"] += 1
+            except Exception as e:
+                self.counters["refresh_errors"] += 1
+                logger.warning(f"⚠️ 价格缓存后台刷新失败 {key}: {e}")
+            finally:
+                self._refreshing.pop(key, None)
+
+        self._refreshing[key] = asyncio.create_task(_refresh(), name=f"price-refresh-{key}")
+
+    def stats(self) -> dict:
+        """命中/未命中计数与条目年龄，用于监控"""
+        lookups = self.counters["hits"] + self.counters["stale_hits"] + self.counters["misses"]
+        ages = [entry.age for entry in self._entries.values()]
+        return {
+            **self.counters,
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "hit_ratio": round((lookups - self.counters["misses"]) / lookups, 4) if lookups else 0.0,
+            "oldest_age": round(max(ages), 3) if ages else 0.0,
+            "newest_age": round(min(ages), 3) if ages else 0.0,
+            "refreshing": len(self._refreshing),
+        }
+
+    def clear(self):
+        self._entries.clear()
+
+
+# 进程级单例
+_cache: Optional[PriceCache] = None
+
+
+def get_price_cache() -> PriceCache:
+    """获取进程级价格缓存"""
+    global _cache
+    if _cache is None:
+        _cache = PriceCache()
+    return _cache
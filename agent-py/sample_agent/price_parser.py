@@ -0,0 +1,99 @@
+"""
+搜索结果价格解析 - 预编译的单次扫描提取器
+一次遍历搜索内容，同时提取所有已知代币的美元价格和 "1 X = Y Z" 形式的交易对汇率
+"""
+import asyncio
+import os
+import re
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Iterable
+
+from sample_agent.metrics import get_metrics
+from sample_agent.quote_engine import DEFAULT_USD_PRICES
+
+metrics = get_metrics()
+
+# 超过该长度（字符）的搜索内容在工作线程中解析，避免阻塞事件循环
+PARSE_THREAD_THRESHOLD = int(os.getenv("PRICE_PARSE_THREAD_THRESHOLD", "65536"))
+
+# 数字：带千分位逗号（61,234.5）或不带（3100 / 0.85）
+_NUMBER = r"(?:[0-9]{1,3}(?:,[0-9]{3})+|[0-9]+)(?:\.[0-9]+)?"
+
+
+@dataclass
+class ParsedPrices:
+    """单次扫描的解析结果"""
+    # {代币符号: 美元价格}，每个代币取第一次出现的价格
+    prices: dict = field(default_factory=dict)
+    # {(源代币, 目标代币): 汇率}，来自 "1 X = Y Z" 形式
+    rates: dict = field(default_factory=dict)
+
+
+class PriceExtractor:
+    """
+    预编译的价格提取器
+    所有代币符号合并为一个正则（符号已转义），交易对形式优先匹配，
+    例如 "BTC: $61,234.5 ... 1 BTC = 19.7 ETH" 得到 BTC价格 和 BTC/ETH汇率
+    """
+
+    def __init__(self, symbols: Iterable[str]):
+        self.symbols = tuple(dict.fromkeys(s.upper() for s in symbols))
+        alt = "|".join(re.escape(s) for s in sorted(self.symbols, key=len, reverse=True))
+        token = rf"(?<![A-Z0-9])({alt})(?![A-Z0-9])"
+        # 开头的字符集前瞻让正则引擎快速跳过不可能匹配的位置
+        first_chars = re.escape("".join(sorted({"1"} | {s[0] for s in self.symbols})))
+        # 内容先统一转为大写再匹配，比 re.IGNORECASE 快得多
+        self._pattern = re.compile(
+            rf"(?=[{first_chars}])(?:"
+            # 交易对: 1 BTC = 19.7 ETH
+            rf"(?<![0-9.,])1\s*{token}\s*[:=≈]\s*\$?({_NUMBER})\s*{token}"
+            # 单币种: BTC: $61,234.5 / BTC 61234
+            rf"|{token}[:\s]*\$?({_NUMBER}))"
+        )
+
+    @metrics.timed("agent_stage", stage="price_parse")
+    def extract(self, content: str) -> ParsedPrices:
+        """
+        扫描一次搜索内容
+
+        只有一端有美元价格的交易对汇率，会用来推算另一端的价格
+        """
+        parsed = ParsedPrices()
+        prices, rates = parsed.prices, parsed.rates
+        for match in self._pattern.finditer(content.upper()):
+            pair_from, rate, pair_to, symbol, price = match.groups()
+            if symbol is not None:
+                value = float(price.replace(",", ""))
+                if value > 0 and symbol not in prices:
+                    prices[symbol] = value
+            else:
+                key = (pair_from, pair_to)
+                value = float(rate.replace(",", ""))
+                if value > 0 and key[0] != key[1] and key not in rates:
+                    rates[key] = value
+        for (from_token, to_token), rate in rates.items():
+            if from_token in prices and to_token not in prices:
+                prices[to_token] = prices[from_token] / rate
+            elif to_token in prices and from_token not in prices:
+                prices[from_token] = prices[to_token] * rate
+        return parsed
+
+    async def extract_async(self, content: str) -> ParsedPrices:
+        """解析搜索内容，大内容放到工作线程中执行"""
+        if len(content) > PARSE_THREAD_THRESHOLD:
+            return await asyncio.to_thread(self.extract, content)
+        return self.extract(content)
+
+
+@lru_cache(maxsize=64)
+def _extractor_for(symbols: tuple) -> PriceExtractor:
+    return PriceExtractor(symbols)
+
+
+def get_price_extractor(extra_symbols: Iterable[str] = ()) -> PriceExtractor:
+    """
+    获取覆盖所有已知代币（以及额外代币）的提取器，相同符号集合复用同一个预编译正则
+    """
+    extra = tuple(s.upper() for s in extra_symbols if s and s.upper() not in DEFAULT_USD_PRICES)
+    return _extractor_for(tuple(DEFAULT_USD_PRICES) + tuple(sorted(set(extra))))
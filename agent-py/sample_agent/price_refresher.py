@@ -0,0 +1,96 @@
+"""
+后台价格刷新任务 - 随应用生命周期启动
+定期刷新所有代币价格到共享存储（价格缓存 + 报价引擎），工具调用直接读取预计算数据
+"""
+import asyncio
+import logging
+import os
+import random
+import time
+from typing import Awaitable, Callable, Optional
+
+logger = logging.getLogger("agent")
+
+# 刷新配置（可通过环境变量覆盖）
+DEFAULT_INTERVAL = float(os.getenv("PRICE_REFRESH_INTERVAL", "20"))
+DEFAULT_JITTER = float(os.getenv("PRICE_REFRESH_JITTER", "0.2"))
+DEFAULT_MAX_BACKOFF = float(os.getenv("PRICE_REFRESH_MAX_BACKOFF", "300"))
+
+
+class PriceRefresher:
+    """
+    周期性价格刷新
+    - 每轮间隔 interval 秒，并加上 [0, jitter*interval] 的随机抖动，避免多进程同时刷新
+    - 失败时按指数退避（interval * 2^失败次数，上限max_backoff），成功后恢复正常间隔
+    - should_run 返回False的轮次跳过刷新（如多worker时只由共享价格表的写入者刷新）
+    """
+
+    def __init__(
+        self,
+        refresh: Callable[[], Awaitable[None]],
+        interval: float = DEFAULT_INTERVAL,
+        jitter: float = DEFAULT_JITTER,
+        max_backoff: float = DEFAULT_MAX_BACKOFF,
+        should_run: Optional[Callable[[], bool]] = None,
+    ):
+        self.refresh = refresh
+        self.should_run = should_run
+        self.interval = interval
+        self.jitter = jitter
+        self.max_backoff = max_backoff
+        self._task: Optional[asyncio.Task] = None
+        self.failures = 0
+        self.stats = {"runs": 0, "errors": 0, "skipped": 0, "last_success": None, "last_duration": None}
+
+    def next_delay(self) -> float:
+        """下一轮刷新前的等待时间"""
+        base = min(self.max_backoff, self.interval * (2 ** self.failures))
+        return base + random.uniform(0, self.jitter * self.interval)
+
+    async def run_once(self):
+        """执行一轮刷新并更新退避状态"""
+        started = time.perf_counter()
+        self.stats["runs"] += 1
+        try:
+            await self.refresh()
+        except Exception as e:
+            self.failures += 1
+            self.stats["errors"] += 1
+            logger.warning(f"⚠️ 后台价格刷新失败（连续{self.failures}次），{self.next_delay():.1f}s后重试: {e}")
+            return
+        self.failures = 0
+        self.stats["last_success"] = time.time()
+        self.stats["last_duration"] = round(time.perf_counter() - started, 3)
+
+    async def _loop(self):
+        while True:
+            if self.should_run is None or self.should_run():
+                await self.run_once()
+            else:
+                self.stats["skipped"] += 1
+            await asyncio.sleep(self.next_delay())
+
+    def start(self):
+        """启动后台刷新任务（幂等）"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._loop(), name="price-refresher")
+            logger.info(f"🔄 后台价格刷新已启动，间隔: {self.interval}s")
+
+    async def stop(self):
+        """停止后台刷新任务"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            logger.info("🔄 后台价格刷新已停止")
+
+    def snapshot(self) -> dict:
+        """刷新状态，用于监控"""
+        return {
+            **self.stats,
+            "running": self._task is not None and not self._task.done(),
+            "consecutive_failures": self.failures,
+        }
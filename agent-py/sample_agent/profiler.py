@@ -0,0 +1,85 @@
+"""
+采样分析器 - 在运行中的进程里定时抓取所有线程的调用栈，输出折叠栈格式
+（每行 "帧;帧;帧 次数"，可直接交给 flamegraph.pl / speedscope 生成火焰图）
+
+采样在独立线程中进行，不需要重启进程，也不阻塞事件循环
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Optional
+
+# 单次采样的最长时间和最小间隔
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "30"))
+PROFILE_MIN_INTERVAL = 0.001
+
+_profile_lock = threading.Lock()
+
+
+class ProfilerBusy(RuntimeError):
+    """已有采样正在进行"""
+
+
+def _frame_label(frame, with_lines: bool) -> str:
+    code = frame.f_code
+    filename = os.path.basename(code.co_filename)
+    label = f"{filename}:{code.co_name}"
+    if with_lines:
+        label += f":{frame.f_lineno}"
+    return label.replace(";", ":").replace(" ", "_")
+
+
+def sample_stacks(
+    seconds: float,
+    interval: float = 0.005,
+    with_lines: bool = False,
+    thread_filter: Optional[str] = None,
+) -> tuple[Counter, int]:
+    """
+    按间隔采样所有线程（不含采样线程自身）的调用栈
+
+    Args:
+        seconds: 采样时长，上限 PROFILE_MAX_SECONDS
+        interval: 采样间隔（秒）
+        with_lines: 帧名是否包含行号
+        thread_filter: 只采样名称包含该字符串的线程
+
+    Returns:
+        tuple: (折叠栈 -> 次数, 采样轮数)
+
+    Raises:
+        ProfilerBusy: 已有采样正在进行
+    """
+    if not _profile_lock.acquire(blocking=False):
+        raise ProfilerBusy("已有采样正在进行")
+    try:
+        seconds = min(max(seconds, 0.0), PROFILE_MAX_SECONDS)
+        interval = max(interval, PROFILE_MIN_INTERVAL)
+        me = threading.get_ident()
+        stacks: Counter = Counter()
+        rounds = 0
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                name = names.get(ident, str(ident))
+                if ident == me or (thread_filter and thread_filter not in name):
+                    continue
+                frames = []
+                while frame is not None:
+                    frames.append(_frame_label(frame, with_lines))
+                    frame = frame.f_back
+                frames.append(f"thread:{name}".replace(";", ":").replace(" ", "_"))
+                stacks[";".join(reversed(frames))] += 1
+            rounds += 1
+            time.sleep(interval)
+        return stacks, rounds
+    finally:
+        _profile_lock.release()
+
+
+def render_collapsed(stacks: Counter) -> str:
+    """折叠栈文本，按次数从高到低"""
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
@@ -0,0 +1,221 @@
+"""
+报价引擎 - 集中维护所有代币的美元价格
+使用NumPy一次性计算N×N交叉汇率、各方案档位的费后输出和兑换限额，批量报价与单笔报价成本相近
+"""
+import threading
+import time
+from typing import Optional
+
+import numpy as np
+
+# 默认汇率（如果搜索失败）
+DEFAULT_USD_PRICES = {
+    "BTC": 45000,
+    "ETH": 3000,
+    "USDT": 1,
+    "USDC": 1,
+    "BNB": 300,
+    "ADA": 0.5,
+    "SOL": 100,
+    "DOT": 7,
+    "MATIC": 0.8,
+    "AVAX": 25
+}
+
+# 代币兑换限制: (最小兑换量, 最大兑换量, 手续费率)
+TOKEN_LIMITS = {
+    "BTC": (0.001, 10.0, 0.001),
+    "ETH": (0.01, 100.0, 0.002),
+    "USDT": (10.0, 100000.0, 0.0005),
+}
+DEFAULT_TOKEN_LIMITS = (1.0, 10000.0, 0.002)
+
+# 兑换方案档位
+PLAN_TIERS = [
+    {
+        "id": "standard",
+        "name": "标准兑换",
+        "description": "快速兑换，低手续费",
+        "fee_rate": 0.001,
+        "output_factor": 0.999,
+        "rate_jitter": (-0.01, 0.01),
+        "estimated_time": "5-10分钟",
+        "features": ["快速处理", "低手续费", "高流动性"],
+        "recommended": True
+    },
+    {
+        "id": "fast",
+        "name": "快速兑换",
+        "description": "优先处理，快速到账",
+        "fee_rate": 0.003,
+        "output_factor": 0.997,
+        "rate_jitter": (-0.005, 0.005),
+        "estimated_time": "2-5分钟",
+        "features": ["优先处理", "快速到账", "高优先级"],
+        "recommended": False
+    },
+    {
+        "id": "economy",
+        "name": "经济兑换",
+        "description": "最低手续费，处理时间较长",
+        "fee_rate": 0.0005,
+        "output_factor": 0.9995,
+        "rate_jitter": (-0.02, 0.02),
+        "estimated_time": "15-30分钟",
+        "features": ["最低手续费", "经济实惠", "批量处理"],
+        "recommended": False
+    },
+    {
+        "id": "premium",
+        "name": "高级兑换",
+        "description": "最优汇率，专业服务",
+        "fee_rate": 0.002,
+        "output_factor": 1.01,
+        "rate_jitter": (0.01, 0.03),
+        "estimated_time": "10-15分钟",
+        "features": ["最优汇率", "专业服务", "VIP支持"],
+        "recommended": False
+    },
+]
+
+
+class QuoteEngine:
+    """
+    向量化报价引擎
+    - prices: 长度N+1的美元价格数组，最后一位是未知代币的占位价格1.0（与原先 .get(symbol, 1) 一致）
+    - cross_rates(): N×N交叉汇率矩阵，价格变化后惰性重算
+    - quote_batch(): 一次计算一批报价在所有档位下的汇率、费后输出和限额
+    """
+
+    def __init__(self, prices: Optional[dict] = None, limits: Optional[dict] = None):
+        prices = prices if prices is not None else DEFAULT_USD_PRICES
+        limits = limits if limits is not None else TOKEN_LIMITS
+        self.symbols = list(prices)
+        self.index = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self._unknown = len(self.symbols)
+        self.prices = np.array([float(prices[s]) for s in self.symbols] + [1.0])
+        # 价格更新时间（0表示仍是默认价格）
+        self.updated_at = np.zeros(len(self.symbols) + 1)
+        limit_rows = [limits.get(s, DEFAULT_TOKEN_LIMITS) for s in self.symbols] + [DEFAULT_TOKEN_LIMITS]
+        self.min_amounts, self.max_amounts, self.fee_rates = (np.array(col) for col in zip(*limit_rows))
+        self.tier_factors = np.array([tier["output_factor"] for tier in PLAN_TIERS])
+        self.tier_jitter = np.array([tier["rate_jitter"] for tier in PLAN_TIERS])
+        self._rng = np.random.default_rng()
+        self._cross: Optional[np.ndarray] = None
+        self._lock = threading.Lock()
+
+    def _indices(self, symbols) -> np.ndarray:
+        return np.fromiter((self.index.get(s.upper(), self._unknown) for s in symbols), dtype=np.intp)
+
+    def update_prices(self, prices: dict, updated_at: Optional[float] = None) -> list[str]:
+        """
+        更新代币美元价格
+
+        Args:
+            updated_at: 价格的获取时间，默认为当前时间
+
+        Returns:
+            list: 价格发生变化的代币符号
+        """
+        changed = []
+        now = updated_at or time.time()
+        with self._lock:
+            for symbol, price in prices.items():
+                i = self.index.get(symbol.upper())
+                if i is None or not price or price <= 0:
+                    continue
+                if self.prices[i] != price:
+                    self.prices[i] = float(price)
+                    changed.append(symbol.upper())
+                self.updated_at[i] = now
+            if changed:
+                self._cross = None
+        return changed
+
+    def price(self, symbol: str) -> float:
+        return float(self.prices[self.index.get(symbol.upper(), self._unknown)])
+
+    def cross_rates(self) -> np.ndarray:
+        """N×N交叉汇率矩阵，rates[i, j] 表示 1个symbols[i] 可兑换多少 symbols[j]"""
+        cross = self._cross
+        if cross is None:
+            prices = self.prices[:-1]
+            cross = prices[:, None] / prices[None, :]
+            self._cross = cross
+        return cross
+
+    def rate(self, from_token: str, to_token: str) -> float:
+        return self.price(from_token) / self.price(to_token)
+
+    def quote_batch(self, requests: list[tuple[str, str, float]]) -> dict:
+        """
+        批量报价（单次向量化计算）
+
+        Args:
+            requests: [(from_token, to_token, amount), ...]
+
+        Returns:
+            dict: 各字段为按请求顺序排列的数组，
+                  exchange_rates/outputs 形状为 (批量大小, 档位数)
+        """
+        from_idx = self._indices(r[0] for r in requests)
+        to_idx = self._indices(r[1] for r in requests)
+        amounts = np.array([float(r[2]) for r in requests])
+        prices = self.prices
+        from_prices = prices[from_idx]
+        to_prices = prices[to_idx]
+        rates = from_prices / to_prices
+        jitter = self._rng.uniform(self.tier_jitter[:, 0], self.tier_jitter[:, 1], size=(len(requests), len(PLAN_TIERS)))
+        return {
+            "from_prices": from_prices,
+            "to_prices": to_prices,
+            "rates": rates,
+            "exchange_rates": rates[:, None] * (1 + jitter),
+            "outputs": amounts[:, None] * rates[:, None] * self.tier_factors[None, :],
+            "min_amounts": self.min_amounts[from_idx],
+            "max_amounts": self.max_amounts[from_idx],
+            "updated_at": np.minimum(self.updated_at[from_idx], self.updated_at[to_idx]),
+        }
+
+    def build_plans(self, batch: dict, row: int) -> list[dict]:
+        """把quote_batch结果中的一行转换为兑换方案列表"""
+        exchange_rates = batch["exchange_rates"][row]
+        outputs = batch["outputs"][row]
+        return [
+            {
+                "id": tier["id"],
+                "name": tier["name"],
+                "description": tier["description"],
+                "exchange_rate": round(float(exchange_rates[t]), 6),
+                "fee_rate": tier["fee_rate"],
+                "estimated_output": round(float(outputs[t]), 6),
+                "estimated_time": tier["estimated_time"],
+                "risk_level": "low",
+                "features": list(tier["features"]),
+                "recommended": tier["recommended"]
+            }
+            for t, tier in enumerate(PLAN_TIERS)
+        ]
+
+    def freshness(self, symbols=None) -> float:
+        """一组代币（默认全部）中最旧的价格更新时间戳，0表示存在未更新过的默认价格"""
+        if symbols is None:
+            return float(self.updated_at[:-1].min())
+        return float(self.updated_at[self._indices(symbols)].min())
+
+    def token_limits(self, symbol: str) -> tuple[float, float, float]:
+        """代币的 (最小兑换量, 最大兑换量, 手续费率)"""
+        i = self.index.get(symbol.upper(), self._unknown)
+        return float(self.min_amounts[i]), float(self.max_amounts[i]), float(self.fee_rates[i])
+
+
+# 进程级单例
+_engine: Optional[QuoteEngine] = None
+
+
+def get_quote_engine() -> QuoteEngine:
+    """获取进程级报价引擎"""
+    global _engine
+    if _engine is None:
+        _engine = QuoteEngine()
+    return _engine
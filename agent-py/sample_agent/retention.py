@@ -0,0 +1,107 @@
+"""
+会话状态保留策略 - 限制每个线程的消息数量和搜索历史
+保证单轮处理成本和检查点大小不随会话长度线性增长
+"""
+import json
+import logging
+import os
+from typing import Callable, Optional
+
+from langchain_core.messages import BaseMessage, RemoveMessage, SystemMessage, ToolMessage
+
+from sample_agent.payload_store import compact_dumps, get_payload_store
+
+logger = logging.getLogger("agent")
+
+# 保留策略配置（可通过环境变量覆盖）
+MAX_MESSAGES = int(os.getenv("STATE_MAX_MESSAGES", "40"))
+# 最近的若干条工具结果保留完整内容，更早的折叠为摘要
+KEEP_TOOL_PAYLOADS = int(os.getenv("STATE_KEEP_TOOL_PAYLOADS", "2"))
+# 内容不超过该长度的工具结果不折叠
+STUB_THRESHOLD = int(os.getenv("STATE_TOOL_STUB_THRESHOLD", "512"))
+MAX_SEARCH_HISTORY = int(os.getenv("STATE_MAX_SEARCH_HISTORY", "20"))
+
+
+def collapse_tool_message(message: ToolMessage, summarize: Optional[Callable[[dict], str]] = None) -> ToolMessage:
+    """
+    把工具结果折叠为简短的JSON摘要（保留消息id，add_messages按id原位替换）
+
+    Args:
+        summarize: 可选的摘要函数，参数为解析后的工具结果
+    """
+    content = str(message.content)
+    summary = content[:120]
+    if summarize is not None:
+        try:
+            # 只用内存中的载荷生成摘要，不在节点中同步查询SQLite；未命中时保留引用文本
+            summary = summarize(json.loads(get_payload_store().resolve(content, local_only=True)))
+        except (TypeError, ValueError, KeyError):
+            pass
+    stub = {"collapsed": True, "tool": message.name, "summary": summary, "original_chars": len(content)}
+    return ToolMessage(
+        content=compact_dumps(stub),
+        tool_call_id=message.tool_call_id,
+        name=message.name,
+        id=message.id,
+        status=message.status,
+        additional_kwargs={"collapsed": True},
+    )
+
+
+def is_collapsed(message: BaseMessage) -> bool:
+    return isinstance(message, ToolMessage) and message.additional_kwargs.get("collapsed", False)
+
+
+def retention_updates(messages: list, summarizers: Optional[dict] = None) -> list:
+    """
+    计算保留策略需要的消息更新（供节点返回给 add_messages 合并）
+
+    - 超出最近 MAX_MESSAGES 条的消息删除（RemoveMessage），窗口不以ToolMessage开头，避免孤立的工具结果
+    - 窗口内较早的大体积工具结果折叠为摘要
+
+    Returns:
+        list: RemoveMessage 和替换用的 ToolMessage
+    """
+    summarizers = summarizers or {}
+    cut = max(0, len(messages) - MAX_MESSAGES)
+    while cut < len(messages) and isinstance(messages[cut], ToolMessage):
+        cut += 1
+    removals = [
+        RemoveMessage(id=message.id)
+        for message in messages[:cut]
+        if message.id and not isinstance(message, SystemMessage)
+    ]
+
+    tool_messages = [m for m in messages[cut:] if isinstance(m, ToolMessage)]
+    stale = tool_messages[:-KEEP_TOOL_PAYLOADS] if KEEP_TOOL_PAYLOADS > 0 else tool_messages
+    collapsed = [
+        collapse_tool_message(message, summarizers.get(message.name))
+        for message in stale
+        if message.id and len(str(message.content)) > STUB_THRESHOLD and not is_collapsed(message)
+    ]
+
+    if removals or collapsed:
+        logger.info(f"✂️ 状态保留策略: 删除 {len(removals)} 条旧消息，折叠 {len(collapsed)} 条工具结果")
+    return removals + collapsed
+
+
+def cap_search_history(search_history: list) -> list:
+    """只保留最近 MAX_SEARCH_HISTORY 条搜索记录"""
+    if len(search_history) > MAX_SEARCH_HISTORY:
+        return search_history[-MAX_SEARCH_HISTORY:]
+    return search_history
+
+
+def merge_new_messages(*, state: dict, messages: list, actions: list, agent_name: str) -> dict:
+    """
+    CopilotKit的状态合并函数（替代默认的按id去重）
+
+    前端每次都会发送完整的消息历史，默认合并会把保留策略删除的旧消息重新加回状态；
+    这里只追加前端最后一条已知消息之后的新消息
+    """
+    if messages and isinstance(messages[0], SystemMessage):
+        messages = messages[1:]
+    existing_ids = {message.id for message in state.get("messages", [])}
+    last_known = max((i for i, message in enumerate(messages) if message.id in existing_ids), default=-1)
+    new_messages = [message for message in messages[last_known + 1:] if message.id not in existing_ids]
+    return {**state, "messages": new_messages, "copilotkit": {"actions": actions}}
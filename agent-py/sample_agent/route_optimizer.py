@@ -0,0 +1,196 @@
+"""
+多跳兑换路由 - 在交易对图上搜索费后输出最优的兑换路径
+图的边权为费后对数汇率 log(rate × (1 - fee))，路径的总汇率即边权之和，
+最多3跳的全部简单路径用NumPy一次枚举，单次查询在亚毫秒级完成
+"""
+import math
+import os
+import threading
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+from sample_agent.quote_engine import QuoteEngine, get_quote_engine
+
+# 路由配置（可通过环境变量覆盖）
+# 中转代币：与中转代币组成的交易对流动性好、手续费低
+ROUTE_HUBS = tuple(s.strip().upper() for s in os.getenv("ROUTE_HUBS", "USDT,ETH").split(",") if s.strip())
+ROUTE_HUB_FEE = float(os.getenv("ROUTE_HUB_FEE", "0.0005"))
+ROUTE_PAIR_FEE = float(os.getenv("ROUTE_PAIR_FEE", "0.003"))
+ROUTE_MAX_HOPS = min(3, max(1, int(os.getenv("ROUTE_MAX_HOPS", "3"))))
+# 兑换方案中附加的多跳路由数量
+ROUTE_TOP_K = int(os.getenv("ROUTE_TOP_K", "2"))
+
+
+@dataclass
+class Route:
+    """一条兑换路径"""
+    path: tuple
+    rate: float
+    fee_rate: float
+
+    @property
+    def hops(self) -> int:
+        return len(self.path) - 1
+
+
+class RouteOptimizer:
+    """
+    交易对图上的路由搜索
+    - log_rates: N×N费后对数汇率矩阵，log_rates[i, j] 为 1个symbols[i] 经直接交易对可得的 symbols[j] 的对数
+    - 查询前与报价引擎的价格比对，只重算价格变化的代币所在的行和列
+    - set_pair_rate(): 用搜索结果中观察到的交易对汇率覆盖由美元价格推算的汇率
+    """
+
+    def __init__(
+        self,
+        engine: Optional[QuoteEngine] = None,
+        hubs: tuple = ROUTE_HUBS,
+        hub_fee: float = ROUTE_HUB_FEE,
+        pair_fee: float = ROUTE_PAIR_FEE,
+        max_hops: int = ROUTE_MAX_HOPS,
+    ):
+        self.engine = engine or get_quote_engine()
+        self.symbols = list(self.engine.symbols)
+        self.index = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self.max_hops = max_hops
+        n = len(self.symbols)
+        is_hub = np.array([symbol in hubs for symbol in self.symbols])
+        self.fees = np.where(is_hub[:, None] | is_hub[None, :], hub_fee, pair_fee)
+        np.fill_diagonal(self.fees, 0.0)
+        self._fee_logs = np.log1p(-self.fees)
+        self._prices = np.full(n, np.nan)
+        self.log_rates = np.full((n, n), -np.inf)
+        # 每个 (源, 目标) 的候选路径只枚举一次，与得分数组按位置对应
+        self._paths: dict = {}
+        self.counters = {"queries": 0, "syncs": 0, "tokens_updated": 0, "pair_overrides": 0}
+        self._lock = threading.Lock()
+        self._sync()
+
+    def _sync(self):
+        """与报价引擎同步价格，只重算变化的行和列"""
+        prices = self.engine.prices[:-1]
+        changed = np.nonzero(prices != self._prices)[0]
+        if changed.size == 0:
+            return
+        with self._lock:
+            logs = np.log(prices)
+            self.log_rates[changed, :] = logs[changed, None] - logs[None, :] + self._fee_logs[changed, :]
+            self.log_rates[:, changed] = logs[:, None] - logs[None, changed] + self._fee_logs[:, changed]
+            self.log_rates[changed, changed] = -np.inf
+            self._prices = prices.copy()
+            self.counters["syncs"] += 1
+            self.counters["tokens_updated"] += int(changed.size)
+
+    def set_pair_rate(self, from_token: str, to_token: str, rate: float):
+        """记录观察到的交易对汇率（1 from_token = rate to_token），两个方向都更新"""
+        i, j = self.index.get(from_token.upper()), self.index.get(to_token.upper())
+        if i is None or j is None or i == j or not rate or rate <= 0:
+            return
+        self._sync()
+        with self._lock:
+            self.log_rates[i, j] = math.log(rate) + self._fee_logs[i, j]
+            self.log_rates[j, i] = -math.log(rate) + self._fee_logs[j, i]
+            self.counters["pair_overrides"] += 1
+
+    def _route(self, path: tuple, log_rate: float) -> Route:
+        fee_logs = sum(self._fee_logs[a, b] for a, b in zip(path, path[1:]))
+        return Route(
+            path=tuple(self.symbols[i] for i in path),
+            rate=math.exp(log_rate),
+            fee_rate=1 - math.exp(fee_logs),
+        )
+
+    def routes(self, from_token: str, to_token: str, k: int = 1) -> list[Route]:
+        """
+        费后汇率最高的前k条路径（最多 max_hops 跳、不重复经过同一代币），按汇率从高到低
+
+        Returns:
+            list: Route列表，未知代币或相同代币时为空
+        """
+        s, t = self.index.get(from_token.upper()), self.index.get(to_token.upper())
+        if s is None or t is None or s == t or k <= 0:
+            return []
+        self._sync()
+        self.counters["queries"] += 1
+        rates = self.log_rates
+        mids = np.array([i for i in range(len(self.symbols)) if i != s and i != t], dtype=np.intp)
+
+        scores = [np.array([rates[s, t]])]
+        if self.max_hops >= 2 and mids.size:
+            scores.append(rates[s, mids] + rates[mids, t])
+        if self.max_hops >= 3 and mids.size > 1:
+            three = rates[s, mids][:, None] + rates[np.ix_(mids, mids)] + rates[mids, t][None, :]
+            np.fill_diagonal(three, -np.inf)
+            scores.append(three.ravel())
+        scores = np.concatenate(scores)
+        paths = self._paths.get((s, t))
+        if paths is None:
+            paths = [(s, t)]
+            if self.max_hops >= 2:
+                paths.extend((s, int(m), t) for m in mids)
+            if self.max_hops >= 3 and mids.size > 1:
+                paths.extend((s, int(a), int(b), t) for a in mids for b in mids)
+            self._paths[(s, t)] = paths
+
+        k = min(k, int(np.isfinite(scores).sum()))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [self._route(paths[i], float(scores[i])) for i in top]
+
+    def direct(self, from_token: str, to_token: str) -> Optional[Route]:
+        """直接交易对的路径"""
+        s, t = self.index.get(from_token.upper()), self.index.get(to_token.upper())
+        if s is None or t is None or s == t:
+            return None
+        self._sync()
+        return self._route((s, t), float(self.log_rates[s, t]))
+
+    def best_route(self, from_token: str, to_token: str) -> Optional[Route]:
+        routes = self.routes(from_token, to_token, 1)
+        return routes[0] if routes else None
+
+    def stats(self) -> dict:
+        return {**self.counters, "tokens": len(self.symbols), "max_hops": self.max_hops}
+
+
+def route_plans(routes: list[Route], amount: float, direct: Optional[Route] = None) -> list[dict]:
+    """
+    把多跳路径转换为兑换方案条目（字段与报价引擎的方案一致，另含 route 和 hops）
+
+    Args:
+        direct: 直接交易对的路径，用于计算多跳路由相对直接兑换的收益
+    """
+    plans = []
+    for route in routes:
+        gain = (route.rate / direct.rate - 1) * 100 if direct else 0.0
+        plans.append({
+            "id": "route_" + "_".join(route.path),
+            "name": f"多跳路由 {' → '.join(route.path)}",
+            "description": f"经 {'、'.join(route.path[1:-1])} 中转，共{route.hops}跳",
+            "exchange_rate": round(route.rate, 6),
+            "fee_rate": round(route.fee_rate, 6),
+            "estimated_output": round(amount * route.rate, 6),
+            "estimated_time": f"{5 * route.hops}-{10 * route.hops}分钟",
+            "risk_level": "low" if route.hops <= 2 else "medium",
+            "features": ["多跳路由", f"较直接兑换 {gain:+.2f}%"],
+            "recommended": False,
+            "route": list(route.path),
+            "hops": route.hops,
+        })
+    return plans
+
+
+# 进程级单例
+_optimizer: Optional[RouteOptimizer] = None
+
+
+def get_route_optimizer() -> RouteOptimizer:
+    """获取进程级路由搜索（基于进程级报价引擎）"""
+    global _optimizer
+    if _optimizer is None:
+        _optimizer = RouteOptimizer()
+    return _optimizer
@@ -0,0 +1,288 @@
+"""
+跨worker共享价格表 - 固定布局的内存映射文件
+多个uvicorn worker中只有一个（通过flock选出）负责搜索和写入价格，其余worker直接读取映射内存，
+读写都不加锁：每个槽位带seqlock版本号，写入前后各加一（写入过程中为奇数），
+读取前后版本号一致且为偶数才视为有效数据
+布局不符时写入者在临时文件中初始化新表再原子替换，从不截断其他worker可能仍在映射的文件；
+读者定期检查文件是否已被替换，替换后重新映射
+
+布局（小端）:
+    表头 64 字节: magic(8s) 布局版本(u32) 槽位数(u32) 已用槽位(u32) 写入者pid(u32) 最近写入时间(f64) 代数(u64)
+    槽位 64 字节: seq(u64) symbol(16s) price(f64) change_24h(f64) updated_at(f64) ref_price(f64) ref_at(f64)
+"""
+import fcntl
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from typing import Optional
+
+import numpy as np
+
+logger = logging.getLogger("agent")
+
+# 共享表配置（SHARED_PRICES_PATH为空表示不启用，各worker独立维护价格）
+SHARED_PRICES_PATH = os.getenv("SHARED_PRICES_PATH", "")
+SHARED_PRICES_SLOTS = int(os.getenv("SHARED_PRICES_SLOTS", "64"))
+# 读者未能映射共享表时，重试的最小间隔（秒）
+SHARED_PRICES_RETRY = float(os.getenv("SHARED_PRICES_RETRY", "5"))
+
+MAGIC = b"SWPPRICE"
+LAYOUT_VERSION = 1
+HEADER = struct.Struct("<8sIIIIdQ")
+HEADER_SIZE = 64
+# 24小时涨跌幅的参考价格窗口
+CHANGE_WINDOW = 24 * 3600
+READ_RETRIES = 5
+
+SLOT_DTYPE = np.dtype({
+    "names": ["seq", "symbol", "price", "change_24h", "updated_at", "ref_price", "ref_at"],
+    "formats": ["<u8", "S16", "<f8", "<f8", "<f8", "<f8", "<f8"],
+    "offsets": [0, 8, 24, 32, 40, 48, 56],
+    "itemsize": 64,
+})
+
+
+class SharedPriceTable:
+    """
+    共享价格表
+    - try_become_writer(): 尝试通过flock成为写入者（写入者退出后锁自动释放，其他worker可接任）
+    - write(): 写入者发布价格
+    - snapshot()/read_if_changed(): 读者无锁读取，表未映射时返回空（调用方回退到本进程独立获取价格）
+    """
+
+    def __init__(self, path: str, capacity: int = SHARED_PRICES_SLOTS):
+        self.path = path
+        self.capacity = capacity
+        self.size = HEADER_SIZE + capacity * SLOT_DTYPE.itemsize
+        self.is_writer = False
+        self.counters = {"writes": 0, "reads": 0, "read_retries": 0, "attach_failures": 0, "table_full": 0}
+        self._mm: Optional[mmap.mmap] = None
+        self._slots: Optional[np.ndarray] = None
+        self._index: dict = {}
+        self._lock_fd: Optional[int] = None
+        self._last_attempt = 0.0
+        self._last_check = 0.0
+        # 已映射文件的 (st_dev, st_ino)，用于发现文件被替换
+        self._file_id: Optional[tuple] = None
+        self._last_generation: Optional[int] = None
+        self._write_lock = threading.Lock()
+
+    @property
+    def attached(self) -> bool:
+        return self._slots is not None
+
+    def _header(self) -> tuple:
+        return HEADER.unpack_from(self._mm, 0)
+
+    def _map(self, writable: bool):
+        fd = os.open(self.path, os.O_RDWR if writable else os.O_RDONLY)
+        try:
+            self._mm = mmap.mmap(fd, self.size, access=mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ)
+            stat = os.fstat(fd)
+            self._file_id = (stat.st_dev, stat.st_ino)
+        finally:
+            os.close(fd)
+        self._slots = np.ndarray((self.capacity,), dtype=SLOT_DTYPE, buffer=self._mm, offset=HEADER_SIZE)
+        self._index = {}
+        self._last_generation = None
+
+    def _unmap(self):
+        self._slots = None
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+
+    def _check_replaced(self):
+        """读者按 SHARED_PRICES_RETRY 间隔检查文件是否已被写入者替换（布局变化），是则解除旧映射"""
+        now = time.monotonic()
+        if now - self._last_check < SHARED_PRICES_RETRY:
+            return
+        self._last_check = now
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return
+        if (stat.st_dev, stat.st_ino) != self._file_id:
+            logger.info(f"🔄 共享价格表文件已被替换，重新映射: {self.path}")
+            self._unmap()
+            self._last_attempt = 0.0
+
+    def _readable(self) -> bool:
+        if self.is_writer:
+            return True
+        if self.attached:
+            self._check_replaced()
+        return self.attach()
+
+    def attach(self) -> bool:
+        """读者映射共享表；文件不存在或布局不符时返回False（按 SHARED_PRICES_RETRY 限制重试频率）"""
+        if self.attached:
+            return True
+        now = time.monotonic()
+        if now - self._last_attempt < SHARED_PRICES_RETRY:
+            return False
+        self._last_attempt = now
+        try:
+            if os.path.getsize(self.path) < self.size:
+                raise ValueError("共享价格表尚未初始化")
+            self._map(writable=False)
+            magic, version, capacity, *_ = self._header()
+            if magic != MAGIC or version != LAYOUT_VERSION or capacity != self.capacity:
+                self._unmap()
+                raise ValueError(f"共享价格表布局不符: {magic!r} v{version} 槽位{capacity}")
+        except (OSError, ValueError) as e:
+            self.counters["attach_failures"] += 1
+            logger.warning(f"⚠️ 共享价格表不可用，本worker独立获取价格: {e}")
+            return False
+        logger.info(f"📎 已映射共享价格表: {self.path}")
+        return True
+
+    def try_become_writer(self) -> bool:
+        """尝试成为写入者（非阻塞），已是写入者时直接返回True"""
+        if self.is_writer:
+            return True
+        lock_fd = os.open(self.path + ".lock", os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(lock_fd)
+            return False
+        self._lock_fd = lock_fd
+        self._unmap()
+        if not self._valid_file():
+            self._create_file()
+        self._map(writable=True)
+        _, _, _, count, _, written_at, generation = self._header()
+        HEADER.pack_into(self._mm, 0, MAGIC, LAYOUT_VERSION, self.capacity, count, os.getpid(), written_at, generation)
+        self._index = {self._slots["symbol"][i].decode(): i for i in range(count)}
+        self.is_writer = True
+        logger.info(f"✍️ 本worker(pid={os.getpid()})成为共享价格表写入者: {self.path}")
+        return True
+
+    def _valid_file(self) -> bool:
+        try:
+            fd = os.open(self.path, os.O_RDONLY)
+        except FileNotFoundError:
+            return False
+        try:
+            if os.fstat(fd).st_size != self.size:
+                return False
+            magic, version, capacity, *_ = HEADER.unpack(os.pread(fd, HEADER.size, 0))
+            return magic == MAGIC and version == LAYOUT_VERSION and capacity == self.capacity
+        finally:
+            os.close(fd)
+
+    def _create_file(self):
+        """在临时文件中初始化空表后原子替换（仍映射旧文件的读者不受影响，之后重新映射新文件）"""
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        fd = os.open(tmp_path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            os.ftruncate(fd, self.size)
+            os.pwrite(fd, HEADER.pack(MAGIC, LAYOUT_VERSION, self.capacity, 0, 0, 0.0, 0), 0)
+        finally:
+            os.close(fd)
+        os.replace(tmp_path, self.path)
+        logger.info(f"🆕 已初始化共享价格表: {self.path}（{self.capacity}个槽位）")
+
+    def write(self, prices: dict, updated_at: Optional[float] = None):
+        """写入者发布一批价格（每个槽位按seqlock写入，最后更新表头代数）"""
+        if not self.is_writer:
+            return
+        now = updated_at or time.time()
+        with self._write_lock:
+            _, _, _, count, pid, _, generation = self._header()
+            slots = self._slots
+            for symbol, price in prices.items():
+                symbol = symbol.upper()
+                if not price or price <= 0:
+                    continue
+                i = self._index.get(symbol)
+                if i is None:
+                    if count >= self.capacity:
+                        self.counters["table_full"] += 1
+                        continue
+                    i = self._index[symbol] = count
+                    count += 1
+                    slots["ref_price"][i] = 0.0
+                if not slots["ref_price"][i] or now - slots["ref_at"][i] >= CHANGE_WINDOW:
+                    ref_price, ref_at = price, now
+                else:
+                    ref_price, ref_at = slots["ref_price"][i], slots["ref_at"][i]
+                slots["seq"][i] += 1
+                slots["symbol"][i] = symbol.encode()
+                slots["price"][i] = price
+                slots["change_24h"][i] = (price / ref_price - 1) * 100
+                slots["updated_at"][i] = now
+                slots["ref_price"][i] = ref_price
+                slots["ref_at"][i] = ref_at
+                slots["seq"][i] += 1
+            HEADER.pack_into(self._mm, 0, MAGIC, LAYOUT_VERSION, self.capacity, count, pid, now, generation + 1)
+            self.counters["writes"] += 1
+
+    def generation(self) -> Optional[int]:
+        """表头代数（每次写入加一），未映射时为None"""
+        if not self._readable():
+            return None
+        return self._header()[6]
+
+    def snapshot(self) -> dict:
+        """
+        读取全部价格
+
+        Returns:
+            dict: {symbol: (price, change_24h, updated_at)}，读取期间正被写入的槽位会被跳过
+        """
+        if not self._readable():
+            return {}
+        self.counters["reads"] += 1
+        slots = self._slots[:self._header()[3]]
+        for _ in range(READ_RETRIES):
+            before = slots["seq"].copy()
+            rows = slots[["symbol", "price", "change_24h", "updated_at"]].copy()
+            after = slots["seq"].copy()
+            valid = (before == after) & (before % 2 == 0) & (before > 0)
+            if valid.all():
+                break
+            self.counters["read_retries"] += 1
+        return {
+            row["symbol"].decode(): (float(row["price"]), float(row["change_24h"]), float(row["updated_at"]))
+            for row in rows[valid]
+        }
+
+    def read_if_changed(self) -> dict:
+        """表头代数与上次读取时不同才读取全部价格，否则返回空（未更新时只读一次表头）"""
+        generation = self.generation()
+        if generation is None or generation == self._last_generation:
+            return {}
+        self._last_generation = generation
+        return self.snapshot()
+
+    def stats(self) -> dict:
+        info = {**self.counters, "path": self.path, "attached": self.attached, "writer": self.is_writer}
+        if self.attached:
+            _, _, _, count, pid, written_at, generation = self._header()
+            info.update({"symbols": count, "writer_pid": pid, "written_at": written_at, "generation": generation})
+        return info
+
+    def close(self):
+        """解除映射并释放写入锁"""
+        self._unmap()
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+        self.is_writer = False
+
+
+# 进程级单例（未配置 SHARED_PRICES_PATH 时为None）
+_table: Optional[SharedPriceTable] = None
+
+
+def get_shared_price_table() -> Optional[SharedPriceTable]:
+    """获取进程级共享价格表，未启用时返回None"""
+    global _table
+    if _table is None and SHARED_PRICES_PATH:
+        _table = SharedPriceTable(SHARED_PRICES_PATH)
+    return _table
@@ -0,0 +1,65 @@
+"""
+请求合并(single-flight) - 相同键的并发请求共享同一次上游调用
+"""
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Optional
+
+logger = logging.getLogger("agent")
+
+
+class SingleFlight:
+    """
+    相同键的并发调用只执行一次fn，其余调用等待并共享结果
+    - fn抛出的异常会传递给所有等待者
+    - 每个调用方可以设置自己的超时；超时不会取消共享的上游调用
+    """
+
+    def __init__(self, default_timeout: Optional[float] = None):
+        self.default_timeout = default_timeout
+        self._inflight: dict[str, asyncio.Task] = {}
+        self.counters = {"leaders": 0, "coalesced": 0, "timeouts": 0, "errors": 0}
+
+    def _on_done(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # 取出异常，避免无人等待时出现 "exception was never retrieved"
+        if not task.cancelled() and task.exception() is not None:
+            self.counters["errors"] += 1
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]], timeout: Optional[float] = None) -> Any:
+        """
+        执行或加入键为key的在途调用
+
+        Args:
+            key: 合并键
+            fn: 无参异步函数，只有第一个调用方会执行
+            timeout: 当前调用方的等待超时（秒），None表示使用默认值
+
+        Raises:
+            asyncio.TimeoutError: 等待超时
+        """
+        task = self._inflight.get(key)
+        if task is None:
+            self.counters["leaders"] += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._on_done(key, t))
+        else:
+            self.counters["coalesced"] += 1
+            logger.debug(f"🔗 合并在途请求: {key}")
+
+        timeout = self.default_timeout if timeout is None else timeout
+        try:
+            # shield: 单个调用方超时或取消不影响其他等待者
+            return await asyncio.wait_for(asyncio.shield(task), timeout=timeout)
+        except asyncio.TimeoutError:
+            self.counters["timeouts"] += 1
+            raise
+
+    def inflight(self) -> int:
+        """当前在途的键数量"""
+        return len(self._inflight)
+
+    def stats(self) -> dict:
+        return {**self.counters, "inflight": len(self._inflight)}
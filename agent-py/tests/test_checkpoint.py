@@ -0,0 +1,90 @@
+"""SqliteCheckpointSaver: 同一数据库文件上的第二个实例（模拟另一个worker）能读到写入的检查点和写入记录"""
+import asyncio
+import sqlite3
+
+import pytest
+from langgraph.checkpoint.base import empty_checkpoint
+
+from sample_agent.checkpoint import SqliteCheckpointSaver
+
+
+def _config(thread_id: str, checkpoint_id: str = None) -> dict:
+    configurable = {"thread_id": thread_id, "checkpoint_ns": ""}
+    if checkpoint_id:
+        configurable["checkpoint_id"] = checkpoint_id
+    return {"configurable": configurable}
+
+
+def _checkpoint(messages: list) -> dict:
+    checkpoint = empty_checkpoint()
+    checkpoint["channel_values"] = {"messages": messages}
+    checkpoint["channel_versions"] = {"messages": 1}
+    return checkpoint
+
+
+def test_round_trip_across_instances(tmp_path):
+    path = str(tmp_path / "checkpoints.db")
+    writer = SqliteCheckpointSaver(path)
+    checkpoint = _checkpoint(["你好"] * 200)
+    saved = writer.put(_config("t1"), checkpoint, {"source": "loop", "step": 1}, {"messages": 1})
+    writer.put_writes(saved, [("messages", "hi"), ("search_history", [{"query": "BTC"}])], "task-1")
+
+    reader = SqliteCheckpointSaver(path)
+    loaded = reader.get_tuple(_config("t1"))
+    assert loaded is not None
+    assert loaded.config["configurable"]["checkpoint_id"] == checkpoint["id"]
+    assert loaded.checkpoint["channel_values"] == {"messages": ["你好"] * 200}
+    assert loaded.metadata["step"] == 1
+    assert loaded.pending_writes == [
+        ("task-1", "messages", "hi"),
+        ("task-1", "search_history", [{"query": "BTC"}]),
+    ]
+    assert [item.checkpoint["id"] for item in reader.list(_config("t1"))] == [checkpoint["id"]]
+    writer.close()
+    reader.close()
+
+
+@pytest.mark.parametrize("flush_delay", [0, 0.01])
+def test_async_writes_visible_to_other_instance(tmp_path, flush_delay):
+    path = str(tmp_path / "checkpoints.db")
+
+    async def scenario():
+        writer = SqliteCheckpointSaver(path, flush_delay=flush_delay)
+        saved = await writer.aput(_config("t2"), _checkpoint([]), {"step": 0}, {"messages": 1})
+        await writer.aput_writes(saved, [("messages", "queued")], "task-2")
+        # 没有后续put时，缓冲的写入在flush_delay后自动落盘
+        await asyncio.sleep(flush_delay + 0.2)
+        reader = SqliteCheckpointSaver(path)
+        loaded = await reader.aget_tuple(_config("t2"))
+        writer.close()
+        reader.close()
+        return loaded
+
+    loaded = asyncio.run(scenario())
+    assert loaded.pending_writes == [("task-2", "messages", "queued")]
+
+
+def test_failed_flush_keeps_pending_writes(tmp_path):
+    path = str(tmp_path / "checkpoints.db")
+    writer = SqliteCheckpointSaver(path, flush_delay=10)
+    saved = writer.put(_config("t3"), _checkpoint([]), {"step": 0}, {"messages": 1})
+    writer._conn.execute("PRAGMA busy_timeout = 0")
+
+    async def buffer():
+        await writer.aput_writes(saved, [("messages", "kept")], "task-3")
+
+    asyncio.run(buffer())
+    blocker = sqlite3.connect(path, isolation_level=None)
+    blocker.execute("BEGIN IMMEDIATE")
+    with pytest.raises(sqlite3.OperationalError):
+        writer._flush()
+    assert writer.stats()["pending"] == 1
+    blocker.execute("ROLLBACK")
+    blocker.close()
+
+    reader = SqliteCheckpointSaver(path)
+    assert reader.get_tuple(_config("t3")).pending_writes == []
+    writer._flush()
+    assert reader.get_tuple(_config("t3")).pending_writes == [("task-3", "messages", "kept")]
+    writer.close()
+    reader.close()
@@ -0,0 +1,51 @@
+"""classify_locally: 本地规则直接决定意图（置信度达到 INTENT_LOCAL_CONFIDENCE 时跳过LLM），误判会直接到达用户"""
+import pytest
+
+from sample_agent.intent import INTENT_LOCAL_CONFIDENCE, classify_locally
+
+
+@pytest.mark.parametrize("message, from_token, to_token, amount", [
+    ("1 BTC 兑换 ETH", "BTC", "ETH", 1.0),
+    ("2.5 ETH 换 USDT", "ETH", "USDT", 2.5),
+    ("1,000 USDT 换 BTC", "USDT", "BTC", 1000.0),
+    ("12,345.5 usdt 兑换 sol", "USDT", "SOL", 12345.5),
+    ("ＢＴＣ换ＥＴＨ", "BTC", "ETH", 1.0),
+])
+def test_exchange_resolved_locally(message, from_token, to_token, amount):
+    result = classify_locally(message)
+    assert result["intent"] == "exchange"
+    assert (result["from_token"], result["to_token"], result["amount"]) == (from_token, to_token, amount)
+    assert result["confidence"] >= INTENT_LOCAL_CONFIDENCE
+
+
+@pytest.mark.parametrize("message", [
+    "1e3 BTC 换 ETH",
+    "1,0000 USDT 换 BTC",
+    "1.2.3 BTC 换 ETH",
+    "-5 BTC 换 ETH",
+    "0 USDT 换 BTC",
+])
+def test_ambiguous_amount_goes_to_llm(message):
+    result = classify_locally(message)
+    assert result["intent"] == "exchange"
+    assert result["confidence"] < INTENT_LOCAL_CONFIDENCE
+
+
+def test_weak_connector_without_exchange_keyword_goes_to_llm():
+    assert classify_locally("BTC to ETH")["confidence"] < INTENT_LOCAL_CONFIDENCE
+
+
+@pytest.mark.parametrize("message", ["hi", "Hey!", "hello there", "你好", "嗨"])
+def test_greeting(message):
+    assert classify_locally(message)["intent"] == "greeting"
+
+
+@pytest.mark.parametrize("message", ["this?", "which", "ship it", "they"])
+def test_not_greeting(message):
+    assert classify_locally(message)["intent"] == "unclear"
+
+
+def test_token_list():
+    result = classify_locally("查看代币列表")
+    assert result["intent"] == "token_list"
+    assert result["confidence"] >= INTENT_LOCAL_CONFIDENCE
@@ -0,0 +1,62 @@
+"""PayloadStore: 写入由后台线程落盘，其他实例可读；超过保留时间和总大小的载荷被清理"""
+import asyncio
+import sqlite3
+import time
+
+import pytest
+
+from sample_agent import payload_store
+from sample_agent.payload_store import PayloadMissing, PayloadStore
+
+
+def test_write_behind_visible_to_other_instance(tmp_path):
+    path = str(tmp_path / "payloads.db")
+    writer = PayloadStore(max_entries=1, path=path)
+    content = "x" * 4096
+    ref = writer.externalize(content, "search")
+    # 被内存LRU淘汰、尚未落盘的载荷仍可读取
+    writer.put("y")
+    assert asyncio.run(writer.aresolve(ref)) == content
+    writer.close()
+
+    reader = PayloadStore(path=path)
+    assert asyncio.run(reader.aresolve(ref)) == content
+    reader.close()
+
+
+def test_local_only_resolve_skips_sqlite(tmp_path):
+    path = str(tmp_path / "payloads.db")
+    writer = PayloadStore(path=path)
+    ref = writer.externalize("z" * 4096, "search")
+    writer.close()
+
+    reader = PayloadStore(path=path)
+    with pytest.raises(PayloadMissing):
+        reader.resolve(ref, local_only=True)
+    assert reader.resolve(ref) == "z" * 4096
+    reader.close()
+
+
+def test_prune_by_age_and_total_size(tmp_path, monkeypatch):
+    monkeypatch.setattr(payload_store, "PRUNE_INTERVAL", 0)
+    path = str(tmp_path / "payloads.db")
+    db = sqlite3.connect(path)
+    db.execute("CREATE TABLE payloads (digest TEXT PRIMARY KEY, content TEXT NOT NULL, created_at REAL NOT NULL)")
+    now = time.time()
+    db.executemany(
+        "INSERT INTO payloads VALUES (?, ?, ?)",
+        [("expired", "a" * 100, now - 7200), ("old", "b" * 100, now - 30), ("mid", "c" * 100, now - 20)],
+    )
+    db.commit()
+    db.close()
+
+    store = PayloadStore(path=path, ttl=3600, db_max_bytes=250)
+    store.put("d" * 100)
+    store.close()
+
+    db = sqlite3.connect(path)
+    remaining = {row[0] for row in db.execute("SELECT digest FROM payloads")}
+    db.close()
+    assert "expired" not in remaining and "old" not in remaining
+    assert "mid" in remaining and len(remaining) == 2
+    assert store.stats()["pruned"] == 2
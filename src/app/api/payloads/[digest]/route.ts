@@ -0,0 +1,26 @@
+import { NextRequest, NextResponse } from 'next/server'
+
+// 代理到Python智能体的载荷存储（大体积工具结果按哈希按需获取）
+const AGENT_URL = 'http://localhost:8080'
+
+export async function GET(
+  _request: NextRequest,
+  { params }: { params: Promise<{ digest: string }> }
+) {
+  const { digest } = await params
+  if (!/^[0-9a-f]{64}$/.test(digest)) {
+    return NextResponse.json({ error: '无效的载荷哈希' }, { status: 400 })
+  }
+
+  const response = await fetch(`${AGENT_URL}/payloads/${digest}`)
+  if (!response.ok) {
+    return NextResponse.json({ error: '载荷不存在或已过期' }, { status: response.status })
+  }
+
+  return new NextResponse(await response.text(), {
+    headers: {
+      'Content-Type': 'application/json',
+      'Cache-Control': 'public, max-age=31536000, immutable',
+    },
+  })
+}
@@ -20,6 +20,59 @@ import { defiModuleConfig } from '../modules/defi/defiModule'
 import { nftModuleConfig } from '../modules/nft/nftModule'
 import { loadingAtom, errorAtom } from '../store/tokenStore'
 
+// 解析工具结果；后端按保留策略折叠的旧结果只包含摘要
+function parseToolResult(result: any) {
+  return typeof result === 'string' ? JSON.parse(result) : result
+}
+
+// 大体积工具结果以哈希引用返回，按需从载荷存储获取完整内容
+function useResolvedToolResult(result: any) {
+  const parsed = result ? parseToolResult(result) : null
+  const ref: string | undefined = parsed?.payload_ref
+  const [payload, setPayload] = useState<any>(null)
+  const [failed, setFailed] = useState(false)
+
+  useEffect(() => {
+    if (!ref) return
+    let cancelled = false
+    fetch(`/api/payloads/${ref}`)
+      .then((response) => {
+        if (!response.ok) throw new Error(`载荷获取失败: ${response.status}`)
+        return response.json()
+      })
+      .then((data) => { if (!cancelled) setPayload(data) })
+      .catch((err) => {
+        console.error(err)
+        if (!cancelled) setFailed(true)
+      })
+    return () => { cancelled = true }
+  }, [ref])
+
+  if (!ref) return { data: parsed, failed: false }
+  return { data: payload, failed }
+}
+
+function ToolResult({ result, render }: { result: any, render: (data: any) => React.ReactNode }) {
+  const { data, failed } = useResolvedToolResult(result)
+  if (failed) {
+    return <CollapsedResult data={{ summary: '结果已过期，请重新查询。' }} />
+  }
+  if (!data) {
+    return <Spinner size="sm" />
+  }
+  return <>{data.collapsed ? <CollapsedResult data={data} /> : render(data)}</>
+}
+
+function CollapsedResult({ data }: { data: any }) {
+  return (
+    <Card>
+      <CardBody className="p-4">
+        <p className="text-sm text-gray-500">{data.summary}</p>
+      </CardBody>
+    </Card>
+  )
+}
+
 export default function YourApp() {
   const [loading] = useAtom(loadingAtom)
   const [error] = useAtom(errorAtom)
@@ -110,7 +163,7 @@ export default function YourApp() {
             </Card>
           )}
           {status === "complete" && result && (
-            <TokenSelector data={typeof result === 'string' ? JSON.parse(result) : result} />
+            <ToolResult result={result} render={(data) => <TokenSelector data={data} />} />
           )}
         </div>
       );
@@ -134,7 +187,7 @@ export default function YourApp() {
             </Card>
           )}
           {status === "complete" && result && (
-            <ExchangePlansSelector data={typeof result === 'string' ? JSON.parse(result) : result} />
+            <ToolResult result={result} render={(data) => <ExchangePlansSelector data={data} />} />
           )}
         </div>
       );